@@ -1,31 +1,88 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.core.security import verify_password, create_access_token
-from app.db import get_db
-from app.deps import get_current_user
+from app.core.password_pool import PasswordPool, PasswordPoolBusy, get_password_pool
+from app.core.rate_limit import LoginThrottle, RateLimited, get_login_throttle, retry_after_header
+from app.core.security import create_access_token, needs_rehash
+from app.core.user_cache import user_cache
+from app.core.write_queue import WriteExecutor, WriteQueueTimeout
+from app.db import ReadSession, get_read_db, get_write_executor, run_read
+from app.deps import get_current_user, get_current_user_async
 from app.models.user import User
 from app.schemas.user import Token, UserRead, UserCreate
 from app.schemas.income import ChangePasswordRequest
-from app.core.security import hash_password
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def _load_user_by_username(db: Session, username: str) -> User | None:
+    return db.execute(select(User).where(User.username == username)).scalar_one_or_none()
+
+
+def _load_password_hash(db: Session, user_id: int) -> str:
+    return db.execute(select(User.hashed_password).where(User.id == user_id)).scalar_one()
+
+
+def _set_password_tx(db: Session, user_id: int, hashed: str) -> None:
+    """写队列中执行：更新口令哈希。"""
+    db.get(User, user_id).hashed_password = hashed
+
+
+def _rehash_tx(db: Session, user_id: int, old_hashed: str, new_hashed: str) -> bool:
+    """写队列中执行：仅当口令哈希未被并发修改时替换为新 cost 的哈希。"""
+    user = db.get(User, user_id)
+    if user is None or user.hashed_password != old_hashed:
+        return False
+    user.hashed_password = new_hashed
+    return True
+
+
+async def _rehash_on_login(pool: PasswordPool, writer: WriteExecutor, user: User, plain: str) -> None:
+    """登录成功后把 cost 与配置不一致的哈希升级/降级；失败不影响本次登录。"""
+    try:
+        new_hashed = await pool.hash(plain)
+        await writer.run_async(_rehash_tx, user.id, user.hashed_password, new_hashed)
+    except (PasswordPoolBusy, WriteQueueTimeout) as exc:
+        logger.warning("Password rehash skipped for user %s: %s", user.id, exc)
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db),
+    throttle: LoginThrottle = Depends(get_login_throttle),
+    db: ReadSession = Depends(get_read_db),
+    writer: WriteExecutor = Depends(get_write_executor),
+    pool: PasswordPool = Depends(get_password_pool),
 ):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    """
+    先按 IP / 用户名限流（超限返回 429，不做任何口令计算）；
+    bcrypt 校验在口令计算池中执行，不占用请求线程池；池满时返回 503。
+    校验通过且哈希 cost 与 BCRYPT_ROUNDS 不一致时，顺带重新哈希。
+    """
+    try:
+        throttle.check(request.client.host if request.client else None, form_data.username)
+    except RateLimited as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="登录尝试过于频繁，请稍后再试",
+            headers={"Retry-After": retry_after_header(exc)},
+        )
+    user = await run_read(db, _load_user_by_username, form_data.username)
+    if not user or not await pool.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
         )
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="账号已被禁用")
+    if needs_rehash(user.hashed_password):
+        await _rehash_on_login(pool, writer, user, form_data.password)
 
     token = create_access_token(subject=user.id)
     return Token(access_token=token, user=UserRead.model_validate(user))
@@ -37,14 +94,19 @@ def get_me(current_user: User = Depends(get_current_user)):
 
 
 @router.post("/change-password", status_code=status.HTTP_204_NO_CONTENT)
-def change_password(
+async def change_password(
     body: ChangePasswordRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: ReadSession = Depends(get_read_db),
+    writer: WriteExecutor = Depends(get_write_executor),
+    pool: PasswordPool = Depends(get_password_pool),
 ):
-    if not verify_password(body.old_password, current_user.hashed_password):
+    # current_user 可能来自用户缓存，校验前重新读取当前的口令哈希
+    hashed = await run_read(db, _load_password_hash, current_user.id)
+    if not await pool.verify(body.old_password, hashed):
         raise HTTPException(status_code=400, detail="原密码错误")
     if len(body.new_password) < 6:
         raise HTTPException(status_code=400, detail="新密码长度不得少于 6 位")
-    current_user.hashed_password = hash_password(body.new_password)
-    db.commit()
+    new_hashed = await pool.hash(body.new_password)
+    await writer.run_async(_set_password_tx, current_user.id, new_hashed)
+    user_cache.invalidate(current_user.id)
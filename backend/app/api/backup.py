@@ -1,12 +1,15 @@
-import shutil
 from datetime import datetime
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
 
+from app.core.backup import compression_of, is_increment, list_backup_files, read_checksum
 from app.core.config import settings
 from app.core.scheduler import _do_backup
+from app.db import get_db
 from app.deps import require_admin
+from app.models.backup import BackupLog
 from app.models.user import User
 
 router = APIRouter()
@@ -22,16 +25,32 @@ def trigger_backup(_: User = Depends(require_admin)):
 
 
 @router.get("/list", summary="列出所有备份文件")
-def list_backups(_: User = Depends(require_admin)):
+def list_backups(db: Session = Depends(get_db), _: User = Depends(require_admin)):
+    """size_bytes 为备份文件（压缩后）大小，original_size_bytes 为压缩前的数据库大小（未知时为 null）。"""
     backup_dir: Path = settings.BACKUP_DIR
-    if not backup_dir.exists():
+    files = list_backup_files(backup_dir)
+    if not files:
         return []
-    files = sorted(backup_dir.glob("ai_platform_*.db"), key=lambda f: f.stat().st_mtime, reverse=True)
-    return [
-        {
+    logs = {
+        log.file_path: log
+        for log in db.query(BackupLog).filter(BackupLog.file_path.in_([str(f) for f in files]))
+    }
+    result = []
+    for f in files:
+        stat = f.stat()
+        log = logs.get(str(f))
+        compression = compression_of(f)
+        original_size = log.original_size if log else None
+        if original_size is None and compression == "none":
+            original_size = stat.st_size
+        result.append({
             "filename": f.name,
-            "size_bytes": f.stat().st_size,
-            "created_at": datetime.fromtimestamp(f.stat().st_mtime).isoformat(),
-        }
-        for f in files
-    ]
+            "size_bytes": stat.st_size,
+            "original_size_bytes": original_size,
+            "compression": compression,
+            "kind": "incremental" if is_increment(f) else "full",
+            "base": log.base_file if log else None,
+            "sha256": (log.sha256 if log else None) or read_checksum(f),
+            "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+        })
+    return result
@@ -1,23 +1,47 @@
 from datetime import date
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
-from app.db import get_db
-from app.deps import get_current_user
+from app.core.config import settings
+from app.core.debt_planner import (
+    PlannerDebt,
+    StrategyPlan,
+    avalanche_order,
+    custom_order,
+    monthly_budget,
+    plan_payoff,
+    snowball_order,
+)
+from app.core.debt_simulator import Scenario, simulate
+from app.core.schedule_store import build_schedule, load_schedule
+from app.core.write_queue import WriteExecutor
+from app.db import ReadSession, get_db, get_read_db, get_write_executor, run_read
+from app.deps import get_current_user, get_current_user_async
 from app.models.user import User
-from app.models.debt import DebtItem, RepaymentSchedule
+from app.models.debt import DebtItem
 from app.schemas.debt import (
     DebtItemCreate,
     DebtItemUpdate,
     DebtItemRead,
     RepaymentScheduleRead,
+    PeriodDetailRead,
+    DebtBalanceRead,
+    SimulationRequest,
+    SimulationResponse,
+    SimulationScenarioResult,
     DebtSummary,
     DebtBarItem,
+    PlannerDebtPayoff,
+    PlannerRequest,
+    PlannerResponse,
+    PlannerStrategyResult,
 )
 from app.core.debt_calculator import (
-    generate_schedule,
+    calc_period_detail,
+    calc_balance_as_of,
     calc_monthly_payment_equal_installment,
     calc_monthly_payment_equal_principal,
 )
@@ -36,40 +60,11 @@ def _get_debt_or_404(debt_id: int, user_id: int, db: Session) -> DebtItem:
     return debt
 
 
-def _build_schedule(debt: DebtItem, db: Session) -> None:
-    """根据 DebtItem 的参数重新生成/覆盖还款计划表。"""
-    db.query(RepaymentSchedule).filter(RepaymentSchedule.debt_id == debt.id).delete()
-
-    periods = generate_schedule(
-        principal=debt.principal,
-        annual_rate=debt.annual_rate,
-        term_months=debt.term_months,
-        repay_method=debt.repay_method,
-        first_repay_date=debt.first_repay_date,
-    )
-    for p in periods:
-        db.add(RepaymentSchedule(
-            debt_id=debt.id,
-            period_no=p.period_no,
-            due_date=p.due_date,
-            payment_amount=p.payment_amount,
-            principal_amount=p.principal_amount,
-            interest_amount=p.interest_amount,
-            remaining_balance=p.remaining_balance,
-            status="pending",
-        ))
-
-
 # ──────────────────────────── 统计接口（必须在 /{debt_id} 之前注册） ───────────────
 
-@router.get("/stats/summary", response_model=DebtSummary)
-def get_summary(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    """返回仪表盘顶部汇总数据。"""
+def _query_summary(db: Session, user_id: int) -> DebtSummary:
     debts = db.query(DebtItem).filter(
-        DebtItem.user_id == current_user.id, DebtItem.is_active == True
+        DebtItem.user_id == user_id, DebtItem.is_active == True
     ).all()
     total_balance = round(sum(d.current_balance for d in debts), 2)
     monthly_total = round(sum(d.monthly_payment for d in debts), 2)
@@ -80,14 +75,9 @@ def get_summary(
     )
 
 
-@router.get("/stats/bar-chart", response_model=list[DebtBarItem])
-def get_bar_chart(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    """返回柱状图所需数据：各债务当前余额 + 月供。"""
+def _query_bar_chart(db: Session, user_id: int) -> list[DebtBarItem]:
     debts = db.query(DebtItem).filter(
-        DebtItem.user_id == current_user.id, DebtItem.is_active == True
+        DebtItem.user_id == user_id, DebtItem.is_active == True
     ).order_by(DebtItem.current_balance.desc()).all()
     return [
         DebtBarItem(
@@ -99,6 +89,111 @@ def get_bar_chart(
     ]
 
 
+@router.get("/stats/summary", response_model=DebtSummary)
+async def get_summary(
+    db: ReadSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    """返回仪表盘顶部汇总数据。"""
+    return await run_read(db, _query_summary, current_user.id)
+
+
+@router.get("/stats/bar-chart", response_model=list[DebtBarItem])
+async def get_bar_chart(
+    db: ReadSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    """返回柱状图所需数据：各债务当前余额 + 月供。"""
+    return await run_read(db, _query_bar_chart, current_user.id)
+
+
+def _query_planner_debts(db: Session, user_id: int) -> list[PlannerDebt]:
+    debts = db.query(DebtItem).filter(
+        DebtItem.user_id == user_id, DebtItem.is_active == True, DebtItem.current_balance > 0
+    ).order_by(DebtItem.id).all()
+    return [
+        PlannerDebt(
+            id=d.id,
+            name=d.name,
+            balance=d.current_balance,
+            annual_rate=d.annual_rate,
+            monthly_payment=d.monthly_payment,
+            principal_per_period=round(d.principal / d.term_months, 2),
+            fixed_principal=d.repay_method == "equal_principal",
+        )
+        for d in debts
+    ]
+
+
+def _month_label(start: str, offset: int) -> str:
+    year, month = map(int, start.split("-"))
+    year, month = divmod(year * 12 + month - 1 + offset, 12)
+    return f"{year:04d}-{month + 1:02d}"
+
+
+def _plan(debts: list[PlannerDebt], payload: PlannerRequest) -> PlannerResponse:
+    orders = {"avalanche": avalanche_order, "snowball": snowball_order}
+    strategies = {}
+    for name in dict.fromkeys(payload.strategies):
+        if name == "custom":
+            if not payload.custom_order:
+                raise HTTPException(status_code=422, detail="custom 策略需要提供 custom_order")
+            try:
+                strategies[name] = custom_order(debts, payload.custom_order)
+            except ValueError as exc:
+                raise HTTPException(status_code=422, detail=str(exc))
+        else:
+            strategies[name] = orders[name](debts)
+
+    plans = plan_payoff(debts, payload.monthly_extra, strategies)
+    names = {d.id: d.name for d in debts}
+    start = payload.start_month or _month_label(date.today().strftime("%Y-%m"), 1)
+    baseline_interest = plans["minimum"].total_interest
+
+    def to_read(plan: StrategyPlan) -> PlannerStrategyResult:
+        return PlannerStrategyResult(
+            strategy=plan.name,
+            order=plan.order,
+            paid_off=plan.paid_off,
+            months=plan.months,
+            payoff_month=_month_label(start, plan.months - 1) if plan.paid_off and plan.months else None,
+            total_interest=plan.total_interest,
+            total_paid=plan.total_paid,
+            interest_saved=round(baseline_interest - plan.total_interest, 2),
+            debts=[
+                PlannerDebtPayoff(
+                    debt_id=debt_id,
+                    name=names[debt_id],
+                    payoff_month=_month_label(start, plan.payoff_months[debt_id] - 1)
+                    if debt_id in plan.payoff_months else None,
+                    months=plan.payoff_months.get(debt_id),
+                )
+                for debt_id in plan.order
+            ],
+            balance_timeline=plan.balance_timeline,
+        )
+
+    return PlannerResponse(
+        monthly_budget=monthly_budget(debts, payload.monthly_extra),
+        baseline=to_read(plans["minimum"]),
+        strategies=[to_read(plans[name]) for name in strategies],
+    )
+
+
+@router.post("/planner", response_model=PlannerResponse)
+async def plan_debt_payoff(
+    payload: PlannerRequest,
+    db: ReadSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    """
+    按雪崩 / 雪球 / 自定义顺序模拟当前用户全部有效债务的还清过程，
+    返回各策略的还清时间线与总利息（只做计算，不写库）。
+    """
+    debts = await run_read(db, _query_planner_debts, current_user.id)
+    return await run_in_threadpool(_plan, debts, payload)
+
+
 # ──────────────────────────────── CRUD ───────────────────────────────────────
 
 @router.get("", response_model=list[DebtItemRead])
@@ -114,13 +209,8 @@ def list_debts(
     return q.order_by(DebtItem.created_at.desc()).all()
 
 
-@router.post("", response_model=DebtItemRead, status_code=status.HTTP_201_CREATED)
-def create_debt(
-    payload: DebtItemCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    """新增一笔贷款，后端自动计算月供并生成完整还款计划表。"""
+def _create_debt_tx(db: Session, user_id: int, payload: DebtItemCreate) -> DebtItemRead:
+    """写队列中执行：创建债务并生成还款计划表。"""
     if payload.repay_method == "equal_installment":
         monthly = calc_monthly_payment_equal_installment(
             payload.principal, payload.annual_rate, payload.term_months
@@ -131,7 +221,7 @@ def create_debt(
         )
 
     debt = DebtItem(
-        user_id=current_user.id,
+        user_id=user_id,
         name=payload.name,
         principal=payload.principal,
         annual_rate=payload.annual_rate,
@@ -139,6 +229,7 @@ def create_debt(
         repay_method=payload.repay_method,
         first_repay_date=payload.first_repay_date,
         monthly_repay_day=payload.monthly_repay_day,
+        schedule_mode=payload.schedule_mode or settings.DEBT_SCHEDULE_MODE,
         monthly_payment=monthly,
         current_balance=payload.principal,
         paid_periods=0,
@@ -148,10 +239,20 @@ def create_debt(
     db.add(debt)
     db.flush()
 
-    _build_schedule(debt, db)
-    db.commit()
+    build_schedule(db, debt)
+    db.flush()
     db.refresh(debt)
-    return debt
+    return DebtItemRead.model_validate(debt)
+
+
+@router.post("", response_model=DebtItemRead, status_code=status.HTTP_201_CREATED)
+def create_debt(
+    payload: DebtItemCreate,
+    writer: WriteExecutor = Depends(get_write_executor),
+    current_user: User = Depends(get_current_user),
+):
+    """新增一笔贷款，后端自动计算月供并生成还款计划表（lazy 模式下计划表按需计算，不落库）。"""
+    return writer.run(_create_debt_tx, current_user.id, payload)
 
 
 @router.get("/{debt_id}", response_model=DebtItemRead)
@@ -163,31 +264,39 @@ def get_debt(
     return _get_debt_or_404(debt_id, current_user.id, db)
 
 
+def _update_debt_tx(db: Session, user_id: int, debt_id: int, payload: DebtItemUpdate) -> DebtItemRead:
+    """写队列中执行：修改债务的名称、备注、是否有效。"""
+    debt = _get_debt_or_404(debt_id, user_id, db)
+    for field, value in payload.model_dump(exclude_none=True).items():
+        setattr(debt, field, value)
+    db.flush()
+    db.refresh(debt)
+    return DebtItemRead.model_validate(debt)
+
+
 @router.put("/{debt_id}", response_model=DebtItemRead)
 def update_debt(
     debt_id: int,
     payload: DebtItemUpdate,
-    db: Session = Depends(get_db),
+    writer: WriteExecutor = Depends(get_write_executor),
     current_user: User = Depends(get_current_user),
 ):
     """只允许修改名称、备注、是否有效（不重新计算计划）。"""
-    debt = _get_debt_or_404(debt_id, current_user.id, db)
-    for field, value in payload.model_dump(exclude_none=True).items():
-        setattr(debt, field, value)
-    db.commit()
-    db.refresh(debt)
-    return debt
+    return writer.run(_update_debt_tx, current_user.id, debt_id, payload)
+
+
+def _delete_debt_tx(db: Session, user_id: int, debt_id: int) -> None:
+    """写队列中执行：删除债务及其还款计划。"""
+    db.delete(_get_debt_or_404(debt_id, user_id, db))
 
 
 @router.delete("/{debt_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_debt(
     debt_id: int,
-    db: Session = Depends(get_db),
+    writer: WriteExecutor = Depends(get_write_executor),
     current_user: User = Depends(get_current_user),
 ):
-    debt = _get_debt_or_404(debt_id, current_user.id, db)
-    db.delete(debt)
-    db.commit()
+    writer.run(_delete_debt_tx, current_user.id, debt_id)
 
 
 # ──────────────────────────── 还款计划表 ──────────────────────────────────────
@@ -200,8 +309,111 @@ def get_schedule(
     current_user: User = Depends(get_current_user),
 ):
     """返回指定债务的还款计划表，可按状态筛选。"""
-    _get_debt_or_404(debt_id, current_user.id, db)
-    q = db.query(RepaymentSchedule).filter(RepaymentSchedule.debt_id == debt_id)
-    if status_filter:
-        q = q.filter(RepaymentSchedule.status == status_filter)
-    return q.order_by(RepaymentSchedule.period_no.asc()).all()
+    debt = _get_debt_or_404(debt_id, current_user.id, db)
+    return load_schedule(db, debt, status_filter)
+
+
+def _query_period(db: Session, user_id: int, debt_id: int, period_no: int) -> PeriodDetailRead:
+    debt = _get_debt_or_404(debt_id, user_id, db)
+    if period_no > debt.term_months:
+        raise HTTPException(status_code=404, detail="期数超出范围")
+    detail = calc_period_detail(
+        principal=debt.principal,
+        annual_rate=debt.annual_rate,
+        term_months=debt.term_months,
+        repay_method=debt.repay_method,
+        first_repay_date=debt.first_repay_date,
+        period_no=period_no,
+    )
+    return PeriodDetailRead.model_validate(detail)
+
+
+@router.get("/{debt_id}/schedule/{period_no}", response_model=PeriodDetailRead)
+async def get_schedule_period(
+    debt_id: int,
+    period_no: int = Path(..., ge=1),
+    db: ReadSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    """直接计算指定一期的还款明细，不生成、不读取整张计划表。"""
+    return await run_read(db, _query_period, current_user.id, debt_id, period_no)
+
+
+def _query_balance(db: Session, user_id: int, debt_id: int, as_of: date) -> DebtBalanceRead:
+    debt = _get_debt_or_404(debt_id, user_id, db)
+    periods, balance = calc_balance_as_of(
+        principal=debt.principal,
+        annual_rate=debt.annual_rate,
+        term_months=debt.term_months,
+        repay_method=debt.repay_method,
+        first_repay_date=debt.first_repay_date,
+        as_of=as_of,
+    )
+    return DebtBalanceRead(
+        debt_id=debt.id, as_of=as_of, periods_due=periods, remaining_balance=balance,
+    )
+
+
+@router.get("/{debt_id}/balance", response_model=DebtBalanceRead)
+async def get_balance_as_of(
+    debt_id: int,
+    as_of: Optional[date] = Query(None, description="截止日期（含当天），默认今天"),
+    db: ReadSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    """返回截至指定日期按还款计划应有的剩余本金（到期即视为已还）。"""
+    return await run_read(db, _query_balance, current_user.id, debt_id, as_of or date.today())
+
+
+# ──────────────────────────── 情景模拟 ────────────────────────────────────────
+
+def _load_debt(db: Session, user_id: int, debt_id: int) -> DebtItem:
+    return _get_debt_or_404(debt_id, user_id, db)
+
+
+def _simulate(debt: DebtItem, payload: SimulationRequest) -> SimulationResponse:
+    try:
+        result = simulate(
+            principal=debt.principal,
+            annual_rate=debt.annual_rate,
+            term_months=debt.term_months,
+            repay_method=debt.repay_method,
+            first_repay_date=debt.first_repay_date,
+            scenarios=[
+                Scenario(
+                    at_period=s.at_period,
+                    prepay_amount=s.prepay_amount,
+                    new_annual_rate=s.new_annual_rate,
+                    mode=s.mode,
+                )
+                for s in payload.scenarios
+            ],
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return SimulationResponse(
+        baseline_term_months=result.baseline_term_months,
+        baseline_monthly_payment=result.baseline_monthly_payment,
+        baseline_payoff_date=result.baseline_payoff_date,
+        baseline_total_interest=result.baseline_total_interest,
+        results=[
+            SimulationScenarioResult(name=s.name, **vars(r))
+            for s, r in zip(payload.scenarios, result.scenarios)
+        ],
+    )
+
+
+@router.post("/{debt_id}/simulate", response_model=SimulationResponse)
+async def simulate_debt(
+    debt_id: int,
+    payload: SimulationRequest,
+    db: ReadSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    """
+    批量模拟提前还款 / 利率变化情景，返回各情景的总利息、节省利息、新的结清日期与月供。
+    只做计算，不修改债务与还款计划。
+    """
+    debt = await run_read(db, _load_debt, current_user.id, debt_id)
+    # 计算放到线程池，避免阻塞事件循环
+    return await run_in_threadpool(_simulate, debt, payload)
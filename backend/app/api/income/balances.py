@@ -12,19 +12,31 @@
 - GET    /api/income/export/csv           导出所有月份余额为 CSV
 - POST   /api/income/import/csv           导入 CSV 文件（覆盖式 upsert）
 """
+import codecs
 import csv
 import io
+import logging
 import re
 from datetime import datetime
+from typing import BinaryIO, Callable, Iterator
 
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, status
 from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
-from app.db import get_db
-from app.deps import get_current_user
+from app.core.rollup import (
+    delete_monthly_total,
+    months_with_account,
+    refresh_monthly_totals,
+    upsert_monthly_total,
+)
+from app.core.write_queue import WriteExecutor
+from app.db import ReadSession, get_db, get_read_db, get_write_executor, run_read
+from app.deps import get_current_user, get_current_user_async
 from app.models.user import User
-from app.models.income import Account, MonthlyBalance
+from app.models.income import Account, MonthlyBalance, MonthlyTotal
 from app.schemas.income import (
     AccountCreate,
     AccountUpdate,
@@ -37,34 +49,34 @@ from app.schemas.income import (
 )
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # ── 默认账户（仅在用户首次使用时初始化） ──────────────────────────────────────
 
 DEFAULT_ACCOUNTS = ["微众银行", "招商银行", "工商银行", "微信", "证券", "腾讯股票"]
 
 
-def _get_or_init_accounts(db: Session, user: User) -> list[Account]:
-    """
-    获取用户的账户列表（按 sort_order + id 排序）。
-    若用户尚无账户，则自动用默认值初始化。
-    """
-    accs = (
+def _active_accounts(db: Session, user_id: int) -> list[Account]:
+    """用户的启用账户（按 sort_order + id 排序）。"""
+    return (
         db.query(Account)
-        .filter(Account.user_id == user.id, Account.is_active == True)  # noqa: E712
+        .filter(Account.user_id == user_id, Account.is_active == True)  # noqa: E712
         .order_by(Account.sort_order, Account.id)
         .all()
     )
+
+
+def _init_accounts_tx(db: Session, user_id: int) -> list[AccountRead]:
+    """
+    写队列中执行：若用户尚无账户，则自动用默认值初始化。
+    在写事务内重新检查，两个首次请求同时到达时只初始化一次。
+    """
+    accs = _active_accounts(db, user_id)
     if not accs:
-        new_accs = []
-        for i, name in enumerate(DEFAULT_ACCOUNTS):
-            a = Account(user_id=user.id, name=name, sort_order=i)
-            new_accs.append(a)
-        db.add_all(new_accs)
-        db.commit()
-        for a in new_accs:
-            db.refresh(a)
-        accs = new_accs
-    return accs
+        db.add_all(Account(user_id=user_id, name=name, sort_order=i) for i, name in enumerate(DEFAULT_ACCOUNTS))
+        db.flush()
+        accs = _active_accounts(db, user_id)
+    return [AccountRead.model_validate(a) for a in accs]
 
 
 # ── 账户管理 ───────────────────────────────────────────────────────────────────
@@ -72,53 +84,57 @@ def _get_or_init_accounts(db: Session, user: User) -> list[Account]:
 @router.get("/accounts", response_model=list[AccountRead])
 def list_accounts(
     db: Session = Depends(get_db),
+    writer: WriteExecutor = Depends(get_write_executor),
     current_user: User = Depends(get_current_user),
 ):
     """返回用户的账户列表（按排序）。首次访问时自动初始化默认账户。"""
-    return _get_or_init_accounts(db, current_user)
+    accs = _active_accounts(db, current_user.id)
+    if accs:
+        return accs
+    return writer.run(_init_accounts_tx, current_user.id)
 
 
-@router.post("/accounts", response_model=AccountRead, status_code=status.HTTP_201_CREATED)
-def create_account(
-    payload: AccountCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
+def _create_account_tx(db: Session, user_id: int, payload: AccountCreate) -> AccountRead:
+    """写队列中执行：创建账户（启用账户中名称不可重复）。"""
     existing = db.query(Account).filter(
-        Account.user_id == current_user.id,
+        Account.user_id == user_id,
         Account.name == payload.name,
         Account.is_active == True,  # noqa: E712
     ).first()
     if existing:
         raise HTTPException(status_code=409, detail="账户名称已存在")
     acc = Account(
-        user_id=current_user.id,
+        user_id=user_id,
         name=payload.name,
         sort_order=payload.sort_order,
     )
     db.add(acc)
-    db.commit()
+    db.flush()
     db.refresh(acc)
-    return acc
+    return AccountRead.model_validate(acc)
 
 
-@router.put("/accounts/{account_id}", response_model=AccountRead)
-def update_account(
-    account_id: int,
-    payload: AccountUpdate,
-    db: Session = Depends(get_db),
+@router.post("/accounts", response_model=AccountRead, status_code=status.HTTP_201_CREATED)
+def create_account(
+    payload: AccountCreate,
+    writer: WriteExecutor = Depends(get_write_executor),
     current_user: User = Depends(get_current_user),
 ):
+    return writer.run(_create_account_tx, current_user.id, payload)
+
+
+def _update_account_tx(db: Session, user_id: int, account_id: int, payload: AccountUpdate) -> AccountRead:
+    """写队列中执行：修改账户名称 / 排序。"""
     acc = db.query(Account).filter(
         Account.id == account_id,
-        Account.user_id == current_user.id,
+        Account.user_id == user_id,
         Account.is_active == True,  # noqa: E712
     ).first()
     if not acc:
         raise HTTPException(status_code=404, detail="账户不存在")
     if payload.name is not None:
         dup = db.query(Account).filter(
-            Account.user_id == current_user.id,
+            Account.user_id == user_id,
             Account.name == payload.name,
             Account.id != account_id,
             Account.is_active == True,  # noqa: E712
@@ -128,181 +144,253 @@ def update_account(
         acc.name = payload.name
     if payload.sort_order is not None:
         acc.sort_order = payload.sort_order
-    db.commit()
+    db.flush()
     db.refresh(acc)
-    return acc
+    return AccountRead.model_validate(acc)
 
 
-@router.delete("/accounts/{account_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_account(
+@router.put("/accounts/{account_id}", response_model=AccountRead)
+def update_account(
     account_id: int,
-    db: Session = Depends(get_db),
+    payload: AccountUpdate,
+    writer: WriteExecutor = Depends(get_write_executor),
     current_user: User = Depends(get_current_user),
 ):
+    return writer.run(_update_account_tx, current_user.id, account_id, payload)
+
+
+def _delete_account_tx(db: Session, user_id: int, account_id: int) -> None:
+    """写队列中执行：停用账户并刷新其出现过的月份的汇总（停用账户不再计入总额）。"""
     acc = db.query(Account).filter(
         Account.id == account_id,
-        Account.user_id == current_user.id,
+        Account.user_id == user_id,
     ).first()
     if not acc:
         raise HTTPException(status_code=404, detail="账户不存在")
     acc.is_active = False
-    db.commit()
+    db.flush()
+    refresh_monthly_totals(db, user_id, months_with_account(acc.id))
+
+
+@router.delete("/accounts/{account_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_account(
+    account_id: int,
+    writer: WriteExecutor = Depends(get_write_executor),
+    current_user: User = Depends(get_current_user),
+):
+    writer.run(_delete_account_tx, current_user.id, account_id)
 
 
 # ── 月份列表 ───────────────────────────────────────────────────────────────────
 
+# 当月全部明细之和（含已停用账户的记录，与 items 一致），由窗口函数在同一条查询中算出
+_MONTH_TOTAL = func.sum(MonthlyBalance.balance).over(partition_by=MonthlyBalance.month).label("month_total")
+
+
+def _snapshots(rows) -> list[MonthlySnapshotRead]:
+    """把按月份排序的 (MonthlyBalance, month_total) 行分组为单月快照。"""
+    snapshots: dict[str, MonthlySnapshotRead] = {}
+    for balance, total in rows:
+        snapshot = snapshots.get(balance.month)
+        if snapshot is None:
+            snapshot = snapshots[balance.month] = MonthlySnapshotRead(
+                month=balance.month, total=round(total, 2), items=[]
+            )
+        snapshot.items.append(MonthlyBalanceRead.model_validate(balance))
+    return list(snapshots.values())
+
+
+def _query_months(db: Session, user_id: int, limit: int) -> list[MonthlySnapshotRead]:
+    """
+    一次查询取回最近 limit 个月的全部余额行及每月合计：
+    子查询从 monthly_totals 选出月份窗口，再连接回明细行，合计由 SUM() OVER (PARTITION BY month) 计算。
+    """
+    month_window = (
+        select(MonthlyTotal.month)
+        .where(MonthlyTotal.user_id == user_id)
+        .order_by(MonthlyTotal.month.desc())
+        .limit(limit)
+        .subquery()
+    )
+    return _snapshots(db.execute(
+        select(MonthlyBalance, _MONTH_TOTAL)
+        .join(month_window, month_window.c.month == MonthlyBalance.month)
+        .where(MonthlyBalance.user_id == user_id)
+        .order_by(MonthlyBalance.month.desc(), MonthlyBalance.account_id)
+    ).all())
+
+
 @router.get("/balances", response_model=list[MonthlySnapshotRead])
-def list_months(
+async def list_months(
     limit: int = Query(24, ge=1, le=120, description="返回最近 N 个月，默认 24"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: ReadSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_async),
 ):
     """返回有记录的月份列表（倒序），每月包含各账户余额和总额。"""
-    months = (
-        db.query(MonthlyBalance.month)
-        .filter(MonthlyBalance.user_id == current_user.id)
-        .distinct()
-        .order_by(MonthlyBalance.month.desc())
-        .limit(limit)
-        .all()
-    )
-    result = []
-    for (month,) in months:
-        items = (
-            db.query(MonthlyBalance)
-            .filter(
-                MonthlyBalance.user_id == current_user.id,
-                MonthlyBalance.month == month,
-            )
-            .order_by(MonthlyBalance.account_id)
-            .all()
-        )
-        total = round(sum(i.balance for i in items), 2)
-        result.append(MonthlySnapshotRead(
-            month=month,
-            total=total,
-            items=[MonthlyBalanceRead.model_validate(i) for i in items],
-        ))
-    return result
+    return await run_read(db, _query_months, current_user.id, limit)
 
 
 # ── 单月详情 ───────────────────────────────────────────────────────────────────
 
+def _query_month(db: Session, user_id: int, month: str) -> MonthlySnapshotRead:
+    snapshots = _snapshots(db.execute(
+        select(MonthlyBalance, _MONTH_TOTAL)
+        .where(
+            MonthlyBalance.user_id == user_id,
+            MonthlyBalance.month == month,
+        )
+        .order_by(MonthlyBalance.account_id)
+    ).all())
+    if not snapshots:
+        raise HTTPException(status_code=404, detail="该月份暂无记录")
+    return snapshots[0]
+
+
 @router.get("/balances/{month}", response_model=MonthlySnapshotRead)
 def get_month(
     month: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    items = (
-        db.query(MonthlyBalance)
-        .filter(
-            MonthlyBalance.user_id == current_user.id,
-            MonthlyBalance.month == month,
-        )
-        .order_by(MonthlyBalance.account_id)
-        .all()
+    return _query_month(db, current_user.id, month)
+
+
+# ── 创建/更新某月余额（upsert） ────────────────────────────────────────────────
+
+def _balance_upsert_stmt(rows: list[dict]):
+    """
+    INSERT ... ON CONFLICT(user_id, month, account_id) DO UPDATE
+    冲突目标即唯一约束 uq_balance_user_month_account，多行一次写入。
+    """
+    stmt = sqlite_insert(MonthlyBalance).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[MonthlyBalance.user_id, MonthlyBalance.month, MonthlyBalance.account_id],
+        set_={
+            "balance": stmt.excluded.balance,
+            "account_name": stmt.excluded.account_name,
+            "updated_at": func.now(),
+        },
     )
-    if not items:
-        raise HTTPException(status_code=404, detail="该月份暂无记录")
-    total = round(sum(i.balance for i in items), 2)
+
+
+def _upsert_balances_tx(db: Session, user_id: int, payload: MonthlyBalanceUpsert) -> MonthlySnapshotRead:
+    """
+    写队列中执行：upsert 指定月份的账户余额并返回该月快照。
+    无论账户数量多少，固定 3 条语句：校验账户、单条 ON CONFLICT upsert（RETURNING）、
+    读取本次未涉及的其余账户。
+    """
+    acc_map = dict(db.execute(
+        select(Account.id, Account.name).where(
+            Account.user_id == user_id,
+            Account.is_active == True,  # noqa: E712
+        )
+    ).all())
+
+    for item in payload.balances:
+        if item.account_id not in acc_map:
+            raise HTTPException(status_code=400, detail=f"无效的账户 ID: {item.account_id}")
+
+    rows = [
+        {
+            "user_id": user_id,
+            "month": payload.month,
+            "account_id": item.account_id,
+            "account_name": acc_map[item.account_id],
+            "balance": item.balance,
+        }
+        for item in payload.balances
+    ]
+    returned = db.execute(
+        _balance_upsert_stmt(rows).returning(
+            MonthlyBalance.account_id,
+            MonthlyBalance.account_name,
+            MonthlyBalance.balance,
+            MonthlyBalance.updated_at,
+        )
+    ).all()
+
+    # 同一账户在 payload 中重复出现时以最后一次为准
+    items = {r.account_id: MonthlyBalanceRead.model_validate(r) for r in returned}
+    others = db.execute(
+        select(
+            MonthlyBalance.account_id,
+            MonthlyBalance.account_name,
+            MonthlyBalance.balance,
+            MonthlyBalance.updated_at,
+        ).where(
+            MonthlyBalance.user_id == user_id,
+            MonthlyBalance.month == payload.month,
+            MonthlyBalance.account_id.not_in(list(items)),
+        )
+    ).all()
+    for r in others:
+        items[r.account_id] = MonthlyBalanceRead.model_validate(r)
+
+    ordered = [items[k] for k in sorted(items)]
+    # 该月全部记录已在内存中，直接写入汇总行（只累加启用账户）
+    active = [i for i in ordered if i.account_id in acc_map]
+    upsert_monthly_total(db, user_id, payload.month, sum(i.balance for i in active), len(active))
     return MonthlySnapshotRead(
-        month=month,
-        total=total,
-        items=[MonthlyBalanceRead.model_validate(i) for i in items],
+        month=payload.month,
+        total=round(sum(i.balance for i in ordered), 2),
+        items=ordered,
     )
 
 
-# ── 创建/更新某月余额（upsert） ────────────────────────────────────────────────
-
 @router.post("/balances", response_model=MonthlySnapshotRead, status_code=status.HTTP_200_OK)
 def upsert_balances(
     payload: MonthlyBalanceUpsert,
-    db: Session = Depends(get_db),
+    writer: WriteExecutor = Depends(get_write_executor),
     current_user: User = Depends(get_current_user),
 ):
     """
     创建或更新指定月份的账户余额。
     若该月该账户已有记录则更新，否则插入。
     """
-    accs = db.query(Account).filter(
-        Account.user_id == current_user.id,
-        Account.is_active == True,  # noqa: E712
-    ).all()
-    acc_map = {a.id: a.name for a in accs}
-
-    for item in payload.balances:
-        if item.account_id not in acc_map:
-            raise HTTPException(status_code=400, detail=f"无效的账户 ID: {item.account_id}")
+    return writer.run(_upsert_balances_tx, current_user.id, payload)
 
-        existing = db.query(MonthlyBalance).filter(
-            MonthlyBalance.user_id == current_user.id,
-            MonthlyBalance.month == payload.month,
-            MonthlyBalance.account_id == item.account_id,
-        ).first()
-
-        if existing:
-            existing.balance = item.balance
-            existing.account_name = acc_map[item.account_id]
-        else:
-            db.add(MonthlyBalance(
-                user_id=current_user.id,
-                month=payload.month,
-                account_id=item.account_id,
-                account_name=acc_map[item.account_id],
-                balance=item.balance,
-            ))
 
-    db.commit()
-    return get_month(payload.month, db, current_user)
+# ── 删除某月全部记录 ───────────────────────────────────────────────────────────
 
+def _delete_month_tx(db: Session, user_id: int, month: str) -> None:
+    """写队列中执行：删除某月全部余额记录及其汇总行。"""
+    deleted = db.query(MonthlyBalance).filter(
+        MonthlyBalance.user_id == user_id,
+        MonthlyBalance.month == month,
+    ).delete()
+    if not deleted:
+        raise HTTPException(status_code=404, detail="该月份暂无记录")
+    delete_monthly_total(db, user_id, month)
 
-# ── 删除某月全部记录 ───────────────────────────────────────────────────────────
 
 @router.delete("/balances/{month}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_month(
     month: str,
-    db: Session = Depends(get_db),
+    writer: WriteExecutor = Depends(get_write_executor),
     current_user: User = Depends(get_current_user),
 ):
-    deleted = db.query(MonthlyBalance).filter(
-        MonthlyBalance.user_id == current_user.id,
-        MonthlyBalance.month == month,
-    ).delete()
-    if not deleted:
-        raise HTTPException(status_code=404, detail="该月份暂无记录")
-    db.commit()
+    writer.run(_delete_month_tx, current_user.id, month)
 
 
 # ── 趋势统计（折线图） ─────────────────────────────────────────────────────────
 
-@router.get("/stats/trend", response_model=list[AccountTrendRead])
-def get_trend(
-    months: int = Query(12, ge=1, le=60, description="最近 N 个月"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    """
-    返回各账户余额趋势 + 总资产趋势。
-    结果末尾附加一条「总资产」合计折线（account_id=0）。
-    """
-    month_rows = (
-        db.query(MonthlyBalance.month)
-        .filter(MonthlyBalance.user_id == current_user.id)
-        .distinct()
-        .order_by(MonthlyBalance.month.desc())
+def _query_trend(db: Session, user_id: int, months: int) -> list[AccountTrendRead]:
+    # 月份窗口与总资产直接取自 monthly_totals
+    month_totals = dict(db.execute(
+        select(MonthlyTotal.month, MonthlyTotal.total)
+        .where(MonthlyTotal.user_id == user_id)
+        .order_by(MonthlyTotal.month.desc())
         .limit(months)
-        .all()
-    )
-    if not month_rows:
+    ).tuples().all())
+    if not month_totals:
         return []
 
-    sorted_months = sorted(m for (m,) in month_rows)
+    sorted_months = sorted(month_totals)
 
     records = (
         db.query(MonthlyBalance)
         .filter(
-            MonthlyBalance.user_id == current_user.id,
+            MonthlyBalance.user_id == user_id,
             MonthlyBalance.month.in_(sorted_months),
         )
         .all()
@@ -310,7 +398,7 @@ def get_trend(
 
     accs = (
         db.query(Account)
-        .filter(Account.user_id == current_user.id, Account.is_active == True)  # noqa: E712
+        .filter(Account.user_id == user_id, Account.is_active == True)  # noqa: E712
         .order_by(Account.sort_order, Account.id)
         .all()
     )
@@ -334,10 +422,7 @@ def get_trend(
         ))
 
     total_points = [
-        TrendPoint(
-            month=m,
-            value=round(sum(data[a.id].get(m, 0.0) for a in accs), 2),
-        )
+        TrendPoint(month=m, value=round(month_totals[m], 2))
         for m in sorted_months
     ]
     result.append(AccountTrendRead(
@@ -349,6 +434,19 @@ def get_trend(
     return result
 
 
+@router.get("/stats/trend", response_model=list[AccountTrendRead])
+async def get_trend(
+    months: int = Query(12, ge=1, le=60, description="最近 N 个月"),
+    db: ReadSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_async),
+):
+    """
+    返回各账户余额趋势 + 总资产趋势。
+    结果末尾附加一条「总资产」合计折线（account_id=0）。
+    """
+    return await run_read(db, _query_trend, current_user.id, months)
+
+
 # ── 年度趋势统计（折线图） ─────────────────────────────────────────────────────
 
 @router.get("/stats/trend/yearly", response_model=list[AccountTrendRead])
@@ -362,20 +460,15 @@ def get_trend_yearly(
     每年取该年最后一个有记录的月份的余额作为年末值。
     结果末尾附加一条「总资产」合计折线（account_id=0）。
     """
-    from sqlalchemy import func as sqlfunc
-
-    # 取最近 N 年有数据的年份（升序）
-    all_months_q = (
-        db.query(MonthlyBalance.month)
-        .filter(MonthlyBalance.user_id == current_user.id)
-        .distinct()
-        .order_by(MonthlyBalance.month.desc())
-        .all()
-    )
-    if not all_months_q:
+    # 取最近 N 年有数据的年份（升序）；月份与总资产直接取自 monthly_totals
+    month_totals = dict(db.execute(
+        select(MonthlyTotal.month, MonthlyTotal.total)
+        .where(MonthlyTotal.user_id == current_user.id)
+    ).tuples().all())
+    if not month_totals:
         return []
 
-    all_months_list = sorted(m for (m,) in all_months_q)
+    all_months_list = sorted(month_totals)
 
     # 提取年份并限制到最近 N 年
     all_years_set = sorted({m[:4] for m in all_months_list}, reverse=True)[:years]
@@ -429,10 +522,7 @@ def get_trend_yearly(
         ))
 
     total_points = [
-        TrendPoint(
-            month=x_labels[i],
-            value=round(sum(data[a.id].get(m, 0.0) for a in accs), 2),
-        )
+        TrendPoint(month=x_labels[i], value=round(month_totals[m], 2))
         for i, m in enumerate(sorted_year_months)
     ]
     result.append(AccountTrendRead(
@@ -446,6 +536,57 @@ def get_trend_yearly(
 
 # ── CSV 导出 ───────────────────────────────────────────────────────────────────
 
+_EXPORT_YIELD_PER = 1000            # 导出时每批从游标取出的行数
+_EXPORT_FLUSH_BYTES = 64 * 1024     # 缓冲区累积到该大小时向客户端输出一块
+
+
+def _iter_export_csv(bind, user_id: int, accs: list[tuple[int, str]]) -> Iterator[bytes]:
+    """
+    逐月生成导出 CSV 的字节块。
+    余额行按月份顺序以 yield_per 分批读取，每凑齐一个月就转成一行，
+    缓冲区超过 _EXPORT_FLUSH_BYTES 即输出，内存占用只与单月数据量有关。
+    依赖注入的会话在响应开始发送前就会关闭，因此这里使用独立会话。
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write("\ufeff")  # UTF-8 with BOM so Excel opens correctly
+    writer.writerow(["月份"] + [name for _, name in accs] + ["总资产"])
+
+    def month_row(month: str, month_data: dict[int, float]) -> list:
+        row: list = [month]
+        total = 0.0
+        for acc_id, _ in accs:
+            v = month_data.get(acc_id, 0.0)
+            row.append(v)
+            total += v
+        row.append(round(total, 2))
+        return row
+
+    with Session(bind=bind) as session:
+        rows = session.execute(
+            select(MonthlyBalance.month, MonthlyBalance.account_id, MonthlyBalance.balance)
+            .where(MonthlyBalance.user_id == user_id)
+            .order_by(MonthlyBalance.month.asc())
+            .execution_options(yield_per=_EXPORT_YIELD_PER)
+        )
+        current: str | None = None
+        month_data: dict[int, float] = {}
+        for month, account_id, balance in rows:
+            if month != current:
+                if current is not None:
+                    writer.writerow(month_row(current, month_data))
+                    if buf.tell() >= _EXPORT_FLUSH_BYTES:
+                        yield buf.getvalue().encode("utf-8")
+                        buf.seek(0)
+                        buf.truncate()
+                current, month_data = month, {}
+            month_data[account_id] = balance
+        if current is not None:
+            writer.writerow(month_row(current, month_data))
+
+    yield buf.getvalue().encode("utf-8")
+
+
 @router.get("/export/csv")
 def export_csv(
     db: Session = Depends(get_db),
@@ -454,54 +595,19 @@ def export_csv(
     """
     导出所有月份余额数据为 CSV 文件（UTF-8 with BOM，Excel 可直接打开）。
     格式：月份,账户1,账户2,...,总资产
+    按月流式生成，边查询边输出。
     """
-    accs = (
-        db.query(Account)
+    accs = [
+        (a.id, a.name)
+        for a in db.query(Account)
         .filter(Account.user_id == current_user.id, Account.is_active == True)  # noqa: E712
         .order_by(Account.sort_order, Account.id)
         .all()
-    )
-
-    months_q = (
-        db.query(MonthlyBalance.month)
-        .filter(MonthlyBalance.user_id == current_user.id)
-        .distinct()
-        .order_by(MonthlyBalance.month.asc())
-        .all()
-    )
-    all_months = [m for (m,) in months_q]
-
-    records = (
-        db.query(MonthlyBalance)
-        .filter(MonthlyBalance.user_id == current_user.id)
-        .all()
-    )
-    bal_map: dict[str, dict[int, float]] = {}
-    for r in records:
-        bal_map.setdefault(r.month, {})[r.account_id] = r.balance
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    header = ["月份"] + [a.name for a in accs] + ["总资产"]
-    writer.writerow(header)
-
-    for month in all_months:
-        month_data = bal_map.get(month, {})
-        row = [month]
-        total = 0.0
-        for a in accs:
-            v = month_data.get(a.id, 0.0)
-            row.append(v)
-            total += v
-        row.append(round(total, 2))
-        writer.writerow(row)
+    ]
 
-    # UTF-8 with BOM so Excel opens correctly
-    csv_bytes = ("\ufeff" + output.getvalue()).encode("utf-8")
     filename = f"balance_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     return StreamingResponse(
-        io.BytesIO(csv_bytes),
+        _iter_export_csv(db.get_bind(), current_user.id, accs),
         media_type="text/csv; charset=utf-8",
         headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
@@ -516,6 +622,9 @@ _DATE_RE = re.compile(r"^(\d{4})[/\-](\d{1,2})[/\-]\d{1,2}$")
 # 总计列（导入时忽略）
 _TOTAL_COLS = {"月份", "总资产", "总额", ""}
 
+_READ_BYTES = 64 * 1024         # 流式解码每次读取的字节数
+_IMPORT_CHUNK_CELLS = 500       # 每块批量写入的单元格数（每格 5 个参数，远低于 SQLite 参数上限）
+
 
 def _normalize_month(raw: str) -> str:
     """
@@ -532,56 +641,154 @@ def _normalize_month(raw: str) -> str:
     return s
 
 
-@router.post("/import/csv", status_code=status.HTTP_200_OK)
-def import_csv(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
+def _sniff_encoding(stream: BinaryIO) -> tuple[str, str]:
     """
-    导入 CSV 文件覆盖余额数据。
-    期望格式：月份,账户1,账户2,...（与导出格式一致，忽略「总资产」列）。
-    未识别的账户名称将自动创建。
+    判断编码：整个文件都能按 UTF-8 解码则用 utf-8-sig（兼容 BOM），否则整个文件按 GBK 容错解码。
+    按块校验全部内容（不保留解码结果，内存占用与文件大小无关），不能只看开头：
+    表头是 ASCII、后面才出现 GBK 字节的文件同样要整体按 GBK 处理。读取后把流位置复位到开头。
     """
-    content = file.file.read()
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
     try:
-        text = content.decode("utf-8-sig")
+        while chunk := stream.read(_READ_BYTES):
+            decoder.decode(chunk)
+        decoder.decode(b"", final=True)
     except UnicodeDecodeError:
-        text = content.decode("gbk", errors="replace")
-
-    reader = csv.DictReader(io.StringIO(text))
-    if not reader.fieldnames:
-        raise HTTPException(status_code=400, detail="CSV 文件为空或格式不正确")
+        return "gbk", "replace"
+    finally:
+        stream.seek(0)
+    return "utf-8-sig", "strict"
+
+
+def _iter_text_lines(stream: BinaryIO, encoding: str, errors: str) -> Iterator[str]:
+    """按块读取字节并增量解码，逐行产出文本（保留换行符，供 csv 处理引号内换行）。"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    pending = ""
+    while True:
+        chunk = stream.read(_READ_BYTES)
+        pending += decoder.decode(chunk, final=not chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+        if not chunk:
+            break
+    if pending:
+        yield pending
+
+
+def _log_import_progress(chunk_no: int, rows_read: int, stats: dict) -> None:
+    logger.info(
+        "CSV import chunk %d: rows=%d inserted=%d updated=%d skipped=%d",
+        chunk_no, rows_read, stats["inserted"], stats["updated"], stats["skipped"],
+    )
 
-    acc_columns = [f for f in reader.fieldnames if f not in _TOTAL_COLS]
 
-    # 确保账户名称都存在（不存在则自动创建）
+def _prepare_import_accounts_tx(
+    db: Session, user_id: int, acc_columns: list[str]
+) -> tuple[dict[str, tuple[int, str]], bool]:
+    """
+    写队列中执行：确保 CSV 中的账户都存在且有效（不存在则自动创建，已删除的恢复）。
+    返回 列名 → (account_id, account_name)，以及是否恢复了已删除的账户。
+    """
     acc_map: dict[str, Account] = {}
-    for a in db.query(Account).filter(Account.user_id == current_user.id).all():
+    for a in db.query(Account).filter(Account.user_id == user_id).all():
         acc_map[a.name] = a
 
+    reactivated = False
     for col in acc_columns:
         if col not in acc_map or not acc_map[col].is_active:
             if col in acc_map and not acc_map[col].is_active:
                 acc_map[col].is_active = True
+                reactivated = True
             else:
                 new_acc = Account(
-                    user_id=current_user.id,
+                    user_id=user_id,
                     name=col,
                     sort_order=len([a for a in acc_map.values() if a.is_active]),
                 )
                 db.add(new_acc)
                 db.flush()
                 acc_map[col] = new_acc
+    db.flush()
+    return {col: (acc_map[col].id, acc_map[col].name) for col in acc_columns}, reactivated
+
+
+def _import_chunk_tx(
+    db: Session, user_id: int, cells: list[tuple[str, int, str, float]]
+) -> set[tuple[str, int]]:
+    """
+    写队列中执行：一次查询预取该块涉及月份的已有键，再用一条 ON CONFLICT 语句批量写入，
+    并刷新这些月份的 monthly_totals。返回写入前已存在的 (month, account_id)，供调用方区分 inserted / updated。
+    """
+    months = {c[0] for c in cells}
+    existing = set(db.execute(
+        select(MonthlyBalance.month, MonthlyBalance.account_id).where(
+            MonthlyBalance.user_id == user_id,
+            MonthlyBalance.month.in_(months),
+        )
+    ).tuples().all())
+    rows: dict[tuple[str, int], dict] = {}
+    for month, account_id, account_name, balance in cells:
+        rows[(month, account_id)] = {
+            "user_id": user_id,
+            "month": month,
+            "account_id": account_id,
+            "account_name": account_name,
+            "balance": balance,
+        }
+    db.execute(_balance_upsert_stmt(list(rows.values())))
+    refresh_monthly_totals(db, user_id, months)
+    return existing
+
+
+def _import_csv(
+    writer: WriteExecutor,
+    user_id: int,
+    stream: BinaryIO,
+    progress: Callable[[int, int, dict], None] = _log_import_progress,
+) -> dict:
+    """
+    流式解析上传的 CSV 并 upsert 余额，返回导入统计。
 
-    inserted = 0
-    updated = 0
-    skipped = 0
+    流水线：判断编码（先按块扫一遍全文件）→ 增量解码 → csv 逐行解析 → 每累计 _IMPORT_CHUNK_CELLS 个单元格为一块，
+    每块作为一个写任务、一个事务提交（_import_chunk_tx）。解析在调用线程中进行，
+    写线程只在写块时被占用，块与块之间其他写请求可以插队；内存占用与文件大小无关。
+    导入不是全有或全无：中途失败时已提交的块保留，重新导入同一文件（upsert）即可补全。
+    每块写入后调用 progress(chunk_no, rows_read, stats) 汇报进度。
+    """
+    encoding, errors = _sniff_encoding(stream)
+    reader = csv.DictReader(_iter_text_lines(stream, encoding, errors))
+    fieldnames = reader.fieldnames
+    if not fieldnames:
+        raise HTTPException(status_code=400, detail="CSV 文件为空或格式不正确")
+
+    acc_columns = [f for f in fieldnames if f not in _TOTAL_COLS]
+    col_accounts, reactivated = writer.run(_prepare_import_accounts_tx, user_id, acc_columns)
+
+    stats = {"inserted": 0, "updated": 0, "skipped": 0}
+    written: set[tuple[str, int]] = set()   # 本次导入已写入的键
+    cells: list[tuple[str, int, str, float]] = []
+    chunk_no = 0
+    rows_read = 0
+
+    def flush_chunk() -> None:
+        nonlocal chunk_no
+        existing = writer.run(_import_chunk_tx, user_id, list(cells))
+        for month, account_id, _, _ in cells:
+            key = (month, account_id)
+            if key in existing or key in written:
+                stats["updated"] += 1
+            else:
+                stats["inserted"] += 1
+            written.add(key)
+        cells.clear()
+        chunk_no += 1
+        progress(chunk_no, rows_read, stats)
 
     for row in reader:
+        rows_read += 1
         month = _normalize_month(row.get("月份") or "")
         if not _MONTH_RE.match(month):
-            skipped += 1
+            stats["skipped"] += 1
             continue
 
         for col in acc_columns:
@@ -591,33 +798,37 @@ def import_csv(
             try:
                 balance = float(raw.replace(",", ""))
             except ValueError:
-                skipped += 1
+                stats["skipped"] += 1
                 continue
 
             if balance < 0:
-                skipped += 1
+                stats["skipped"] += 1
                 continue
 
-            acc = acc_map[col]
-            existing = db.query(MonthlyBalance).filter(
-                MonthlyBalance.user_id == current_user.id,
-                MonthlyBalance.month == month,
-                MonthlyBalance.account_id == acc.id,
-            ).first()
-
-            if existing:
-                existing.balance = balance
-                existing.account_name = acc.name
-                updated += 1
-            else:
-                db.add(MonthlyBalance(
-                    user_id=current_user.id,
-                    month=month,
-                    account_id=acc.id,
-                    account_name=acc.name,
-                    balance=balance,
-                ))
-                inserted += 1
-
-    db.commit()
-    return {"inserted": inserted, "updated": updated, "skipped": skipped}
+            account_id, account_name = col_accounts[col]
+            cells.append((month, account_id, account_name, balance))
+
+        if len(cells) >= _IMPORT_CHUNK_CELLS:
+            flush_chunk()
+
+    if cells:
+        flush_chunk()
+    if reactivated:
+        # 恢复的账户重新计入历史月份的总额
+        writer.run(refresh_monthly_totals, user_id)
+
+    return {**stats, "chunks": chunk_no}
+
+
+@router.post("/import/csv", status_code=status.HTTP_200_OK)
+def import_csv(
+    file: UploadFile = File(...),
+    writer: WriteExecutor = Depends(get_write_executor),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    导入 CSV 文件覆盖余额数据。
+    期望格式：月份,账户1,账户2,...（与导出格式一致，忽略「总资产」列）。
+    未识别的账户名称将自动创建。
+    """
+    return _import_csv(writer, current_user.id, file.file)
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends
+
+from app.core.password_pool import PasswordPool, get_password_pool
+from app.core.rate_limit import LoginThrottle, get_login_throttle
+from app.core.security import token_cache
+from app.core.user_cache import user_cache
+from app.core.write_queue import WriteExecutor
+from app.db import get_write_executor
+from app.deps import require_admin
+from app.models.user import User
+
+router = APIRouter()
+
+
+@router.get("", summary="运行时指标")
+def get_metrics(
+    writer: WriteExecutor = Depends(get_write_executor),
+    pool: PasswordPool = Depends(get_password_pool),
+    throttle: LoginThrottle = Depends(get_login_throttle),
+    _: User = Depends(require_admin),
+):
+    """返回进程内各组件的运行指标（写队列深度、排队等待时间、缓存命中率等）。"""
+    return {
+        "write_queue": writer.stats(),
+        "user_cache": user_cache.stats(),
+        "jwt_cache": token_cache.stats(),
+        "password_pool": pool.stats(),
+        "login_throttle": throttle.stats(),
+    }
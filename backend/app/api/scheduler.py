@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.core.scheduler import job_summaries
+from app.db import get_db
+from app.deps import require_admin
+from app.models.user import User
+
+router = APIRouter()
+
+
+@router.get("/jobs", summary="定时任务运行情况")
+def list_jobs(db: Session = Depends(get_db), _: User = Depends(require_admin)):
+    """各定时任务的下次运行时间、最近一次运行结果与耗时，以及最近若干次运行的耗时 p95、失败与错过次数。"""
+    return job_summaries(db)
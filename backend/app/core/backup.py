@@ -0,0 +1,479 @@
+"""
+backup.py — SQLite 在线备份
+
+用 sqlite3 的 backup API 按页复制数据库，代替直接复制库文件：
+  - 复制的是某一时刻一致的快照，不会拷到写了一半的事务（WAL 模式下也会包含尚未 checkpoint 的页）
+  - 每次只复制 pages_per_step 页，两步之间释放读锁并休眠 step_sleep_ms，写入方不会被长时间阻塞
+  - 先写到 <目标>.part，完成后再改名，备份目录里不会出现不完整的文件
+
+备份期间如果有其他连接写库，SQLite 会在下一步从头开始复制。重启超过 max_restarts 次后
+改为一步复制剩余全部页，避免写入频繁时迟迟无法完成。
+
+备份打包时（create_backup / backup_chain）目标是内存库，完成后 serialize() 出整个库的字节，
+直接按块流式压缩（gzip 来自标准库；安装了 zstandard 时可用 zstd），不在磁盘上写未压缩的中间快照，
+同一遍读写中计算压缩后文件的 SHA-256。代价是内存中暂存一份与库同样大小的快照：库文件（含 WAL）
+超过 memory_limit_bytes，或 Python 3.10 没有 Connection.serialize 时，退回先备份到临时文件再压缩。
+SHA-256 写入 BackupLog，并在备份旁生成 sha256sum 格式的 <备份>.sha256，库损坏时也能独立校验。
+恢复时先校验 SHA-256，再流式解压并检查 integrity_check，最后改名覆盖目标（在 backend/ 目录下）：
+    python -m app.core.backup restore backups/ai_platform_20240101_020000.db.gz --force
+增量备份（.inc*）见 backup_chain，还原时自动先还原其全量基线；校验备份目录中的全部备份链：
+    python -m app.core.backup verify
+"""
+import argparse
+import hashlib
+import io
+import logging
+import sqlite3
+import time
+import zlib
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+try:
+    import zstandard
+except ImportError:     # 可选依赖，未安装时只能使用 gzip
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = "ai_platform_"
+COMPRESSION_SUFFIXES = {"none": ".db", "gzip": ".db.gz", "zstd": ".db.zst"}
+INCREMENT_SUFFIXES = {"none": ".inc", "gzip": ".inc.gz", "zstd": ".inc.zst"}
+CHUNK_SIZE = 1 << 20
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+MEMORY_SNAPSHOT_LIMIT = 256 << 20    # 库文件超过该大小时快照落盘，不在内存中暂存
+
+
+@dataclass
+class BackupResult:
+    path: Path
+    file_size: int
+    pages_copied: int       # 备份完成时数据库的总页数
+    restarts: int           # 因源库被修改而重新开始的次数
+    duration_ms: int
+    original_size: int = 0              # 压缩前（数据库快照）的大小
+    compression: str = "none"
+    sha256: Optional[str] = None        # 备份文件（压缩后）的 SHA-256
+    kind: str = "full"                  # full | incremental
+    base: Optional[Path] = None         # 增量备份所依赖的全量备份
+    changed_pages: Optional[int] = None # 增量备份中记录的页数
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def sqlite_path(url: str) -> Path:
+    """sqlite:///path → Path(path)"""
+    return Path(url.replace("sqlite:///", ""))
+
+
+def _copy_pages(
+    source: sqlite3.Connection,
+    target: sqlite3.Connection,
+    src: Path,
+    pages_per_step: int,
+    step_sleep_ms: int,
+    max_restarts: int,
+) -> tuple[int, int]:
+    """用 backup API 分步把 source 复制到 target，返回 (总页数, 重新开始的次数)。"""
+    state = {"pages": 0, "remaining": None, "restarts": 0}
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        # 正常情况下 remaining 逐步减少；不减反增说明源库被修改、复制重新开始
+        if state["remaining"] is not None and remaining >= state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > max_restarts:
+                raise _TooManyRestarts
+        state["pages"] = total
+        state["remaining"] = remaining
+        # Connection.backup 只在 BUSY/LOCKED 时才休眠，步与步之间的让步由这里完成
+        if remaining and step_sleep_ms:
+            time.sleep(step_sleep_ms / 1000)
+
+    try:
+        source.backup(target, pages=pages_per_step, progress=progress)
+    except _TooManyRestarts:
+        logger.info("Backup of %s restarted %d times; copying the rest in one step.",
+                    src, max_restarts)
+        state["remaining"] = None
+        source.backup(target, pages=-1, progress=lambda status, remaining, total:
+                      state.update(pages=total))
+    return state["pages"], min(state["restarts"], max_restarts)
+
+
+def backup_sqlite(
+    src: Path,
+    dest: Path,
+    pages_per_step: int = 256,
+    step_sleep_ms: int = 10,
+    max_restarts: int = 3,
+    busy_timeout_ms: int = 5000,
+) -> BackupResult:
+    """把 src 数据库在线备份到 dest，返回页数与耗时。"""
+    tmp = dest.with_name(dest.name + ".part")
+    tmp.unlink(missing_ok=True)
+
+    start = time.perf_counter()
+    try:
+        with closing(sqlite3.connect(str(src), timeout=busy_timeout_ms / 1000)) as source, \
+                closing(sqlite3.connect(str(tmp))) as target:
+            pages, restarts = _copy_pages(source, target, src, pages_per_step, step_sleep_ms, max_restarts)
+        tmp.replace(dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    duration_ms = round((time.perf_counter() - start) * 1000)
+
+    return BackupResult(
+        path=dest,
+        file_size=dest.stat().st_size,
+        pages_copied=pages,
+        restarts=restarts,
+        duration_ms=duration_ms,
+        original_size=dest.stat().st_size,
+    )
+
+
+def _database_size(src: Path) -> int:
+    """库文件加上尚未 checkpoint 的 WAL 的大小（快照大小的上限估计）。"""
+    wal = src.with_name(src.name + "-wal")
+    return src.stat().st_size + (wal.stat().st_size if wal.exists() else 0)
+
+
+def _memory_snapshot(
+    src: Path, pages_per_step: int, step_sleep_ms: int, max_restarts: int, busy_timeout_ms: int
+) -> tuple[bytes, int, int]:
+    """在线备份到内存库并 serialize()，返回 (库文件字节, 总页数, 重新开始的次数)。"""
+    with closing(sqlite3.connect(str(src), timeout=busy_timeout_ms / 1000)) as source, \
+            closing(sqlite3.connect(":memory:")) as target:
+        # 内存库不能在备份过程中改变页大小（会报 SQLITE_READONLY），先设成与源库一致
+        page_size = source.execute("PRAGMA page_size").fetchone()[0]
+        target.execute(f"PRAGMA page_size = {int(page_size)}")
+        pages, restarts = _copy_pages(source, target, src, pages_per_step, step_sleep_ms, max_restarts)
+        return target.serialize(), pages, restarts
+
+
+@contextmanager
+def sqlite_snapshot(
+    src: Path,
+    scratch: Path,
+    pages_per_step: int = 256,
+    step_sleep_ms: int = 10,
+    max_restarts: int = 3,
+    busy_timeout_ms: int = 5000,
+    memory_limit_bytes: int = MEMORY_SNAPSHOT_LIMIT,
+) -> Iterator[tuple[BinaryIO, BackupResult]]:
+    """
+    在线备份 src，产出从头读取快照的流与备份结果（页数、重新开始次数、快照大小）。
+    快照放在内存中；库超过 memory_limit_bytes 或没有 Connection.serialize（Python 3.10）时
+    备份到临时文件 scratch，退出时删除。
+    """
+    start = time.perf_counter()
+    if hasattr(sqlite3.Connection, "serialize") and _database_size(src) <= memory_limit_bytes:
+        image, pages, restarts = _memory_snapshot(src, pages_per_step, step_sleep_ms, max_restarts, busy_timeout_ms)
+        result = BackupResult(
+            path=scratch,
+            file_size=len(image),
+            pages_copied=pages,
+            restarts=restarts,
+            duration_ms=round((time.perf_counter() - start) * 1000),
+            original_size=len(image),
+        )
+        with io.BytesIO(image) as stream:     # 与 image 共用缓冲区，不再复制一份
+            yield stream, result
+        return
+
+    try:
+        result = backup_sqlite(src, scratch, pages_per_step, step_sleep_ms, max_restarts, busy_timeout_ms)
+        with open(scratch, "rb") as stream:
+            yield stream, result
+    finally:
+        scratch.unlink(missing_ok=True)
+
+
+class _Passthrough:
+    """不压缩时与压缩对象相同的接口。"""
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    decompress = compress
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def resolve_compression(name: str) -> str:
+    """auto → 有 zstandard 用 zstd，否则 gzip；指定 zstd 但未安装时退回 gzip。"""
+    if name == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if name not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"不支持的备份压缩方式：{name}")
+    if name == "zstd" and zstandard is None:
+        logger.warning("zstandard is not installed; falling back to gzip backups.")
+        return "gzip"
+    return name
+
+
+def compression_of(path: Path) -> str:
+    """按文件后缀判断备份的压缩方式。"""
+    if path.name.endswith(".gz"):
+        return "gzip"
+    if path.name.endswith(".zst"):
+        return "zstd"
+    return "none"
+
+
+def is_increment(path: Path) -> bool:
+    return any(path.name.endswith(suffix) for suffix in INCREMENT_SUFFIXES.values())
+
+
+def _compressor(compression: str):
+    if compression == "gzip":
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)     # wbits=31：gzip 格式，可用 gunzip 解压
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return _Passthrough()
+
+
+def _decompressor(compression: str):
+    if compression == "gzip":
+        return zlib.decompressobj(31)
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("恢复 zstd 备份需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompressobj()
+    return _Passthrough()
+
+
+def iter_stream(stream: BinaryIO) -> Iterator[bytes]:
+    while chunk := stream.read(CHUNK_SIZE):
+        yield chunk
+
+
+def iter_file(path: Path) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        yield from iter_stream(f)
+
+
+def iter_decompressed(path: Path) -> Iterator[bytes]:
+    """按块流式解压备份文件。"""
+    decompressor = _decompressor(compression_of(path))
+    for chunk in iter_file(path):
+        out = decompressor.decompress(chunk)
+        if out:
+            yield out
+    out = decompressor.flush()
+    if out:
+        yield out
+
+
+def write_compressed(chunks: Iterable[bytes], dest: Path, compression: str) -> tuple[int, str]:
+    """
+    把 chunks 压缩写入 dest（经由 .part 改名），同一遍中计算写出内容的 SHA-256。
+    返回 (压缩后大小, sha256)。
+    """
+    tmp = dest.with_name(dest.name + ".part")
+    digest = hashlib.sha256()
+    compressor = _compressor(compression)
+    size = 0
+    try:
+        with open(tmp, "wb") as fout:
+            for chunk in chunks:
+                out = compressor.compress(chunk)
+                if out:
+                    digest.update(out)
+                    fout.write(out)
+                    size += len(out)
+            out = compressor.flush()
+            digest.update(out)
+            fout.write(out)
+            size += len(out)
+        tmp.replace(dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return size, digest.hexdigest()
+
+
+def stream_sha256(chunks: Iterable[bytes]) -> str:
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(path: Path) -> str:
+    return stream_sha256(iter_file(path))
+
+
+def checksum_path(backup: Path) -> Path:
+    return backup.with_name(backup.name + ".sha256")
+
+
+def read_checksum(backup: Path) -> Optional[str]:
+    """读取备份旁的 .sha256 文件（sha256sum 格式），不存在时返回 None。"""
+    sidecar = checksum_path(backup)
+    if not sidecar.exists():
+        return None
+    return sidecar.read_text(encoding="utf-8").split()[0]
+
+
+def new_backup_paths(backup_dir: Path, suffix: str) -> tuple[Path, Path]:
+    """按当前时间生成备份文件名（同一秒内已存在时追加序号），以及快照需要落盘时使用的临时路径。"""
+    stem = f"{BACKUP_PREFIX}{time.strftime('%Y%m%d_%H%M%S')}"
+    dest, n = backup_dir / f"{stem}{suffix}", 0
+    while dest.exists():
+        n += 1
+        dest = backup_dir / f"{stem}_{n}{suffix}"
+    return dest, backup_dir / f".{dest.name}.snapshot"
+
+
+def create_backup(
+    src: Path,
+    backup_dir: Path,
+    compression: str = "auto",
+    pages_per_step: int = 256,
+    step_sleep_ms: int = 10,
+    max_restarts: int = 3,
+    busy_timeout_ms: int = 5000,
+    memory_limit_bytes: int = MEMORY_SNAPSHOT_LIMIT,
+) -> BackupResult:
+    """在线备份 src 到 backup_dir，快照流式压缩写出，并写出 .sha256，返回备份结果。"""
+    compression = resolve_compression(compression)
+    dest, scratch = new_backup_paths(backup_dir, COMPRESSION_SUFFIXES[compression])
+
+    start = time.perf_counter()
+    with sqlite_snapshot(src, scratch, pages_per_step, step_sleep_ms, max_restarts, busy_timeout_ms,
+                         memory_limit_bytes) as (snapshot, result):
+        size, sha256 = write_compressed(iter_stream(snapshot), dest, compression)
+    checksum_path(dest).write_text(f"{sha256}  {dest.name}\n", encoding="utf-8")
+
+    result.path = dest
+    result.file_size = size
+    result.compression = compression
+    result.sha256 = sha256
+    result.duration_ms = round((time.perf_counter() - start) * 1000)
+    return result
+
+
+def list_backup_files(backup_dir: Path) -> list[Path]:
+    """备份目录中的全部备份文件（全量、增量，含旧的未压缩 .db），按修改时间倒序。"""
+    if not backup_dir.exists():
+        return []
+    suffixes = tuple(COMPRESSION_SUFFIXES.values()) + tuple(INCREMENT_SUFFIXES.values())
+    files = [f for f in backup_dir.glob(f"{BACKUP_PREFIX}*") if f.name.endswith(suffixes)]
+    return sorted(files, key=lambda f: f.stat().st_mtime, reverse=True)
+
+
+def verify_checksum(backup: Path, expected_sha256: Optional[str] = None) -> None:
+    """校验备份文件的 SHA-256（未指定时读取 .sha256 文件），不一致或缺少校验和时抛 ValueError。"""
+    expected = expected_sha256 or read_checksum(backup)
+    if not expected:
+        raise ValueError(f"{backup.name} 没有可用的 SHA-256 校验和")
+    actual = file_sha256(backup)
+    if actual != expected.lower():
+        raise ValueError(f"{backup.name} 校验和不匹配：期望 {expected}，实际 {actual}")
+
+
+def decompress_to(backup: Path, dest: Path) -> None:
+    with open(dest, "wb") as fout:
+        for chunk in iter_decompressed(backup):
+            fout.write(chunk)
+
+
+def restore_backup(backup: Path, dest: Path, expected_sha256: Optional[str] = None) -> int:
+    """
+    校验 backup 的 SHA-256，通过后流式解压到 dest；增量备份先还原其全量基线再写入变化的页。
+    还原结果须通过 integrity_check 才会改名覆盖 dest。返回还原后的数据库大小。
+    """
+    verify_checksum(backup, expected_sha256)
+    tmp = dest.with_name(dest.name + ".restore")
+    try:
+        if is_increment(backup):
+            from app.core.backup_chain import rebuild_increment
+
+            rebuild_increment(backup, tmp)
+        else:
+            decompress_to(backup, tmp)
+        size = tmp.stat().st_size
+        with closing(sqlite3.connect(str(tmp))) as conn:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if result != "ok":
+            raise ValueError(f"{backup.name} 解压后的数据库未通过 integrity_check：{result}")
+        tmp.replace(dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    # 旧库的 WAL / 共享内存文件与还原后的库不匹配，一并移除
+    for suffix in ("-wal", "-shm"):
+        dest.with_name(dest.name + suffix).unlink(missing_ok=True)
+    return size
+
+
+_BACKUP_LOG_COLUMNS = {
+    "pages_copied": "INTEGER",
+    "duration_ms": "INTEGER",
+    "original_size": "INTEGER",
+    "compression": "VARCHAR(8)",
+    "sha256": "VARCHAR(64)",
+    "backup_type": "VARCHAR(16)",
+    "base_file": "VARCHAR(512)",
+}
+
+
+def ensure_backup_log_columns(bind: Engine) -> list[str]:
+    """旧库升级：create_all 不会给已存在的 backup_logs 补列，缺少的列在这里补上，返回补上的列名。"""
+    columns = {c["name"] for c in inspect(bind).get_columns("backup_logs")}
+    missing = [name for name in _BACKUP_LOG_COLUMNS if name not in columns]
+    if missing:
+        with bind.begin() as conn:
+            for name in missing:
+                conn.execute(text(f"ALTER TABLE backup_logs ADD COLUMN {name} {_BACKUP_LOG_COLUMNS[name]}"))
+        logger.info("Added backup_logs column(s): %s", ", ".join(missing))
+    return missing
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="校验并还原数据库备份")
+    sub = parser.add_subparsers(dest="command", required=True)
+    restore = sub.add_parser("restore", help="校验 SHA-256 后解压还原")
+    restore.add_argument("backup", type=Path)
+    restore.add_argument("--to", type=Path, default=None, help="还原目标，默认为 DATABASE_URL 指向的库文件")
+    restore.add_argument("--sha256", default=None, help="期望的校验和，默认读取 <备份>.sha256")
+    restore.add_argument("--force", action="store_true", help="目标已存在时覆盖（请先停止服务）")
+    verify = sub.add_parser("verify", help="校验全部备份，并确认每个增量备份都能重建出与备份时逐字节相同的数据库")
+    verify.add_argument("--dir", type=Path, default=None, help="备份目录，默认为 BACKUP_DIR")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "verify":
+        from app.core.backup_chain import verify_backups
+
+        failures = 0
+        for path, error in verify_backups(args.dir or settings.BACKUP_DIR):
+            if error:
+                failures += 1
+                logger.error("FAILED %s: %s", path.name, error)
+            else:
+                logger.info("ok     %s", path.name)
+        raise SystemExit(1 if failures else 0)
+
+    dest = args.to or sqlite_path(settings.DATABASE_URL)
+    if dest.exists() and not args.force:
+        parser.error(f"{dest} 已存在，确认覆盖请加 --force")
+    size = restore_backup(args.backup, dest, args.sha256)
+    logger.info("Restored %s to %s (%d bytes).", args.backup, dest, size)
+
+
+if __name__ == "__main__":
+    main()
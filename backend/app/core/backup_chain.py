@@ -0,0 +1,266 @@
+"""
+backup_chain.py — 全量基线 + 增量备份
+
+每隔 full_interval_days 天做一次全量备份（backup.create_backup），其余日子只做增量：
+  1. 照常在线备份出一份快照（backup.sqlite_snapshot，默认在内存中，不落盘）
+  2. 与最近一次全量备份逐页比较（全量备份流式解压，与快照同步按页读取），只保留内容不同的页
+  3. 变化的页写入增量文件（与全量备份使用相同的压缩方式），同样生成 .sha256
+
+增量文件格式（压缩前）：
+    AIPINC1\n
+    {"base": 全量备份文件名, "base_sha256": ..., "page_size": ..., "page_count": ..., "db_sha256": 快照的 SHA-256}\n
+    重复：4 字节大端页号（从 1 开始）+ 一整页内容
+
+每个增量都只相对全量基线（差异备份），还原任一增量只需「基线 + 该增量」：先解压基线，再写入记录的页，
+按 page_count 截断，最后核对整个库文件的 SHA-256 与备份时的快照逐字节一致。
+页大小改变（VACUUM 后）、基线缺失或校验失败时自动改做全量备份。
+保留策略按链处理：还有未过期增量依赖的全量基线不会被删除。
+"""
+import json
+import logging
+import struct
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+from app.core.backup import (
+    INCREMENT_SUFFIXES,
+    MEMORY_SNAPSHOT_LIMIT,
+    BackupResult,
+    checksum_path,
+    create_backup,
+    decompress_to,
+    file_sha256,
+    is_increment,
+    iter_decompressed,
+    iter_stream,
+    list_backup_files,
+    new_backup_paths,
+    read_checksum,
+    resolve_compression,
+    sqlite_snapshot,
+    stream_sha256,
+    verify_checksum,
+    write_compressed,
+)
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"AIPINC1\n"
+_PAGE_NO = struct.Struct(">I")
+
+
+class _NeedFullBackup(Exception):
+    pass
+
+
+class _ChunkReader:
+    """把按块产出的字节流包装成可按长度 / 按行读取的流。"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buf = bytearray()
+
+    def _fill(self, n: int) -> None:
+        while len(self._buf) < n:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return
+            self._buf += chunk
+
+    def read(self, n: int) -> bytes:
+        self._fill(n)
+        out = bytes(self._buf[:n])
+        del self._buf[:n]
+        return out
+
+    def readline(self, limit: int = 1 << 16) -> bytes:
+        while b"\n" not in self._buf and len(self._buf) < limit:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buf += chunk
+        end = self._buf.find(b"\n")
+        end = len(self._buf) if end < 0 else end + 1
+        out = bytes(self._buf[:end])
+        del self._buf[:end]
+        return out
+
+
+def page_size_of(header: bytes) -> int:
+    """从数据库文件头（前 100 字节）读出页大小；偏移 16 处的 1 表示 65536。"""
+    if len(header) < 100 or not header.startswith(b"SQLite format 3\x00"):
+        raise ValueError("不是 SQLite 数据库文件")
+    size = int.from_bytes(header[16:18], "big")
+    return 65536 if size == 1 else size
+
+
+def _read_header(reader: _ChunkReader, name: str) -> dict:
+    if reader.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{name} 不是增量备份文件")
+    return json.loads(reader.readline())
+
+
+def read_increment_header(increment: Path) -> dict:
+    return _read_header(_ChunkReader(iter_decompressed(increment)), increment.name)
+
+
+def latest_base(backup_dir: Path) -> Optional[Path]:
+    """最近一次带校验和的全量备份。"""
+    for f in list_backup_files(backup_dir):
+        if not is_increment(f) and checksum_path(f).exists():
+            return f
+    return None
+
+
+def _changed_pages(snapshot: BinaryIO, base: Path, page_size: int) -> Iterator[bytes]:
+    """快照与全量基线逐页比较，产出变化页的记录。"""
+    base_pages = _ChunkReader(iter_decompressed(base))
+    page_no = 0
+    while page := snapshot.read(page_size):
+        page_no += 1
+        if base_pages.read(page_size) != page:
+            yield _PAGE_NO.pack(page_no) + page
+
+
+def create_increment(
+    src: Path,
+    backup_dir: Path,
+    base: Path,
+    compression: str = "auto",
+    pages_per_step: int = 256,
+    step_sleep_ms: int = 10,
+    max_restarts: int = 3,
+    busy_timeout_ms: int = 5000,
+    memory_limit_bytes: int = MEMORY_SNAPSHOT_LIMIT,
+) -> BackupResult:
+    """在线备份 src，只把与全量基线 base 不同的页写入增量文件。"""
+    compression = resolve_compression(compression)
+    dest, scratch = new_backup_paths(backup_dir, INCREMENT_SUFFIXES[compression])
+
+    start = time.perf_counter()
+    try:
+        verify_checksum(base)
+    except ValueError as exc:
+        raise _NeedFullBackup(str(exc)) from None
+    with sqlite_snapshot(src, scratch, pages_per_step, step_sleep_ms, max_restarts, busy_timeout_ms,
+                         memory_limit_bytes) as (snapshot, result):
+        page_size = page_size_of(snapshot.read(100))
+        base_page_size = page_size_of(_ChunkReader(iter_decompressed(base)).read(100))
+        if page_size != base_page_size:
+            raise _NeedFullBackup(f"页大小由 {base_page_size} 变为 {page_size}")
+
+        # 头部要记录整个快照的 SHA-256，先读一遍快照（内存中的快照不涉及磁盘读）
+        snapshot.seek(0)
+        header = {
+            "base": base.name,
+            "base_sha256": read_checksum(base),
+            "page_size": page_size,
+            "page_count": result.original_size // page_size,
+            "db_sha256": stream_sha256(iter_stream(snapshot)),
+        }
+        snapshot.seek(0)
+        changed = 0
+
+        def records() -> Iterator[bytes]:
+            nonlocal changed
+            yield MAGIC + json.dumps(header).encode() + b"\n"
+            for record in _changed_pages(snapshot, base, page_size):
+                changed += 1
+                yield record
+
+        size, sha256 = write_compressed(records(), dest, compression)
+    checksum_path(dest).write_text(f"{sha256}  {dest.name}\n", encoding="utf-8")
+
+    result.path = dest
+    result.file_size = size
+    result.compression = compression
+    result.sha256 = sha256
+    result.kind = "incremental"
+    result.base = base
+    result.changed_pages = changed
+    result.duration_ms = round((time.perf_counter() - start) * 1000)
+    return result
+
+
+def create_chain_backup(
+    src: Path,
+    backup_dir: Path,
+    full_interval_days: int = 7,
+    compression: str = "auto",
+    **options,
+) -> BackupResult:
+    """
+    按备份链做一次备份：没有可用的全量基线、基线已满 full_interval_days 天或无法基于它做增量时做全量，
+    否则做增量。options 传给 sqlite_snapshot（pages_per_step、memory_limit_bytes 等）。
+    """
+    base = latest_base(backup_dir)
+    if base is not None and time.time() - base.stat().st_mtime < full_interval_days * 86400:
+        try:
+            return create_increment(src, backup_dir, base, compression, **options)
+        except _NeedFullBackup as exc:
+            logger.warning("Incremental backup against %s not possible (%s); taking a full backup.",
+                           base.name, exc)
+    return create_backup(src, backup_dir, compression, **options)
+
+
+def rebuild_increment(increment: Path, dest: Path) -> None:
+    """
+    用「全量基线 + 增量」重建数据库到 dest，并核对与备份时的快照逐字节一致。
+    increment 自身的校验和由调用方先行校验；基线的校验和在这里校验。
+    """
+    reader = _ChunkReader(iter_decompressed(increment))
+    header = _read_header(reader, increment.name)
+    base = increment.with_name(header["base"])
+    if not base.exists():
+        raise ValueError(f"{increment.name} 依赖的全量备份 {base.name} 不存在")
+    verify_checksum(base, header["base_sha256"])
+
+    decompress_to(base, dest)
+    page_size = header["page_size"]
+    with open(dest, "r+b") as f:
+        while record := reader.read(_PAGE_NO.size + page_size):
+            if len(record) != _PAGE_NO.size + page_size:
+                raise ValueError(f"{increment.name} 内容不完整")
+            (page_no,) = _PAGE_NO.unpack_from(record)
+            f.seek((page_no - 1) * page_size)
+            f.write(record[_PAGE_NO.size:])
+        f.truncate(header["page_count"] * page_size)
+    actual = file_sha256(dest)
+    if actual != header["db_sha256"]:
+        raise ValueError(f"{increment.name} 重建结果与备份时的快照不一致：{actual}")
+
+
+def expired_backups(backup_dir: Path, cutoff: float) -> list[Path]:
+    """修改时间早于 cutoff（时间戳）且不再被未过期增量依赖的备份文件。"""
+    files = list_backup_files(backup_dir)
+    expired = [f for f in files if f.stat().st_mtime < cutoff]
+    referenced = set()
+    for f in files:
+        if is_increment(f) and f not in expired:
+            try:
+                referenced.add(read_increment_header(f)["base"])
+            except Exception as exc:
+                logger.warning("Cannot read increment header of %s: %s", f.name, exc)
+    return [f for f in expired if f.name not in referenced]
+
+
+def verify_backups(backup_dir: Path) -> list[tuple[Path, Optional[str]]]:
+    """
+    校验目录中的每个备份，返回 [(文件, 错误信息或 None)]：
+    全量备份校验 SHA-256；增量备份还要在临时目录重建并核对与备份时的快照逐字节一致。
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for f in reversed(list_backup_files(backup_dir)):
+            try:
+                verify_checksum(f)
+                if is_increment(f):
+                    rebuilt = Path(tmp) / "rebuilt.db"
+                    rebuild_increment(f, rebuilt)
+                    rebuilt.unlink()
+                results.append((f, None))
+            except Exception as exc:
+                results.append((f, str(exc)))
+    return results
@@ -10,14 +10,78 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 8  # 8 小时
 
+    # bcrypt cost：登录成功时若已存哈希的 cost 与此不同会自动重新哈希。
+    # 可用 python -m benchmarks.bench_bcrypt 按 BCRYPT_TARGET_MS 为当前主机校准
+    BCRYPT_ROUNDS: int = 12
+    BCRYPT_TARGET_MS: float = 250.0
+
     # 数据库
     DATABASE_URL: str = f"sqlite:///{BASE_DIR}/data/ai_platform.db"
 
+    # SQLite 连接参数（每个新连接建立时通过 PRAGMA 应用）
+    SQLITE_TUNING_ENABLED: bool = True
+    SQLITE_JOURNAL_MODE: str = "WAL"          # WAL 模式下读写互不阻塞
+    SQLITE_SYNCHRONOUS: str = "NORMAL"        # WAL 下 NORMAL 即可保证一致性
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000        # 遇到写锁时的等待时间
+    SQLITE_CACHE_SIZE: int = -20000           # 负数表示 KiB，约 20MB 页缓存
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # 内存映射读取上限
+    SQLITE_TEMP_STORE: str = "MEMORY"         # 临时表/排序放内存
+    SQLITE_FOREIGN_KEYS: bool = True
+
+    # 热点只读接口使用 aiosqlite 异步会话；关闭后回退到同步 Session + 线程池
+    DB_ASYNC_ENABLED: bool = True
+
+    # 单写者队列：写操作由专用写线程串行执行，并把同时排队的小事务合并提交
+    DB_WRITE_QUEUE_ENABLED: bool = True
+    DB_WRITE_BATCH_MAX: int = 32            # 单次合并提交的最大任务数
+    DB_WRITE_TIMEOUT_SECONDS: float = 30.0  # 调用方等待写结果的超时
+
+    # 已认证用户缓存：减少每个请求对 users 表的读取
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_TTL_SECONDS: float = 60.0
+    USER_CACHE_MAX_SIZE: int = 1024
+
+    # JWT 解码缓存：同一 token 在 exp 之前不再重复解析与验签
+    JWT_CACHE_ENABLED: bool = True
+    JWT_CACHE_MAX_SIZE: int = 4096
+
+    # bcrypt 口令计算池：与请求线程池隔离，超出容量时快速失败（503）
+    PASSWORD_POOL_MODE: str = "process"            # process | thread
+    PASSWORD_POOL_WORKERS: int = 2
+    PASSWORD_POOL_MAX_PENDING: int = 8             # 排队 + 执行中的任务上限
+    PASSWORD_POOL_TIMEOUT_SECONDS: float = 5.0
+
+    # 登录限流（令牌桶）：容量即允许的突发次数，之后按每分钟补充的速率放行
+    LOGIN_RATE_LIMIT_ENABLED: bool = True
+    LOGIN_IP_BURST: int = 10
+    LOGIN_IP_PER_MINUTE: float = 10.0
+    LOGIN_USER_BURST: int = 5
+    LOGIN_USER_PER_MINUTE: float = 5.0
+    LOGIN_LIMITER_MAX_KEYS: int = 10000     # 每个维度最多跟踪的桶数
+
+    # 新建债务的还款计划存储方式：materialized=逐期落库（默认） | lazy=按需计算，只存状态变化，需显式开启（见 schedule_store）
+    DEBT_SCHEDULE_MODE: str = "materialized"
+    # 自动扣款每个事务处理的账单数（见 scheduler.run_auto_repay）
+    AUTO_REPAY_CHUNK_SIZE: int = 500
+
     # 备份
     BACKUP_DIR: Path = BASE_DIR / "backups"
     BACKUP_RETAIN_DAYS: int = 7
     BACKUP_HOUR: int = 2    # 每天凌晨 2 点执行备份
     BACKUP_MINUTE: int = 0
+    BACKUP_PAGES_PER_STEP: int = 256    # 在线备份每步复制的页数（默认页大小 4KB，即每步 1MB）
+    BACKUP_STEP_SLEEP_MS: int = 10      # 两步之间的休眠，期间释放读锁让写入方执行
+    BACKUP_MAX_RESTARTS: int = 3        # 备份期间源库被修改导致重新复制的次数上限，超过后一步复制完
+    BACKUP_COMPRESSION: str = "auto"    # auto | zstd | gzip | none；auto 在安装了 zstandard 时用 zstd，否则 gzip
+    BACKUP_INCREMENTAL: bool = True     # 两次全量之间只备份相对全量基线变化的页（见 backup_chain）
+    BACKUP_FULL_INTERVAL_DAYS: int = 7  # 全量基线的间隔天数
+    BACKUP_MEMORY_SNAPSHOT_MAX_MB: int = 256  # 库不超过该大小时快照放在内存中直接流式压缩，超过则先落盘
+
+    # 定时任务
+    SCHEDULER_MISFIRE_GRACE_SECONDS: int = 3600  # 晚于计划时间超过该值的运行不再补跑，记为 missed
+    SCHEDULER_COALESCE: bool = True              # 积压的多次运行合并为一次，重启后不会连续补跑
+    JOB_RUN_STATS_WINDOW: int = 30               # /api/scheduler/jobs 统计 p95 时取最近的运行次数
+    JOB_RUN_RETAIN_DAYS: int = 90                # job_runs 保留天数
 
     # CORS（开发环境允许前端本地端口）
     CORS_ORIGINS: list[str] = [
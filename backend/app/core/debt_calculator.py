@@ -3,12 +3,19 @@ debt_calculator.py — 债务模块核心金融计算工具
 支持：
   - 等额本息（equal_installment）：每月还款金额固定，利息逐期递减，本金逐期递增
   - 等额本金（equal_principal）：每月归还本金固定，利息逐期递减，月供逐期减少
+
+两套计算引擎（generate_schedule 的 engine 参数）：
+  - float（默认）：浮点运算，每步 round(x, 2)
+  - cents：整数分运算，利率按十进制字面值转为有理数，每步精确计算后银行家舍入（恰好半分时取偶）；
+    金额全程为 int，汇总任意多期都没有浮点误差。与 float 引擎的差异见 tests/test_debt_cents.py
 """
 from __future__ import annotations
 
+import calendar
 import math
 from dataclasses import dataclass
 from datetime import date
+from decimal import ROUND_HALF_EVEN, Decimal
 from dateutil.relativedelta import relativedelta
 
 
@@ -62,6 +69,7 @@ def generate_schedule(
     term_months: int,
     repay_method: str,
     first_repay_date: date,
+    engine: str = "float",
 ) -> list[PeriodDetail]:
     """
     生成完整还款计划表。
@@ -72,13 +80,23 @@ def generate_schedule(
         term_months      — 还款总期数（月）
         repay_method     — "equal_installment" 或 "equal_principal"
         first_repay_date — 首期还款日期
+        engine           — "float"（默认）或 "cents"（整数分运算，见 generate_schedule_cents）
 
     返回：
         PeriodDetail 列表，长度等于 term_months
     """
+    if engine == "cents":
+        return [
+            p.to_period_detail()
+            for p in generate_schedule_cents(principal, annual_rate, term_months, repay_method, first_repay_date)
+        ]
+    if engine != "float":
+        raise ValueError(f"不支持的计算引擎：{engine}")
+
     r = annual_rate / 100 / 12
     schedule: list[PeriodDetail] = []
     balance = principal
+    due_dates = _due_dates(first_repay_date, term_months)
 
     if repay_method == "equal_installment":
         # 等额本息：月供固定
@@ -99,7 +117,7 @@ def generate_schedule(
             if balance < 0:
                 balance = 0.0
 
-            due_date = first_repay_date + relativedelta(months=i - 1)
+            due_date = due_dates[i - 1]
             schedule.append(PeriodDetail(
                 period_no=i,
                 due_date=due_date,
@@ -124,7 +142,7 @@ def generate_schedule(
             if balance < 0:
                 balance = 0.0
 
-            due_date = first_repay_date + relativedelta(months=i - 1)
+            due_date = due_dates[i - 1]
             schedule.append(PeriodDetail(
                 period_no=i,
                 due_date=due_date,
@@ -138,3 +156,244 @@ def generate_schedule(
         raise ValueError(f"不支持的还款方式：{repay_method}")
 
     return schedule
+
+
+# ─────────────────────────── 整数分引擎 ─────────────────────────────────────────
+
+@dataclass
+class PeriodCents:
+    """单期还款明细，金额均为整数分。"""
+    period_no: int
+    due_date: date
+    payment_amount: int
+    principal_amount: int
+    interest_amount: int
+    remaining_balance: int
+
+    def to_period_detail(self) -> PeriodDetail:
+        return PeriodDetail(
+            period_no=self.period_no,
+            due_date=self.due_date,
+            payment_amount=self.payment_amount / 100,
+            principal_amount=self.principal_amount / 100,
+            interest_amount=self.interest_amount / 100,
+            remaining_balance=self.remaining_balance / 100,
+        )
+
+
+def _due_dates(first_repay_date: date, count: int) -> list[date]:
+    """
+    依次返回 first_repay_date + relativedelta(months=k)，k = 0..count-1（目标月份天数不足时取月末）。
+    逐期构造 relativedelta 是计划生成中最贵的一步，这里直接按年月整数推进。
+    """
+    year, month0, day = first_repay_date.year, first_repay_date.month - 1, first_repay_date.day
+    dates = []
+    for k in range(count):
+        y, m = divmod(month0 + k, 12)
+        y += year
+        m += 1
+        dates.append(date(y, m, day if day <= 28 else min(day, calendar.monthrange(y, m)[1])))
+    return dates
+
+
+def to_cents(amount: float) -> int:
+    """金额（元）转为整数分，按十进制字面值银行家舍入（1000.005 → 100000，1000.015 → 100002）。"""
+    return int(Decimal(repr(amount)).scaleb(2).to_integral_value(ROUND_HALF_EVEN))
+
+
+def _div_half_even(numerator: int, denominator: int) -> int:
+    """整数除法，结果银行家舍入（denominator > 0）。"""
+    q, rem = divmod(numerator, denominator)
+    twice = 2 * rem
+    if twice > denominator or (twice == denominator and q % 2):
+        q += 1
+    return q
+
+
+def _monthly_rate_ratio(annual_rate: float) -> tuple[int, int]:
+    """月利率 annual_rate / 100 / 12 的精确分数 (分子, 分母)，年利率按十进制字面值（3.85 即 385/100）。"""
+    num, den = Decimal(repr(annual_rate)).as_integer_ratio()
+    return num, den * 1200
+
+
+def calc_monthly_payment_cents(principal_cents: int, annual_rate: float, term_months: int) -> int:
+    """
+    等额本息月供（分）：M = P·r·(1+r)^n / ((1+r)^n − 1)。
+    r = num/den 为有理数，(1+r)^n = (den+num)^n / den^n，全程整数精确计算，最后舍入一次。
+    """
+    num, den = _monthly_rate_ratio(annual_rate)
+    if num == 0:
+        return _div_half_even(principal_cents, term_months)
+    grown = (den + num) ** term_months
+    base = den ** term_months
+    return _div_half_even(principal_cents * num * grown, den * (grown - base))
+
+
+def generate_schedule_cents(
+    principal: float,
+    annual_rate: float,
+    term_months: int,
+    repay_method: str,
+    first_repay_date: date,
+) -> list[PeriodCents]:
+    """
+    整数分引擎：参数与 generate_schedule 相同，金额以整数分返回。
+    每期只有利息一次舍入（本金×月利率，银行家舍入），其余都是精确的整数加减；
+    各期本金之和恒等于贷款本金，月供恒等于本金 + 利息。
+    """
+    balance = to_cents(principal)
+    num, den = _monthly_rate_ratio(annual_rate)
+    if repay_method == "equal_installment":
+        regular = calc_monthly_payment_cents(balance, annual_rate, term_months)
+    elif repay_method == "equal_principal":
+        regular = _div_half_even(balance, term_months)
+    else:
+        raise ValueError(f"不支持的还款方式：{repay_method}")
+    installment = repay_method == "equal_installment"
+
+    schedule: list[PeriodCents] = []
+    for i, due_date in enumerate(_due_dates(first_repay_date, term_months), start=1):
+        interest = _div_half_even(balance * num, den)
+        if i == term_months:
+            principal_part = balance
+        elif installment:
+            principal_part = regular - interest
+        else:
+            principal_part = regular
+        balance -= principal_part
+        if balance < 0:
+            # 本金过小、每期固定本金向上舍入时可能提前还完
+            principal_part += balance
+            balance = 0
+        schedule.append(PeriodCents(
+            period_no=i,
+            due_date=due_date,
+            payment_amount=principal_part + interest,
+            principal_amount=principal_part,
+            interest_amount=interest,
+            remaining_balance=balance,
+        ))
+    return schedule
+
+
+# ─────────────────────────── 单期查询 ─────────────────────────────────────────
+
+def _balance_before_period(
+    principal: float,
+    r: float,
+    repay_method: str,
+    monthly: float,
+    principal_per_period: float,
+    period_no: int,
+) -> float:
+    """
+    第 period_no 期开始前的剩余本金（即第 period_no-1 期还完后的余额），与 generate_schedule 逐分一致。
+    - 每期归还固定本金（等额本金，或零利率的等额本息）：余额按「分」线性递减，O(1)
+    - 等额本息：每期利息先 round 到分再滚动，舍入误差会累积，闭式公式
+      B_k = P·(1+r)^k − M·((1+r)^k − 1)/r 与之相差可达数角；这里按同一套舍入只滚动余额，
+      不构造日期与明细，O(k) 次标量运算
+    """
+    k = period_no - 1
+    if k == 0:
+        return principal
+    if repay_method == "equal_installment" and r != 0:
+        balance = principal
+        for _ in range(k):
+            principal_part = round(monthly - round(balance * r, 2), 2)
+            balance = round(balance - principal_part, 2)
+            if balance < 0:
+                balance = 0.0
+        return balance
+
+    step = monthly if repay_method == "equal_installment" else principal_per_period
+    # 第 1 期与 generate_schedule 完全相同地计算（本金可能不是整分），之后每期按整分递减
+    first = round(principal - step, 2)
+    if first < 0:
+        first = 0.0
+    if k == 1:
+        return first
+    cents = round(first * 100) - (k - 1) * round(step * 100)
+    return cents / 100 if cents > 0 else 0.0
+
+
+def calc_period_detail(
+    principal: float,
+    annual_rate: float,
+    term_months: int,
+    repay_method: str,
+    first_repay_date: date,
+    period_no: int,
+) -> PeriodDetail:
+    """
+    直接计算第 period_no 期的还款明细，无需生成整张计划表，结果与 generate_schedule 的同一期完全相同。
+
+    期初余额见 _balance_before_period；本期的利息、本金、月供、期末余额与末期轧差
+    按 generate_schedule 的同一套舍入规则计算。
+    """
+    if repay_method not in ("equal_installment", "equal_principal"):
+        raise ValueError(f"不支持的还款方式：{repay_method}")
+    if not 1 <= period_no <= term_months:
+        raise ValueError(f"期数超出范围：{period_no}（共 {term_months} 期）")
+
+    r = annual_rate / 100 / 12
+    monthly = principal_per_period = 0.0
+    if repay_method == "equal_installment":
+        monthly = calc_monthly_payment_equal_installment(principal, annual_rate, term_months)
+    else:
+        principal_per_period = round(principal / term_months, 2)
+
+    balance = _balance_before_period(
+        principal, r, repay_method, monthly, principal_per_period, period_no
+    )
+    interest = round(balance * r, 2)
+    if period_no == term_months:
+        principal_part = round(balance, 2)
+        payment = round(principal_part + interest, 2)
+    elif repay_method == "equal_installment":
+        principal_part = round(monthly - interest, 2)
+        payment = monthly
+    else:
+        principal_part = principal_per_period
+        payment = round(principal_part + interest, 2)
+    balance = round(balance - principal_part, 2)
+    if balance < 0:
+        balance = 0.0
+
+    return PeriodDetail(
+        period_no=period_no,
+        due_date=first_repay_date + relativedelta(months=period_no - 1),
+        payment_amount=payment,
+        principal_amount=principal_part,
+        interest_amount=interest,
+        remaining_balance=balance,
+    )
+
+
+def count_periods_due(first_repay_date: date, term_months: int, as_of: date) -> int:
+    """截至 as_of（含当天）已到期的期数。"""
+    months = (as_of.year - first_repay_date.year) * 12 + as_of.month - first_repay_date.month
+    if months < 0:
+        return 0
+    due = months + 1 if first_repay_date + relativedelta(months=months) <= as_of else months
+    return min(due, term_months)
+
+
+def calc_balance_as_of(
+    principal: float,
+    annual_rate: float,
+    term_months: int,
+    repay_method: str,
+    first_repay_date: date,
+    as_of: date,
+) -> tuple[int, float]:
+    """
+    返回 (截至 as_of 已到期期数, 按计划还完这些期后的剩余本金)。
+    首期还款日之前余额为本金，最后一期之后为 0。
+    """
+    periods = count_periods_due(first_repay_date, term_months, as_of)
+    if periods == 0:
+        return 0, principal
+    detail = calc_period_detail(
+        principal, annual_rate, term_months, repay_method, first_repay_date, periods
+    )
+    return periods, detail.remaining_balance
@@ -0,0 +1,153 @@
+"""
+debt_planner.py — 多笔债务的还款策略规划（雪崩 / 雪球 / 自定义顺序）
+
+每月的还款预算固定为「各笔债务初始最低还款之和 + 额外预算」：
+  1. 每笔未还清的债务先计息（round 到分），再按最低还款额还款
+     （等额本息为固定月供，等额本金为每期固定本金 + 当月利息，均不超过本息合计）
+  2. 预算扣除最低还款后剩余的部分，按策略的优先顺序依次用于提前还款，前一笔还清后才轮到下一笔
+  3. 某笔债务还清后，它原来的最低还款额自动滚入后续债务（预算总额不变）
+策略：
+  - avalanche：年利率高的优先（利率相同时余额小的优先），总利息最少
+  - snowball ：余额小的优先（余额相同时利率高的优先），最快减少债务笔数
+  - custom   ：按指定顺序
+另有 minimum 基线：只还最低还款、不滚动，用于计算各策略节省的利息。
+
+所有策略同时模拟：状态为 (策略数, 债务数) 的数组，列按各策略的优先顺序排列，
+按月循环、每月十余次数组运算，优先顺序上的分配用累加和一次算出，不逐笔循环。
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+from app.core.debt_vectorized import round2
+
+MAX_MONTHS = 600    # 预算不足以覆盖利息时的模拟上限
+
+
+@dataclass
+class PlannerDebt:
+    id: int
+    name: str
+    balance: float
+    annual_rate: float
+    monthly_payment: float = 0.0        # 等额本息的固定月供
+    principal_per_period: float = 0.0   # 等额本金的每期固定本金
+    fixed_principal: bool = False       # True 表示等额本金
+
+
+@dataclass
+class StrategyPlan:
+    name: str
+    order: list[int]                # 债务 id，按优先顺序
+    paid_off: bool
+    months: int                     # 全部还清所需月数（未还清时为模拟上限）
+    total_interest: float
+    total_paid: float
+    payoff_months: dict[int, int]   # 债务 id → 第几个月还清（1 开始），未还清的不出现
+    balance_timeline: list[float]   # 每月月末的剩余本金合计
+
+
+def avalanche_order(debts: Sequence[PlannerDebt]) -> list[int]:
+    return [d.id for d in sorted(debts, key=lambda d: (-d.annual_rate, d.balance, d.id))]
+
+
+def snowball_order(debts: Sequence[PlannerDebt]) -> list[int]:
+    return [d.id for d in sorted(debts, key=lambda d: (d.balance, -d.annual_rate, d.id))]
+
+
+def custom_order(debts: Sequence[PlannerDebt], order: Sequence[int]) -> list[int]:
+    """指定的债务在前，未列出的按 avalanche 顺序排在后面。"""
+    known = {d.id for d in debts}
+    unknown = [i for i in order if i not in known]
+    if unknown:
+        raise ValueError(f"custom_order 中包含不存在或已结清的债务：{unknown}")
+    listed = list(dict.fromkeys(order))
+    return listed + [i for i in avalanche_order(debts) if i not in listed]
+
+
+def minimum_payment(debt: PlannerDebt) -> float:
+    """当前余额下的首月最低还款额。"""
+    interest = round(debt.balance * debt.annual_rate / 100 / 12, 2)
+    regular = debt.principal_per_period + interest if debt.fixed_principal else debt.monthly_payment
+    return round(min(debt.balance + interest, regular), 2)
+
+
+def monthly_budget(debts: Sequence[PlannerDebt], monthly_extra: float) -> float:
+    """每月还款总预算：各笔债务首月最低还款之和 + 额外投入。"""
+    return round(sum(minimum_payment(d) for d in debts) + monthly_extra, 2)
+
+
+def plan_payoff(
+    debts: Sequence[PlannerDebt],
+    monthly_extra: float,
+    strategies: dict[str, list[int]],
+    max_months: int = MAX_MONTHS,
+) -> dict[str, StrategyPlan]:
+    """
+    同时模拟 minimum 基线与 strategies 中的每个策略（策略名 → 债务 id 优先顺序）。
+    返回 策略名 → StrategyPlan，包含 "minimum"。
+    """
+    names = ["minimum"] + list(strategies)
+    orders = [[d.id for d in debts]] + [list(o) for o in strategies.values()]
+    position = {d.id: j for j, d in enumerate(debts)}
+    perm = np.array([[position[i] for i in order] for order in orders], dtype=np.int64).reshape(len(names), len(debts))
+
+    def column(values) -> np.ndarray:
+        return np.asarray(values, dtype=np.float64)[perm]
+
+    balance = column([d.balance for d in debts])
+    rate = column([d.annual_rate / 100 / 12 for d in debts])
+    fixed_principal = column([d.fixed_principal for d in debts]).astype(bool)
+    regular = column([d.principal_per_period if d.fixed_principal else d.monthly_payment for d in debts])
+
+    budget = monthly_budget(debts, monthly_extra)
+    rollover = np.ones(len(names), dtype=bool)
+    rollover[0] = False     # 基线只还最低还款
+
+    interest_total = np.zeros(len(names))
+    paid_total = np.zeros(len(names))
+    payoff = np.full(balance.shape, -1, dtype=np.int64)
+    timeline = np.empty((max_months, len(names)))
+    months = 0
+    for month in range(max_months):
+        active = balance > 0
+        if not active.any():
+            break
+        interest = round2(balance * rate)
+        due = balance + interest
+        minimum = np.where(fixed_principal, regular + interest, regular)
+        min_pay = np.where(active, np.minimum(due, minimum), 0.0)
+        # 剩余预算按优先顺序（列顺序）依次填满各笔债务的剩余本息
+        leftover = np.where(rollover, np.maximum(budget - min_pay.sum(axis=1), 0.0), 0.0)
+        need = due - min_pay
+        before = np.cumsum(need, axis=1) - need
+        extra = np.clip(leftover[:, None] - before, 0.0, need)
+        pay = min_pay + extra
+
+        balance = round2(due - pay)
+        balance[balance < 0] = 0.0
+        interest_total += interest.sum(axis=1)
+        paid_total += pay.sum(axis=1)
+        payoff[active & (balance == 0)] = month + 1
+        timeline[month] = balance.sum(axis=1)
+        months = month + 1
+
+    plans = {}
+    for s, name in enumerate(names):
+        done = payoff[s] > 0
+        paid_off = bool(done.all())
+        span = int(payoff[s].max()) if paid_off and len(debts) else months
+        plans[name] = StrategyPlan(
+            name=name,
+            order=orders[s],
+            paid_off=paid_off,
+            months=span,
+            total_interest=round(float(interest_total[s]), 2),
+            total_paid=round(float(paid_total[s]), 2),
+            payoff_months={orders[s][j]: int(payoff[s, j]) for j in range(len(debts)) if done[j]},
+            balance_timeline=[round(float(v), 2) for v in timeline[:span, s]],
+        )
+    return plans
@@ -0,0 +1,145 @@
+"""
+debt_simulator.py — 提前还款 / 利率变化的批量情景模拟
+
+每个情景在第 at_period 期还款之后（0 表示首期之前）发生一次变化：
+  - prepay_amount：一次性提前归还的本金
+  - new_annual_rate：此后适用的新年利率（不填则沿用原利率）
+  - mode：提前还款后的处理方式
+      shorten_term   — 月供不变（等额本金为每期本金不变），缩短期限
+      reduce_payment — 期限不变，重新计算月供
+
+第 1..at_period 期沿用原计划（generate_schedule），剩余部分视为一笔新的贷款：
+本金为变化后的余额、期数为剩余（或缩短后的）期数、首期为第 at_period+1 期的还款日。
+所有情景的剩余部分一次交给 debt_vectorized.generate_schedules 批量计算，结果与逐个调用 generate_schedule 一致。
+只做计算，不写库。
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.core.debt_calculator import PeriodDetail, generate_schedule
+from app.core.debt_vectorized import generate_schedules
+
+SIMULATION_MODES = ("shorten_term", "reduce_payment")
+
+
+@dataclass
+class Scenario:
+    at_period: int = 0
+    prepay_amount: float = 0.0
+    new_annual_rate: Optional[float] = None
+    mode: str = "shorten_term"
+
+
+@dataclass
+class ScenarioResult:
+    term_months: int              # 新的总期数（含已还部分）
+    monthly_payment: float        # 变化后第一期的月供（提前还清时为 0）
+    payoff_date: date
+    total_interest: float
+    interest_saved: float         # 相对原计划少付的利息（负数表示多付）
+
+
+@dataclass
+class SimulationResult:
+    baseline_term_months: int
+    baseline_monthly_payment: float
+    baseline_payoff_date: date
+    baseline_total_interest: float
+    scenarios: list[ScenarioResult]
+
+
+def _shortened_term(balance: float, r: float, payment: float, remaining: int) -> int:
+    """月供 payment 不变时还清 balance 所需的期数：n = ⌈−ln(1 − B·r/M) / ln(1+r)⌉，不超过原剩余期数。"""
+    if r == 0:
+        return min(remaining, max(1, math.ceil(round(balance / payment, 6))))
+    ratio = balance * r / payment
+    if ratio >= 1:
+        raise ValueError("新利率下原月供不足以覆盖利息，无法缩短期限")
+    n = -math.log1p(-ratio) / math.log1p(r)
+    return min(remaining, max(1, math.ceil(round(n, 6))))
+
+
+def simulate(
+    principal: float,
+    annual_rate: float,
+    term_months: int,
+    repay_method: str,
+    first_repay_date: date,
+    scenarios: Sequence[Scenario],
+) -> SimulationResult:
+    """批量模拟多个情景，返回原计划概要与各情景的结果（顺序与 scenarios 一致）。"""
+    baseline = generate_schedule(principal, annual_rate, term_months, repay_method, first_repay_date)
+    interest_before = np.concatenate(([0.0], np.cumsum([p.interest_amount for p in baseline])))
+    baseline_interest = round(float(interest_before[-1]), 2)
+
+    # 每个情景剩余部分的参数；余额为 0（一次还清）的情景不进入批量计算
+    tails: list[tuple[int, float, float, int, date]] = []   # (情景下标, 本金, 年利率, 期数, 首期日期)
+    payoff: dict[int, date] = {}
+    for i, s in enumerate(scenarios):
+        if s.mode not in SIMULATION_MODES:
+            raise ValueError(f"情景 {i}：不支持的处理方式 {s.mode}")
+        if not 0 <= s.at_period < term_months:
+            raise ValueError(f"情景 {i}：at_period 须在 0 到 {term_months - 1} 之间")
+        if s.prepay_amount < 0:
+            raise ValueError(f"情景 {i}：提前还款金额不能为负")
+
+        done: Optional[PeriodDetail] = baseline[s.at_period - 1] if s.at_period else None
+        balance = round((done.remaining_balance if done else principal) - s.prepay_amount, 2)
+        if balance <= 0:
+            payoff[i] = done.due_date if done else first_repay_date
+            continue
+
+        rate = annual_rate if s.new_annual_rate is None else s.new_annual_rate
+        remaining = term_months - s.at_period
+        periods = remaining
+        if s.mode == "shorten_term":
+            nxt = baseline[s.at_period]
+            try:
+                if repay_method == "equal_installment":
+                    periods = _shortened_term(balance, rate / 100 / 12, nxt.payment_amount, remaining)
+                else:
+                    periods = min(remaining, max(1, math.ceil(round(balance / nxt.principal_amount, 6))))
+            except ValueError as exc:
+                raise ValueError(f"情景 {i}：{exc}") from None
+        tails.append((i, balance, rate, periods, baseline[s.at_period].due_date))
+
+    results: list[Optional[ScenarioResult]] = [None] * len(scenarios)
+    if tails:
+        idx, balances, rates, periods, firsts = zip(*tails)
+        batch = generate_schedules(balances, rates, periods, [repay_method] * len(tails), firsts)
+        tail_interest = np.nansum(batch.interest_amount, axis=1)
+        first_payment = batch.payment_amount[:, 0]
+        last_due = batch.due_date[np.arange(len(tails)), np.asarray(periods) - 1]
+        for row, i in enumerate(idx):
+            s = scenarios[i]
+            total = round(float(interest_before[s.at_period] + tail_interest[row]), 2)
+            results[i] = ScenarioResult(
+                term_months=s.at_period + periods[row],
+                monthly_payment=float(first_payment[row]),
+                payoff_date=last_due[row].astype(object),
+                total_interest=total,
+                interest_saved=round(baseline_interest - total, 2),
+            )
+    for i, when in payoff.items():
+        total = round(float(interest_before[scenarios[i].at_period]), 2)
+        results[i] = ScenarioResult(
+            term_months=scenarios[i].at_period,
+            monthly_payment=0.0,
+            payoff_date=when,
+            total_interest=total,
+            interest_saved=round(baseline_interest - total, 2),
+        )
+
+    return SimulationResult(
+        baseline_term_months=term_months,
+        baseline_monthly_payment=baseline[0].payment_amount,
+        baseline_payoff_date=baseline[-1].due_date,
+        baseline_total_interest=baseline_interest,
+        scenarios=results,
+    )
@@ -0,0 +1,176 @@
+"""
+debt_vectorized.py — 还款计划的 NumPy 批量计算引擎
+
+debt_calculator.generate_schedule 逐期循环、每期多次 round() 并做一次 relativedelta 日期加法，
+适合单笔贷款；批量场景（组合分析、模拟）下开销与「贷款数 × 期数」成正比。
+
+这里按「期」循环、在「贷款」维度上向量化：一次计算 N 笔贷款的全部还款计划，结果为 (N, 最长期数) 的数组。
+结果与 generate_schedule 逐分一致（按位相等），包括末期轧差与负余额归零：
+  - 每一步的浮点运算与标量版本相同（IEEE 逐元素运算结果一致）
+  - round2 精确复现 Python round(x, 2)：先用 Dekker 双积得到 |x|*100 的精确值（hi + lo），
+    小数部分恰为 .5 时由 lo 的符号决定进位（lo 为 0 才是真正的中点，取偶），
+    n / 100 即为最接近的 double，最后 copysign 恢复符号
+  - 等额本息月供仍逐笔调用 calc_monthly_payment_equal_installment（math.pow 与 np.power 末位可能不同）
+  - 还款日按 datetime64[M] 逐月推进，日期超出当月天数时取月末，与 relativedelta(months=k) 相同
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Sequence
+
+import numpy as np
+
+from app.core.debt_calculator import (
+    PeriodDetail,
+    calc_monthly_payment_equal_installment,
+)
+
+_SPLITTER = 134217729.0  # 2**27 + 1，Dekker 拆分常数
+
+
+def round2(x: np.ndarray) -> np.ndarray:
+    """逐元素复现 Python 内置 round(x, 2)（正确舍入，恰好一半时取偶）。"""
+    x = np.asarray(x, dtype=np.float64)
+    # round 关于 0 对称，按绝对值计算后再恢复符号（同时保留 -0.0）
+    a = np.abs(x)
+    hi = a * 100.0
+    # 小数部分不为 .5 时，a*100 的舍入误差小于 hi 到 .5 的距离，不影响舍入方向，np.rint 即可
+    n = np.rint(hi)
+    floor = np.floor(hi)
+    tie = hi - floor == 0.5
+    if tie.any():
+        # 小数部分恰为 .5：用 Dekker TwoProduct 求出 a*100 = hi + lo（精确；100 只有 7 位有效位，拆分后低位为 0），
+        # lo 为 0 才是真正的中点（np.rint 已取偶），否则由 lo 的符号决定进位
+        c = _SPLITTER * a
+        a_hi = c - (c - a)
+        a_lo = a - a_hi
+        lo = (a_hi * 100.0 - hi) + a_lo * 100.0
+        off_tie = tie & (lo != 0)
+        n = np.where(off_tie, floor + (lo > 0), n)
+    return np.copysign(n / 100.0, x)
+
+
+def add_months(first_dates: Sequence[date], months: int) -> np.ndarray:
+    """
+    返回 (N, months) 的 datetime64[D] 数组：第 k 列为 first_date + relativedelta(months=k)。
+    目标月份天数不足时取月末（1 月 31 日 + 1 个月 = 2 月 28/29 日）。
+    """
+    firsts = np.array(first_dates, dtype="datetime64[D]")
+    first_month = firsts.astype("datetime64[M]").astype(np.int64)        # 距 1970-01 的月数
+    day = (firsts - first_month.astype("datetime64[M]").astype("datetime64[D]")).astype(np.int64) + 1
+    # 涉及的月份区间通常只有几百个，先建「月初日期 / 当月天数」查找表，再用整数运算展开
+    base = int(first_month.min()) if len(firsts) else 0
+    span = (int(first_month.max()) - base + months + 1) if len(firsts) else 1
+    table = np.arange(base, base + span + 1).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    month_start, days_in_month = table[:-1], np.diff(table)
+    target = (first_month - base)[:, None] + np.arange(months)
+    due = month_start[target] + np.minimum(day[:, None], days_in_month[target]) - 1
+    return due.astype("datetime64[D]")
+
+
+@dataclass
+class ScheduleBatch:
+    """
+    N 笔贷款的还款计划。金额数组形状均为 (N, max_term)；
+    第 i 笔贷款只有前 terms[i] 列有效，其余位置为 NaN（due_date 为 NaT）。
+    """
+    terms: np.ndarray              # (N,) int64
+    due_date: np.ndarray           # (N, T) datetime64[D]
+    payment_amount: np.ndarray     # (N, T) float64
+    principal_amount: np.ndarray
+    interest_amount: np.ndarray
+    remaining_balance: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def to_period_details(self, i: int) -> list[PeriodDetail]:
+        """把第 i 笔贷款转换为与 generate_schedule 相同的 PeriodDetail 列表。"""
+        n = int(self.terms[i])
+        dates = self.due_date[i, :n].astype(object)
+        return [
+            PeriodDetail(
+                period_no=k + 1,
+                due_date=dates[k],
+                payment_amount=float(self.payment_amount[i, k]),
+                principal_amount=float(self.principal_amount[i, k]),
+                interest_amount=float(self.interest_amount[i, k]),
+                remaining_balance=float(self.remaining_balance[i, k]),
+            )
+            for k in range(n)
+        ]
+
+
+def generate_schedules(
+    principals: Sequence[float],
+    annual_rates: Sequence[float],
+    term_months: Sequence[int],
+    repay_methods: Sequence[str],
+    first_repay_dates: Sequence[date],
+) -> ScheduleBatch:
+    """
+    批量生成还款计划，参数含义与 generate_schedule 相同，每个参数为长度 N 的序列。
+    期数不同的贷款可以放在同一批次中。
+    """
+    principal = np.asarray(principals, dtype=np.float64)
+    annual_rate = np.asarray(annual_rates, dtype=np.float64)
+    terms = np.asarray(term_months, dtype=np.int64)
+    methods = list(repay_methods)
+    count = len(principal)
+    if not (len(annual_rate) == len(terms) == len(methods) == len(first_repay_dates) == count):
+        raise ValueError("批量参数长度不一致")
+    for m in set(methods):
+        if m not in ("equal_installment", "equal_principal"):
+            raise ValueError(f"不支持的还款方式：{m}")
+
+    is_installment = np.array([m == "equal_installment" for m in methods], dtype=bool)
+    r = annual_rate / 100 / 12
+    monthly = np.array([
+        calc_monthly_payment_equal_installment(p, a, int(n)) if ei else np.nan
+        for p, a, n, ei in zip(principal.tolist(), annual_rate.tolist(), terms.tolist(), is_installment)
+    ], dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        principal_per_period = round2(principal / terms)
+
+    max_term = int(terms.max()) if count else 0
+    # 逐期写入按 (期, 贷款) 排列的数组，每期写一整行（连续内存），最后转置
+    payment_out = np.empty((max_term, count))
+    principal_out = np.empty((max_term, count))
+    interest_out = np.empty((max_term, count))
+    balance_out = np.empty((max_term, count))
+
+    balance = principal.copy()
+    for col in range(max_term):
+        last = terms == col + 1
+
+        interest = round2(balance * r)
+        regular = np.where(is_installment, round2(monthly - interest), principal_per_period)
+        principal_part = np.where(last, round2(balance), regular) if last.any() else regular
+        payment = np.where(is_installment & ~last, monthly, round2(principal_part + interest))
+        balance = round2(balance - principal_part)
+        balance[balance < 0] = 0.0
+
+        payment_out[col] = payment
+        principal_out[col] = principal_part
+        interest_out[col] = interest
+        balance_out[col] = balance
+
+    # 超出各自期数的位置置为 NaN / NaT
+    beyond = np.arange(max_term)[None, :] >= terms[:, None]
+    amounts = []
+    for arr in (payment_out, principal_out, interest_out, balance_out):
+        arr = np.ascontiguousarray(arr.T)
+        arr[beyond] = np.nan
+        amounts.append(arr)
+    due = add_months(list(first_repay_dates), max_term) if count else np.empty((0, 0), "datetime64[D]")
+    due[beyond] = np.datetime64("NaT")
+
+    return ScheduleBatch(
+        terms=terms,
+        due_date=due,
+        payment_amount=amounts[0],
+        principal_amount=amounts[1],
+        interest_amount=amounts[2],
+        remaining_balance=amounts[3],
+    )
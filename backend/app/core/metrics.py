@@ -0,0 +1,42 @@
+"""
+metrics.py — 进程内轻量指标工具（延迟分布、百分位）。
+各组件自行持有 LatencyRecorder，并在 stats() 中输出快照，由 /api/metrics 汇总返回。
+"""
+import threading
+from collections import deque
+from typing import Sequence
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """最近秩百分位；sorted_values 须已升序排列，空序列返回 0。"""
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class LatencyRecorder:
+    """记录最近 maxlen 个耗时样本（秒），输出毫秒级 avg / p95 / max。"""
+
+    def __init__(self, maxlen: int = 1000) -> None:
+        self._samples: deque[float] = deque(maxlen=maxlen)
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self._count += 1
+            self._max = max(self._max, seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count, max_ = self._count, self._max
+        return {
+            "count": count,
+            "avg_ms": round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+            "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+            "max_ms": round(max_ * 1000, 3),
+        }
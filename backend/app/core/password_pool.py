@@ -0,0 +1,162 @@
+"""
+password_pool.py — bcrypt 专用的有界进程池
+
+bcrypt 校验/哈希每次要消耗数百毫秒 CPU。放在路由线程池里执行时，一波登录请求会占满线程池，
+拖慢其他所有接口。这里把口令计算交给独立的进程池：
+  - 工作进程数固定（PASSWORD_POOL_WORKERS），使用 spawn 启动，不继承父进程的数据库连接与线程
+  - 同时在途（排队 + 执行中）的任务数不超过 PASSWORD_POOL_MAX_PENDING，超出时立即抛出
+    PasswordPoolBusy（接口返回 503），而不是无限排队
+  - 单个任务等待超过 PASSWORD_POOL_TIMEOUT_SECONDS 同样视为繁忙
+  - 记录在途任务数、拒绝/超时次数，以及端到端与工作进程内的耗时分布，由 /api/metrics 输出
+
+PASSWORD_POOL_MODE="thread" 时改用独立线程池（bcrypt 计算期间会释放 GIL），
+适用于不便启动子进程的环境（如测试）；容量控制与指标不变。
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+import bcrypt
+
+from app.core.config import settings
+from app.core.metrics import LatencyRecorder
+
+
+class PasswordPoolBusy(Exception):
+    """口令计算池已满或等待超时。"""
+
+
+# ── 工作进程内执行的函数（须为模块级函数，便于 spawn 子进程导入） ─────────────────
+
+def _timed(fn: Callable[..., Any], *args: Any) -> tuple[Any, float]:
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def _checkpw(plain: str, hashed: str) -> tuple[bool, float]:
+    return _timed(bcrypt.checkpw, plain.encode(), hashed.encode())
+
+
+def _hashpw(plain: str, rounds: int) -> tuple[str, float]:
+    result, elapsed = _timed(bcrypt.hashpw, plain.encode(), bcrypt.gensalt(rounds))
+    return result.decode(), elapsed
+
+
+class PasswordPool:
+    def __init__(
+        self,
+        *,
+        workers: int = 2,
+        max_pending: int = 8,
+        timeout: float = 5.0,
+        mode: str = "process",
+    ) -> None:
+        self._workers = max(1, workers)
+        self._max_pending = max(self._workers, max_pending)
+        self._timeout = timeout
+        self._mode = mode
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+
+        # 指标
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._latency = LatencyRecorder()   # 提交到返回（含排队）
+        self._compute = LatencyRecorder()   # 工作进程内 bcrypt 本身耗时
+
+    # ── 生命周期 ────────────────────────────────────────────────────────────────
+
+    def _get_executor(self) -> Executor:
+        # 调用方已持有 self._lock
+        if self._executor is None:
+            if self._mode == "thread":
+                self._executor = ThreadPoolExecutor(self._workers, thread_name_prefix="password")
+            else:
+                self._executor = ProcessPoolExecutor(
+                    self._workers, mp_context=multiprocessing.get_context("spawn")
+                )
+        return self._executor
+
+    def stop(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    # ── 提交任务 ────────────────────────────────────────────────────────────────
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        with self._lock:
+            if self._in_flight >= self._max_pending:
+                self._rejected += 1
+                raise PasswordPoolBusy("口令计算队列已满")
+            future = self._get_executor().submit(fn, *args)
+            self._in_flight += 1
+        # 任务真正结束（完成或取消）才释放名额：调用方超时后工作进程可能仍在计算
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        started = time.perf_counter()
+        future = self._submit(fn, *args)
+        try:
+            result, compute = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self._timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self._timeouts += 1
+            raise PasswordPoolBusy(f"口令计算等待超过 {self._timeout}s")
+        with self._lock:
+            self._completed += 1
+        self._latency.record(time.perf_counter() - started)
+        self._compute.record(compute)
+        return result
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        return await self._run(_checkpw, plain, hashed)
+
+    async def hash(self, plain: str, rounds: int | None = None) -> str:
+        """rounds 为空时使用 settings.BCRYPT_ROUNDS。"""
+        return await self._run(_hashpw, plain, rounds or settings.BCRYPT_ROUNDS)
+
+    # ── 指标 ────────────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = {
+                "mode": self._mode,
+                "workers": self._workers,
+                "max_pending": self._max_pending,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+            }
+        snapshot["latency"] = self._latency.snapshot()
+        snapshot["compute"] = self._compute.snapshot()
+        return snapshot
+
+
+password_pool = PasswordPool(
+    workers=settings.PASSWORD_POOL_WORKERS,
+    max_pending=settings.PASSWORD_POOL_MAX_PENDING,
+    timeout=settings.PASSWORD_POOL_TIMEOUT_SECONDS,
+    mode=settings.PASSWORD_POOL_MODE,
+)
+
+
+def get_password_pool() -> PasswordPool:
+    """FastAPI 依赖注入：提供口令计算池。"""
+    return password_pool
@@ -0,0 +1,135 @@
+"""
+rate_limit.py — 登录限流（进程内令牌桶）
+
+每次登录尝试都要做一次 bcrypt 校验，脚本化的撞库请求可以轻易占满全部 CPU。
+LoginThrottle 在校验口令之前按两个维度限流：
+  - 每个客户端 IP 一个令牌桶：挡住单一来源的高频尝试
+  - 每个用户名一个令牌桶：挡住分散 IP 针对同一账号的猜测
+两个桶都有令牌时才放行，并同时各扣一个；任一不足即拒绝（接口返回 429 + Retry-After），
+被拒绝的请求不会进入 bcrypt 计算。
+桶保存在进程内存中，数量超过 LOGIN_LIMITER_MAX_KEYS 时淘汰最久未用的桶（被淘汰的桶相当于重新装满）。
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+
+
+class RateLimited(Exception):
+    """登录尝试过于频繁。"""
+
+    def __init__(self, scope: str, retry_after: float) -> None:
+        super().__init__(f"too many login attempts ({scope})")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class _BucketStore:
+    """一组令牌桶：key → [剩余令牌, 上次补充时间]，LRU 有界。"""
+
+    def __init__(self, capacity: float, refill_per_second: float, max_keys: int) -> None:
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_keys = max(1, max_keys)
+        self.buckets: "OrderedDict[str, list[float]]" = OrderedDict()
+        self.evictions = 0
+
+    def peek(self, key: str, now: float) -> list[float]:
+        """返回补充到 now 之后的桶（不存在时新建一个满桶）。"""
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = [self.capacity, now]
+            self.buckets[key] = bucket
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+                self.evictions += 1
+        else:
+            bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_per_second)
+            bucket[1] = now
+            self.buckets.move_to_end(key)
+        return bucket
+
+    def retry_after(self, bucket: list[float]) -> float:
+        if self.refill_per_second <= 0:
+            return float("inf")
+        return (1 - bucket[0]) / self.refill_per_second
+
+
+class LoginThrottle:
+    def __init__(
+        self,
+        *,
+        ip_burst: float = 10,
+        ip_per_minute: float = 10,
+        user_burst: float = 5,
+        user_per_minute: float = 5,
+        max_keys: int = 10000,
+        enabled: bool = True,
+    ) -> None:
+        self._enabled = enabled
+        self._ip = _BucketStore(ip_burst, ip_per_minute / 60, max_keys)
+        self._user = _BucketStore(user_burst, user_per_minute / 60, max_keys)
+        self._lock = threading.Lock()
+        self._allowed = 0
+        self._rejected_ip = 0
+        self._rejected_user = 0
+
+    def check(self, ip: Optional[str], username: str) -> None:
+        """消耗一次登录尝试配额；超限时抛出 RateLimited。"""
+        if not self._enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            ip_bucket = self._ip.peek(ip or "unknown", now)
+            user_bucket = self._user.peek(username.strip().lower(), now)
+            if ip_bucket[0] < 1:
+                self._rejected_ip += 1
+                raise RateLimited("ip", self._ip.retry_after(ip_bucket))
+            if user_bucket[0] < 1:
+                self._rejected_user += 1
+                raise RateLimited("username", self._user.retry_after(user_bucket))
+            ip_bucket[0] -= 1
+            user_bucket[0] -= 1
+            self._allowed += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ip.buckets.clear()
+            self._user.buckets.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self._enabled,
+                "allowed": self._allowed,
+                "rejected_ip": self._rejected_ip,
+                "rejected_username": self._rejected_user,
+                "tracked_ips": len(self._ip.buckets),
+                "tracked_usernames": len(self._user.buckets),
+                "evictions": self._ip.evictions + self._user.evictions,
+            }
+
+
+def retry_after_header(exc: RateLimited) -> str:
+    """Retry-After 取整秒（至少 1 秒）。"""
+    if math.isinf(exc.retry_after):
+        return "60"
+    return str(max(1, math.ceil(exc.retry_after)))
+
+
+login_throttle = LoginThrottle(
+    ip_burst=settings.LOGIN_IP_BURST,
+    ip_per_minute=settings.LOGIN_IP_PER_MINUTE,
+    user_burst=settings.LOGIN_USER_BURST,
+    user_per_minute=settings.LOGIN_USER_PER_MINUTE,
+    max_keys=settings.LOGIN_LIMITER_MAX_KEYS,
+    enabled=settings.LOGIN_RATE_LIMIT_ENABLED,
+)
+
+
+def get_login_throttle() -> LoginThrottle:
+    """FastAPI 依赖注入：提供登录限流器。"""
+    return login_throttle
@@ -0,0 +1,130 @@
+"""
+rollup.py — monthly_totals 汇总表维护
+
+monthly_totals 记录每个用户每月在「启用账户」上的余额合计，是 monthly_balances 的派生数据：
+  - 写余额的各条路径（upsert / 删除月份 / 导入 / 停用账户）在同一事务中调用这里的函数刷新受影响月份
+  - 刷新是基于集合的：先删除目标月份的汇总行，再用一条 INSERT ... SELECT ... GROUP BY 重新生成
+  - 只要某月存在任何余额记录（包括已停用账户、以及账户行缺失的旧数据）就有一行汇总，total 只累加启用账户
+  - total 与趋势 / 导出的「总资产」口径一致；月份列表和单月详情的 total 是当月全部明细之和，由接口自行累加
+
+汇总表损坏或新部署时可重建（在 backend/ 目录下）：
+    python -m app.core.rollup
+"""
+import logging
+from typing import Iterable, Optional, Union
+
+from sqlalchemy import Select, case, delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models.income import Account, MonthlyBalance, MonthlyTotal
+
+logger = logging.getLogger(__name__)
+
+MonthFilter = Union[Iterable[str], Select, None]
+
+
+def _month_condition(column, months: MonthFilter):
+    if isinstance(months, Select):
+        return column.in_(months)
+    return column.in_(list(months))
+
+
+def refresh_monthly_totals(
+    db: Session,
+    user_id: Optional[int] = None,
+    months: MonthFilter = None,
+) -> None:
+    """
+    按 monthly_balances 重新计算汇总行。
+    user_id 为 None 时处理全部用户；months 为 None 时处理该用户全部月份，
+    也可传入月份集合或返回 month 列的 select（如「某账户出现过的月份」）。
+    调用方负责提交事务；ORM 中尚未 flush 的改动需先 flush。
+    """
+    clear = delete(MonthlyTotal)
+    source = (
+        select(
+            MonthlyBalance.user_id,
+            MonthlyBalance.month,
+            func.coalesce(
+                func.sum(case((Account.is_active == True, MonthlyBalance.balance), else_=0.0)),  # noqa: E712
+                0.0,
+            ),
+            func.count(case((Account.is_active == True, 1))),  # noqa: E712
+        )
+        .outerjoin(Account, Account.id == MonthlyBalance.account_id)
+        .group_by(MonthlyBalance.user_id, MonthlyBalance.month)
+    )
+    if user_id is not None:
+        clear = clear.where(MonthlyTotal.user_id == user_id)
+        source = source.where(MonthlyBalance.user_id == user_id)
+    if months is not None:
+        clear = clear.where(_month_condition(MonthlyTotal.month, months))
+        source = source.where(_month_condition(MonthlyBalance.month, months))
+
+    db.execute(clear)
+    db.execute(
+        insert(MonthlyTotal).from_select(
+            ["user_id", "month", "total", "account_count"], source
+        )
+    )
+
+
+def upsert_monthly_total(db: Session, user_id: int, month: str, total: float, account_count: int) -> None:
+    """调用方已在内存中算出某月合计时，直接写入汇总行（无需再扫描 monthly_balances）。"""
+    stmt = sqlite_insert(MonthlyTotal).values(
+        user_id=user_id, month=month, total=total, account_count=account_count,
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[MonthlyTotal.user_id, MonthlyTotal.month],
+        set_={
+            "total": stmt.excluded.total,
+            "account_count": stmt.excluded.account_count,
+            "updated_at": func.now(),
+        },
+    ))
+
+
+def delete_monthly_total(db: Session, user_id: int, month: str) -> None:
+    db.execute(delete(MonthlyTotal).where(
+        MonthlyTotal.user_id == user_id,
+        MonthlyTotal.month == month,
+    ))
+
+
+def months_with_account(account_id: int) -> Select:
+    """某账户有余额记录的月份（用于停用/恢复账户后刷新汇总）。"""
+    return select(MonthlyBalance.month).where(MonthlyBalance.account_id == account_id).distinct()
+
+
+def rebuild_monthly_totals(db: Session) -> int:
+    """清空并重建全部汇总行，返回重建的行数。调用方负责提交事务。"""
+    refresh_monthly_totals(db)
+    return db.scalar(select(func.count()).select_from(MonthlyTotal))
+
+
+def ensure_monthly_totals(db: Session) -> None:
+    """启动时调用：有余额数据但汇总表为空（新建表或旧库升级）时自动重建。"""
+    if db.scalar(select(MonthlyTotal.id).limit(1)) is not None:
+        return
+    if db.scalar(select(MonthlyBalance.id).limit(1)) is None:
+        return
+    count = rebuild_monthly_totals(db)
+    db.commit()
+    logger.info("monthly_totals rebuilt: %d row(s).", count)
+
+
+def main() -> None:
+    from app.db import Base, SessionLocal, engine
+    import app.models  # noqa: F401 触发模型注册
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        count = rebuild_monthly_totals(db)
+        db.commit()
+    logger.info("monthly_totals rebuilt: %d row(s).", count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+schedule_store.py — 还款计划的两种存储方式
+
+materialized（原有方式）：创建债务时把每一期写入 repayment_schedules，一笔 30 年房贷就是 360 行。
+lazy：每期金额都是贷款参数的纯函数，不再落库，读取时由 generate_schedule 现算；
+      只有状态变化（已还 / 逾期及 paid_at）写入稀疏的 repayment_status_overlay，没有记录的期次即为 pending。
+
+两种方式对外输出一致：还款计划接口返回相同的行（lazy 模式下 id 为 None），自动扣款的结果相同。
+自动扣款的水位线（job_watermarks 中的 auto_repay）也在这里维护：生成的计划表中有水位线之前到期的期次时
+（补录历史贷款），把水位线回拨到首期之前，让下一次自动扣款补扣这些期次。
+
+新债务使用 DEBT_SCHEDULE_MODE 指定的方式；已有债务可整体转换（在 backend/ 目录下）：
+    python -m app.core.schedule_store lazy
+    python -m app.core.schedule_store materialized
+"""
+import argparse
+import logging
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import insert, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.debt_calculator import PeriodDetail, count_periods_due, generate_schedule
+from app.models.debt import DebtItem, RepaymentSchedule, RepaymentStatusOverlay
+from app.models.job import JobWatermark
+from app.schemas.debt import RepaymentScheduleRead
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_MODES = ("materialized", "lazy")
+AUTO_REPAY_JOB = "auto_repay"
+
+
+def compute_periods(debt: DebtItem) -> list[PeriodDetail]:
+    return generate_schedule(
+        principal=debt.principal,
+        annual_rate=debt.annual_rate,
+        term_months=debt.term_months,
+        repay_method=debt.repay_method,
+        first_repay_date=debt.first_repay_date,
+    )
+
+
+def _load_overlay(db: Session, debt_id: int) -> dict[int, RepaymentStatusOverlay]:
+    rows = db.query(RepaymentStatusOverlay).filter(RepaymentStatusOverlay.debt_id == debt_id).all()
+    return {o.period_no: o for o in rows}
+
+
+def _materialize(db: Session, debt: DebtItem, overlay: dict[int, RepaymentStatusOverlay]) -> None:
+    """
+    把计划表逐期写入 repayment_schedules。
+    用 Core insert() 一次 executemany 写入全部期次：不为每一行构造 ORM 对象、
+    不经过 identity map 与逐行 flush，360 期房贷也只有一条语句。
+    """
+    rows = []
+    for p in compute_periods(debt):
+        state = overlay.get(p.period_no)
+        rows.append({
+            "debt_id": debt.id,
+            "period_no": p.period_no,
+            "due_date": p.due_date,
+            "payment_amount": p.payment_amount,
+            "principal_amount": p.principal_amount,
+            "interest_amount": p.interest_amount,
+            "remaining_balance": p.remaining_balance,
+            "status": state.status if state else "pending",
+            "paid_at": state.paid_at if state else None,
+        })
+    if rows:
+        db.execute(insert(RepaymentSchedule.__table__), rows)
+
+
+def build_schedule(db: Session, debt: DebtItem) -> None:
+    """根据 DebtItem 的参数重新生成/覆盖还款计划表（lazy 模式下只需清空状态覆盖）。"""
+    db.query(RepaymentSchedule).filter(RepaymentSchedule.debt_id == debt.id).delete()
+    db.query(RepaymentStatusOverlay).filter(RepaymentStatusOverlay.debt_id == debt.id).delete()
+    if debt.schedule_mode != "lazy":
+        _materialize(db, debt, {})
+    rewind_auto_repay_watermark(db, debt.first_repay_date - timedelta(days=1))
+
+
+def auto_repay_watermark(db: Session) -> Optional[date]:
+    """自动扣款已处理到的日期（含），从未运行过时为 None。"""
+    row = db.get(JobWatermark, AUTO_REPAY_JOB)
+    return row.watermark if row else None
+
+
+def advance_auto_repay_watermark(db: Session, day: date, expected: Optional[date]) -> bool:
+    """
+    比较并推进：只有当前水位线仍等于运行开始时读到的 expected 时才前进到 day，返回是否推进。
+    运行期间补录历史贷款回拨了水位线时保持回拨后的值，交给下次运行补扣。
+    """
+    row = db.get(JobWatermark, AUTO_REPAY_JOB)
+    current = row.watermark if row else None
+    if current != expected:
+        return False
+    if row is None:
+        db.add(JobWatermark(job_id=AUTO_REPAY_JOB, watermark=day))
+    elif row.watermark < day:
+        row.watermark = day
+    return True
+
+
+def rewind_auto_repay_watermark(db: Session, day: date) -> None:
+    """水位线只后退不前进；从未运行过时无需处理（首次运行会扫描全部历史账单）。"""
+    row = db.get(JobWatermark, AUTO_REPAY_JOB)
+    if row is not None and day < row.watermark:
+        row.watermark = day
+
+
+def load_schedule(db: Session, debt: DebtItem, status: Optional[str] = None) -> list[RepaymentScheduleRead]:
+    """返回债务的还款计划（按期数升序），可按状态筛选；两种存储方式输出相同。"""
+    if debt.schedule_mode != "lazy":
+        q = db.query(RepaymentSchedule).filter(RepaymentSchedule.debt_id == debt.id)
+        if status:
+            q = q.filter(RepaymentSchedule.status == status)
+        return [RepaymentScheduleRead.model_validate(r) for r in q.order_by(RepaymentSchedule.period_no.asc())]
+
+    overlay = _load_overlay(db, debt.id)
+    rows = []
+    for p in compute_periods(debt):
+        state = overlay.get(p.period_no)
+        row_status = state.status if state else "pending"
+        if status and row_status != status:
+            continue
+        rows.append(RepaymentScheduleRead(
+            id=None,
+            debt_id=debt.id,
+            period_no=p.period_no,
+            due_date=p.due_date,
+            payment_amount=p.payment_amount,
+            principal_amount=p.principal_amount,
+            interest_amount=p.interest_amount,
+            remaining_balance=p.remaining_balance,
+            status=row_status,
+            paid_at=state.paid_at if state else None,
+        ))
+    return rows
+
+
+def lazy_bills_due(db: Session, today: date, since: Optional[date] = None) -> list[tuple[int, int, float]]:
+    """
+    lazy 债务中应自动扣款的期次，条件与 repayment_schedules 上的查询相同：
+    since < due_date <= today（since 为 None 时不设下限）、状态为 pending（覆盖表中没有记录）。
+    返回 [(debt_id, period_no, principal_amount)]，按 debt_id、period_no 排序。
+    """
+    debts = (
+        db.query(DebtItem)
+        .filter(DebtItem.schedule_mode == "lazy", DebtItem.first_repay_date <= today)
+        .order_by(DebtItem.id)
+        .all()
+    )
+    if not debts:
+        return []
+    settled = set(db.execute(
+        select(RepaymentStatusOverlay.debt_id, RepaymentStatusOverlay.period_no)
+        .join(DebtItem, DebtItem.id == RepaymentStatusOverlay.debt_id)
+        .where(DebtItem.schedule_mode == "lazy")
+    ).tuples())
+
+    bills = []
+    for debt in debts:
+        first = count_periods_due(debt.first_repay_date, debt.term_months, since) if since else 0
+        last = count_periods_due(debt.first_repay_date, debt.term_months, today)
+        candidates = [n for n in range(first + 1, last + 1) if (debt.id, n) not in settled]
+        if candidates:
+            # 只有确实有待扣期次时才生成计划表取本金（与落库的金额完全一致）
+            periods = compute_periods(debt)
+            bills.extend((debt.id, n, periods[n - 1].principal_amount) for n in candidates)
+    return bills
+
+
+def convert_schedule_mode(db: Session, debt: DebtItem, mode: str) -> None:
+    """在两种存储方式之间转换一笔债务，保留各期状态与 paid_at。"""
+    if mode not in SCHEDULE_MODES:
+        raise ValueError(f"不支持的还款计划存储方式：{mode}")
+    if debt.schedule_mode == mode:
+        return
+    if mode == "lazy":
+        for row in db.query(RepaymentSchedule).filter(
+            RepaymentSchedule.debt_id == debt.id, RepaymentSchedule.status != "pending",
+        ):
+            db.add(RepaymentStatusOverlay(
+                debt_id=debt.id, period_no=row.period_no, status=row.status, paid_at=row.paid_at,
+            ))
+        db.query(RepaymentSchedule).filter(RepaymentSchedule.debt_id == debt.id).delete()
+    else:
+        _materialize(db, debt, _load_overlay(db, debt.id))
+        db.query(RepaymentStatusOverlay).filter(RepaymentStatusOverlay.debt_id == debt.id).delete()
+    debt.schedule_mode = mode
+
+
+def ensure_schedule_mode_column(bind: Engine) -> bool:
+    """旧库升级：create_all 不会给已存在的 debt_items 补列，缺少 schedule_mode 时补上（已有债务保持 materialized）。"""
+    columns = {c["name"] for c in inspect(bind).get_columns("debt_items")}
+    if "schedule_mode" in columns:
+        return False
+    with bind.begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE debt_items ADD COLUMN schedule_mode VARCHAR(16) NOT NULL DEFAULT 'materialized'"
+        ))
+    logger.info("Added debt_items.schedule_mode column.")
+    return True
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    from app.db import Base, SessionLocal, engine
+    import app.models  # noqa: F401 触发模型注册
+
+    parser = argparse.ArgumentParser(description="转换全部债务的还款计划存储方式")
+    parser.add_argument("mode", choices=SCHEDULE_MODES)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine)
+    ensure_schedule_mode_column(engine)
+    with SessionLocal() as db:
+        debts = db.query(DebtItem).filter(DebtItem.schedule_mode != args.mode).all()
+        for debt in debts:
+            convert_schedule_mode(db, debt, args.mode)
+        db.commit()
+    logger.info("Converted %d debt(s) to %s schedules.", len(debts), args.mode)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,170 +1,419 @@
-import shutil
+import functools
 import logging
+import time
 from datetime import datetime, timedelta, date
 from pathlib import Path
+from typing import Callable, Optional
 
+from apscheduler.events import EVENT_JOB_MISSED, JobExecutionEvent
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
+from app.core.backup import checksum_path, create_backup, sqlite_path
+from app.core.backup_chain import create_chain_backup, expired_backups
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
-scheduler = BackgroundScheduler(timezone="Asia/Shanghai")
+scheduler = BackgroundScheduler(
+    timezone="Asia/Shanghai",
+    job_defaults={
+        # 停机或阻塞后积压的多次运行只补跑一次，超过宽限时间的不再补跑（记为 missed）
+        "coalesce": settings.SCHEDULER_COALESCE,
+        "misfire_grace_time": settings.SCHEDULER_MISFIRE_GRACE_SECONDS,
+        "max_instances": 1,
+    },
+)
 
 
-def _do_backup() -> None:
-    """将 SQLite 数据库文件复制到备份目录，并清理超期备份。"""
+def _record_backup_log(session, log: dict) -> None:
+    """写队列中执行：写入一条备份日志。"""
+    from app.models.backup import BackupLog
+
+    session.add(BackupLog(**log))
+
+
+def _write_backup_log(**log) -> None:
+    # 延迟导入避免循环依赖；日志写入失败不影响备份本身
+    try:
+        from app.db import write_executor
+
+        write_executor.run(_record_backup_log, log)
+    except Exception as exc:
+        logger.warning("Failed to write backup log: %s", exc)
+
+
+def _do_backup() -> Optional[int]:
+    """
+    用 SQLite 在线备份 API 备份数据库（全量或增量），流式压缩并计算 SHA-256，然后清理超期备份。
+    返回复制的页数；失败时写入 BackupLog 后重新抛出。
+    """
     try:
         backup_dir: Path = settings.BACKUP_DIR
         backup_dir.mkdir(parents=True, exist_ok=True)
 
         # 源数据库文件路径（从 DATABASE_URL 解析）
-        db_path_str = settings.DATABASE_URL.replace("sqlite:///", "")
-        db_path = Path(db_path_str)
+        db_path = sqlite_path(settings.DATABASE_URL)
         if not db_path.exists():
             logger.warning("Backup skipped: database file not found at %s", db_path)
             return
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        dest = backup_dir / f"ai_platform_{timestamp}.db"
-        shutil.copy2(db_path, dest)
-        logger.info("Backup succeeded: %s", dest)
+        options = dict(
+            compression=settings.BACKUP_COMPRESSION,
+            pages_per_step=settings.BACKUP_PAGES_PER_STEP,
+            step_sleep_ms=settings.BACKUP_STEP_SLEEP_MS,
+            max_restarts=settings.BACKUP_MAX_RESTARTS,
+            busy_timeout_ms=settings.SQLITE_BUSY_TIMEOUT_MS,
+            memory_limit_bytes=settings.BACKUP_MEMORY_SNAPSHOT_MAX_MB << 20,
+        )
+        if settings.BACKUP_INCREMENTAL:
+            result = create_chain_backup(
+                db_path, backup_dir, full_interval_days=settings.BACKUP_FULL_INTERVAL_DAYS, **options
+            )
+        else:
+            result = create_backup(db_path, backup_dir, **options)
+        dest = result.path
+        logger.info(
+            "Backup succeeded: %s (%s, %d -> %d bytes, %d pages, %d restarts, %d ms)",
+            dest, result.kind, result.original_size, result.file_size, result.pages_copied, result.restarts,
+            result.duration_ms,
+        )
+
+        _write_backup_log(
+            file_path=str(dest),
+            file_size=result.file_size,
+            status="success",
+            pages_copied=result.pages_copied,
+            duration_ms=result.duration_ms,
+            original_size=result.original_size,
+            compression=result.compression,
+            sha256=result.sha256,
+            backup_type=result.kind,
+            base_file=result.base.name if result.base else None,
+        )
 
-        # 写入备份日志（延迟导入避免循环依赖）
-        try:
-            from app.db import SessionLocal
-            from app.models.backup import BackupLog
-
-            with SessionLocal() as session:
-                log = BackupLog(
-                    file_path=str(dest),
-                    file_size=dest.stat().st_size,
-                    status="success",
-                )
-                session.add(log)
-                session.commit()
-        except Exception as db_err:
-            logger.warning("Failed to write backup log: %s", db_err)
-
-        # 清理超期备份（保留最近 N 天）
+        # 清理超期备份（保留最近 N 天；仍被未过期增量依赖的全量基线保留）
         cutoff = datetime.now() - timedelta(days=settings.BACKUP_RETAIN_DAYS)
-        for old_file in backup_dir.glob("ai_platform_*.db"):
-            if old_file.stat().st_mtime < cutoff.timestamp():
-                old_file.unlink()
-                logger.info("Removed old backup: %s", old_file)
+        for old_file in expired_backups(backup_dir, cutoff.timestamp()):
+            old_file.unlink()
+            checksum_path(old_file).unlink(missing_ok=True)
+            logger.info("Removed old backup: %s", old_file)
+        return result.pages_copied
 
     except Exception as exc:
         logger.error("Backup failed: %s", exc)
+        _write_backup_log(file_path="", status="failed", message=str(exc))
+        raise
+
+
+def _settle_period(debt, period_no: int, principal_amount: float) -> None:
+    """扣减债务的剩余本金并累计已还期数（债务不存在或已关闭时不做任何扣减）。"""
+    if debt is None or not debt.is_active:
+        # 债务已关闭，仅标记账单状态
+        return
+
+    # 扣减剩余本金（不低于 0，防止浮点误差）
+    debt.current_balance = round(
+        max(0.0, debt.current_balance - principal_amount), 2
+    )
+    debt.paid_periods += 1
+
+    # 全部还清时标记债务为非活跃
+    if debt.paid_periods >= debt.term_months:
+        debt.is_active = False
+        debt.current_balance = 0.0
+        logger.info(
+            "Auto-repay: debt %d '%s' fully paid off.", debt.id, debt.name
+        )
+    logger.debug(
+        "Auto-repay: debt_id=%d period=%d principal=%.2f new_balance=%.2f",
+        debt.id, period_no, principal_amount, debt.current_balance,
+    )
+
+
+def _repay_chunk(session, bill_ids: list[int], lazy_bills: list[tuple[int, int, float]]) -> int:
+    """
+    写队列中执行：一批账单在同一个事务中扣款，返回实际扣款的期数。
+    bill_ids 为落库账单的 id，lazy_bills 为 lazy 债务的 (debt_id, period_no, principal_amount)。
+    只处理执行时仍为 pending 的期次，重复提交不会重复扣款。
+    """
+    from sqlalchemy import insert, select, update
+    from app.models.debt import DebtItem, RepaymentSchedule, RepaymentStatusOverlay
+
+    now = datetime.now()
+    settled: list[tuple[int, int, float]] = []
+    if bill_ids:
+        rows = session.execute(
+            select(RepaymentSchedule.id, RepaymentSchedule.debt_id,
+                   RepaymentSchedule.period_no, RepaymentSchedule.principal_amount)
+            .where(RepaymentSchedule.id.in_(bill_ids), RepaymentSchedule.status == "pending")
+        ).all()
+        if rows:
+            session.execute(
+                update(RepaymentSchedule)
+                .where(RepaymentSchedule.id.in_([r.id for r in rows]))
+                .values(status="paid", paid_at=now)
+            )
+            settled += [(r.debt_id, r.period_no, r.principal_amount) for r in rows]
+    if lazy_bills:
+        done = set(session.execute(
+            select(RepaymentStatusOverlay.debt_id, RepaymentStatusOverlay.period_no)
+            .where(RepaymentStatusOverlay.debt_id.in_({debt_id for debt_id, _, _ in lazy_bills}))
+        ).tuples())
+        fresh = [bill for bill in lazy_bills if bill[:2] not in done]
+        if fresh:
+            session.execute(insert(RepaymentStatusOverlay.__table__), [
+                {"debt_id": debt_id, "period_no": period_no, "status": "paid", "paid_at": now}
+                for debt_id, period_no, _ in fresh
+            ])
+            settled += fresh
+    if not settled:
+        return 0
+
+    # 本批涉及的债务一次查出，再按债务、期数顺序依次扣减
+    debts = {
+        debt.id: debt
+        for debt in session.query(DebtItem).filter(DebtItem.id.in_({debt_id for debt_id, _, _ in settled}))
+    }
+    for debt_id, period_no, principal_amount in sorted(settled):
+        _settle_period(debts.get(debt_id), period_no, principal_amount)
+    return len(settled)
+
+
+def _advance_watermark(session, day: date, since: Optional[date]) -> bool:
+    from app.core.schedule_store import advance_auto_repay_watermark
+
+    return advance_auto_repay_watermark(session, day, since)
+
+
+def run_auto_repay(session_factory, executor, today: date, chunk_size: int | None = None) -> int:
+    """
+    处理水位线之后、today 及之前到期的全部 pending 账单，返回实际扣款的期数。
+    落库的账单查 repayment_schedules，lazy 模式的债务由 schedule_store 按相同条件现算。
+    账单按 chunk_size 分批，每批作为一个写任务、一个事务提交；上一批完成后才提交下一批，
+    期间其他写请求可以插队。全部批次成功后水位线推进到 today，有失败时保持不动，下次运行重试；
+    推进是比较并设置，运行期间水位线被回拨（补录了历史贷款）时同样保持不动。
+    """
+    from sqlalchemy import select
+    from app.core.schedule_store import auto_repay_watermark, lazy_bills_due
+    from app.models.debt import RepaymentSchedule
+
+    chunk_size = chunk_size or settings.AUTO_REPAY_CHUNK_SIZE
+    start = time.perf_counter()
+    with session_factory() as session:
+        since = auto_repay_watermark(session)
+        query = select(RepaymentSchedule.id).where(
+            RepaymentSchedule.due_date <= today,
+            RepaymentSchedule.status == "pending",
+        )
+        if since is not None:
+            query = query.where(RepaymentSchedule.due_date > since)
+        bill_ids = list(session.scalars(
+            query.order_by(RepaymentSchedule.due_date, RepaymentSchedule.debt_id, RepaymentSchedule.period_no)
+        ))
+        lazy_bills = lazy_bills_due(session, today, since)
+
+    chunks = [(bill_ids[i:i + chunk_size], []) for i in range(0, len(bill_ids), chunk_size)]
+    chunks += [([], lazy_bills[i:i + chunk_size]) for i in range(0, len(lazy_bills), chunk_size)]
+    settled = failed = 0
+    for bills, lazy in chunks:
         try:
-            from app.db import SessionLocal
-            from app.models.backup import BackupLog
+            settled += executor.submit(_repay_chunk, bills, lazy).result(
+                timeout=settings.DB_WRITE_TIMEOUT_SECONDS
+            )
+        except Exception as chunk_err:
+            failed += 1
+            logger.error("Auto-repay: chunk of %d bill(s) failed: %s", len(bills) + len(lazy), chunk_err)
+    if not failed:
+        advanced = executor.submit(_advance_watermark, today, since).result(
+            timeout=settings.DB_WRITE_TIMEOUT_SECONDS
+        )
+        if not advanced:
+            logger.info("Auto-repay: watermark rewound during the run; keeping it for the next run")
 
-            with SessionLocal() as session:
-                log = BackupLog(file_path="", status="failed", message=str(exc))
-                session.add(log)
-                session.commit()
-        except Exception:
-            pass
+    elapsed = time.perf_counter() - start
+    logger.info(
+        "Auto-repay: %s..%s settled %d of %d bill(s) in %d chunk(s), %d failed; %.1f ms (%.0f bills/s)",
+        since or "start", today, settled, len(bill_ids) + len(lazy_bills), len(chunks), failed,
+        elapsed * 1000, settled / elapsed if elapsed > 0 else 0.0,
+    )
+    return settled
 
 
-def _do_auto_repay() -> None:
+def _do_auto_repay() -> int:
     """
     全自动债务扣减任务（方案 A）。
     每天 00:05（Asia/Shanghai）运行一次。
 
-    触发条件：
-    - due_date 的「日」== 今天的「日」（即今天是该账单约定的每月还款日）
-    - due_date <= today（月份已到期，含历史补扣）
-    - status = 'pending'
+    处理范围：
+    - due_date <= today 且 status = 'pending' 的全部账单（不再要求 due_date 的「日」与今天相同，
+      29~31 日的账单在小月、停机期间漏跑的账单都会在下一次运行时补扣）
+    - 只扫描持久化水位线（上次成功运行的日期）之后到期的账单；补录历史贷款时水位线会回拨
 
     设计要点：
-    - 不做全量扫描，只处理今天是还款日的账单，精准对应用户设置的 monthly_repay_day。
-    - 使用 due_date <= today 而非 == today，确保服务在还款日停机后，
-      次日/次月同日重启仍可补扣漏跑的历史账单。
-    - 每笔账单独立 commit，单条失败不影响其他账单继续处理。
+    - 账单分批（AUTO_REPAY_CHUNK_SIZE）提交到单写者队列，每批一个事务：
+      批量更新账单状态、一次查出涉及的债务再扣减余额，单批失败只回滚该批。
+    - 只处理执行时仍为 pending 的期次，重复运行不会重复扣款。
+    - 日志中输出处理的账单数、批数与吞吐量。
     """
-    try:
-        from app.db import SessionLocal
-        from app.models.debt import DebtItem, RepaymentSchedule
-        from sqlalchemy import extract, and_
-
-        today = date.today()
-        with SessionLocal() as session:
-            pending_bills = (
-                session.query(RepaymentSchedule)
-                .filter(
-                    and_(
-                        # 只处理今天是约定还款日的账单（日匹配）
-                        extract("day", RepaymentSchedule.due_date) == today.day,
-                        # 月份已到期（含历史漏扣补偿）
-                        RepaymentSchedule.due_date <= today,
-                        RepaymentSchedule.status == "pending",
-                    )
-                )
-                .all()
-            )
+    from app.db import SessionLocal, write_executor
+
+    return run_auto_repay(SessionLocal, write_executor, date.today())
+
+
+def _record_job_run(session, run: dict) -> None:
+    """写队列中执行：写入一条运行记录，并清理超过保留天数的旧记录。"""
+    from app.models.job import JobRun
 
-            if not pending_bills:
-                logger.info("Auto-repay: no pending bills for %s", today)
-                return
-
-            logger.info("Auto-repay: processing %d bill(s) for %s", len(pending_bills), today)
-
-            for bill in pending_bills:
-                try:
-                    debt = session.get(DebtItem, bill.debt_id)
-                    if not debt or not debt.is_active:
-                        # 债务已关闭，仅标记账单状态
-                        bill.status = "paid"
-                        bill.paid_at = datetime.now()
-                        session.commit()
-                        continue
-
-                    # 扣减剩余本金（不低于 0，防止浮点误差）
-                    debt.current_balance = round(
-                        max(0.0, debt.current_balance - bill.principal_amount), 2
-                    )
-                    debt.paid_periods += 1
-
-                    # 全部还清时标记债务为非活跃
-                    if debt.paid_periods >= debt.term_months:
-                        debt.is_active = False
-                        debt.current_balance = 0.0
-                        logger.info(
-                            "Auto-repay: debt %d '%s' fully paid off.", debt.id, debt.name
-                        )
-
-                    bill.status = "paid"
-                    bill.paid_at = datetime.now()
-                    session.commit()
-                    logger.info(
-                        "Auto-repay: debt_id=%d period=%d principal=%.2f new_balance=%.2f",
-                        debt.id, bill.period_no, bill.principal_amount, debt.current_balance,
-                    )
-                except Exception as row_err:
-                    session.rollback()
-                    logger.error(
-                        "Auto-repay: failed on schedule_id=%d: %s", bill.id, row_err
-                    )
+    session.add(JobRun(**run))
+    cutoff = datetime.now() - timedelta(days=settings.JOB_RUN_RETAIN_DAYS)
+    session.query(JobRun).filter(JobRun.started_at < cutoff).delete()
 
+
+def _write_job_run(**run) -> None:
+    try:
+        from app.db import write_executor
+
+        write_executor.run(_record_job_run, run)
     except Exception as exc:
-        logger.error("Auto-repay task crashed: %s", exc)
+        logger.warning("Failed to record run of job %s: %s", run.get("job_id"), exc)
+
+
+def tracked_job(job_id: str, fn: Callable[[], Optional[int]]) -> Callable[[], None]:
+    """
+    包装 APScheduler 任务：每次运行写一条 job_runs（开始 / 结束时间、耗时、fn 返回的处理数量、结果与错误）。
+    fn 抛出的异常在这里记录，不再向 APScheduler 抛出。
+    """
+    @functools.wraps(fn)
+    def wrapper() -> None:
+        started_at = datetime.now()
+        start = time.perf_counter()
+        rows, status, error = None, "success", None
+        try:
+            rows = fn()
+        except Exception as exc:
+            status, error = "failed", str(exc)[:512]
+            logger.error("Job %s failed: %s", job_id, exc)
+        _write_job_run(
+            job_id=job_id,
+            started_at=started_at,
+            finished_at=datetime.now(),
+            duration_ms=round((time.perf_counter() - start) * 1000),
+            rows_processed=rows,
+            status=status,
+            error=error,
+        )
+
+    return wrapper
+
+
+def _on_job_missed(event: JobExecutionEvent) -> None:
+    """APScheduler 判定某次运行已超过 misfire_grace_time 而放弃执行时，记一条 missed。"""
+    scheduled = event.scheduled_run_time.astimezone().replace(tzinfo=None)
+    logger.warning("Job %s missed its run at %s", event.job_id, scheduled)
+    _write_job_run(
+        job_id=event.job_id,
+        started_at=scheduled,
+        status="missed",
+        error=f"错过计划运行时间 {scheduled:%Y-%m-%d %H:%M:%S}",
+    )
+
+
+scheduler.add_listener(_on_job_missed, EVENT_JOB_MISSED)
+
+
+def record_downtime_misses(session, jobs: list[tuple[str, object]], now: datetime) -> int:
+    """
+    写队列中执行：补记停机期间错过的运行，返回补记的条数。
+    任务存放在内存 jobstore 中，进程重启后从 now 开始重新计算下次运行时间，
+    停机 / 重启期间到点的运行不会触发 EVENT_JOB_MISSED。启动时按每个任务的触发器，
+    把最后一条运行记录之后、now 之前本应运行的时间点记为 missed。
+    从未运行过的任务（新部署）不补记；最多回溯 JOB_RUN_RETAIN_DAYS 天。
+    """
+    from sqlalchemy import func
+    from app.models.job import JobRun
+
+    horizon = now - timedelta(days=settings.JOB_RUN_RETAIN_DAYS)
+    recorded = 0
+    for job_id, trigger in jobs:
+        last = session.query(func.max(JobRun.started_at)).filter(JobRun.job_id == job_id).scalar()
+        if last is None:
+            continue
+        # started_at 是本地时间；从其后 1 秒开始找，避免把上次运行对应的时间点再算一次
+        cursor = max(last.astimezone(now.tzinfo) + timedelta(seconds=1), horizon)
+        while (fire := trigger.get_next_fire_time(None, cursor)) is not None and fire < now:
+            scheduled = fire.astimezone().replace(tzinfo=None)
+            session.add(JobRun(
+                job_id=job_id,
+                started_at=scheduled,
+                status="missed",
+                error=f"停机期间错过计划运行时间 {scheduled:%Y-%m-%d %H:%M:%S}",
+            ))
+            recorded += 1
+            cursor = fire + timedelta(seconds=1)
+    if recorded:
+        logger.warning("Recorded %d run(s) missed while the scheduler was down.", recorded)
+    return recorded
+
+
+def job_summaries(session) -> list[dict]:
+    """已注册任务的下次运行时间，以及最近 JOB_RUN_STATS_WINDOW 次运行的结果与耗时 p95。"""
+    from app.core.metrics import percentile
+    from app.models.job import JobRun
+
+    summaries = []
+    for job in scheduler.get_jobs():
+        runs = (
+            session.query(JobRun)
+            .filter(JobRun.job_id == job.id)
+            .order_by(JobRun.started_at.desc(), JobRun.id.desc())
+            .limit(settings.JOB_RUN_STATS_WINDOW)
+            .all()
+        )
+        completed = [r for r in runs if r.duration_ms is not None]
+        durations = sorted(r.duration_ms for r in completed)
+        last = runs[0] if runs else None
+        next_run = getattr(job, "next_run_time", None)
+        summaries.append({
+            "job_id": job.id,
+            "next_run_time": next_run.isoformat() if next_run else None,
+            "last_run": {
+                "started_at": last.started_at.isoformat(),
+                "finished_at": last.finished_at.isoformat() if last.finished_at else None,
+                "status": last.status,
+                "duration_ms": last.duration_ms,
+                "rows_processed": last.rows_processed,
+                "error": last.error,
+            } if last else None,
+            "last_duration_ms": completed[0].duration_ms if completed else None,
+            "p95_duration_ms": percentile(durations, 0.95) if durations else None,
+            "recent_runs": len(runs),
+            "recent_failed": sum(r.status == "failed" for r in runs),
+            "recent_missed": sum(r.status == "missed" for r in runs),
+        })
+    return summaries
 
 
 def start_scheduler() -> None:
     scheduler.add_job(
-        _do_backup,
+        tracked_job("daily_backup", _do_backup),
         CronTrigger(hour=settings.BACKUP_HOUR, minute=settings.BACKUP_MINUTE),
         id="daily_backup",
         replace_existing=True,
     )
     # 方案 A：全自动债务还款扣减，每天 00:05 运行
     scheduler.add_job(
-        _do_auto_repay,
+        tracked_job("daily_auto_repay", _do_auto_repay),
         CronTrigger(hour=0, minute=5),
         id="daily_auto_repay",
         replace_existing=True,
     )
+    try:
+        from app.db import write_executor
+
+        jobs = [(job.id, job.trigger) for job in scheduler.get_jobs()]
+        write_executor.run(record_downtime_misses, jobs, datetime.now(scheduler.timezone))
+    except Exception as exc:
+        logger.warning("Failed to record runs missed during downtime: %s", exc)
     scheduler.start()
     logger.info(
         "Scheduler started. Daily backup at %02d:%02d; auto-repay at 00:05",
@@ -1,3 +1,6 @@
+import hashlib
+import re
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
@@ -5,16 +8,64 @@ import bcrypt
 from jose import JWTError, jwt
 
 from app.core.config import settings
+from app.core.token_cache import TokenCache
 
+_BCRYPT_COST_RE = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
 
-def hash_password(plain: str) -> str:
-    return bcrypt.hashpw(plain.encode(), bcrypt.gensalt()).decode()
+token_cache = TokenCache(max_size=settings.JWT_CACHE_MAX_SIZE, enabled=settings.JWT_CACHE_ENABLED)
+
+
+def hash_password(plain: str, rounds: int | None = None) -> str:
+    """rounds 为空时使用 settings.BCRYPT_ROUNDS。"""
+    salt = bcrypt.gensalt(rounds or settings.BCRYPT_ROUNDS)
+    return bcrypt.hashpw(plain.encode(), salt).decode()
 
 
 def verify_password(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(plain.encode(), hashed.encode())
 
 
+def bcrypt_rounds(hashed: str) -> int | None:
+    """从哈希串（如 $2b$12$...）中解析 cost，无法识别时返回 None。"""
+    m = _BCRYPT_COST_RE.match(hashed)
+    return int(m.group(1)) if m else None
+
+
+def needs_rehash(hashed: str) -> bool:
+    """哈希的 cost 与当前配置不一致时需要重新哈希（升级或降级）。"""
+    return bcrypt_rounds(hashed) != settings.BCRYPT_ROUNDS
+
+
+def measure_bcrypt_verify(rounds: int, samples: int = 3) -> float:
+    """测量当前主机上给定 cost 的单次校验耗时（秒，取多次中的最小值以排除抖动）。"""
+    hashed = bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds))
+    best = float("inf")
+    for _ in range(samples):
+        t0 = time.perf_counter()
+        bcrypt.checkpw(b"calibration", hashed)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def calibrate_bcrypt_rounds(
+    target_ms: float | None = None,
+    min_rounds: int = 4,
+    max_rounds: int = 16,
+) -> int:
+    """
+    选出在当前主机上单次校验耗时不超过 target_ms 的最大 cost（至少 min_rounds）。
+    cost 每加 1 耗时翻倍，从 min_rounds 逐级向上测量，超过目标即停止，总耗时约为目标的 2 倍。
+    target_ms 为空时使用 settings.BCRYPT_TARGET_MS。
+    """
+    target = (target_ms or settings.BCRYPT_TARGET_MS) / 1000
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        if measure_bcrypt_verify(rounds) > target:
+            break
+        chosen = rounds
+    return chosen
+
+
 def create_access_token(subject: Any, expires_delta: timedelta | None = None) -> str:
     expire = datetime.now(timezone.utc) + (
         expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -23,10 +74,22 @@ def create_access_token(subject: Any, expires_delta: timedelta | None = None) ->
     return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
+def _signing_key_fingerprint() -> bytes:
+    """当前签名配置的指纹，密钥轮换后 token 缓存随之失效。"""
+    return hashlib.sha256(f"{settings.ALGORITHM}:{settings.SECRET_KEY}".encode()).digest()
+
+
 def decode_access_token(token: str) -> str | None:
-    """返回 sub（用户 id 字符串），失败返回 None"""
+    """返回 sub（用户 id 字符串），失败返回 None。校验通过的结果缓存到 token 的 exp 为止。"""
+    fingerprint = _signing_key_fingerprint()
+    sub = token_cache.get(token, fingerprint)
+    if sub is not None:
+        return sub
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload.get("sub")
     except JWTError:
         return None
+    sub, exp = payload.get("sub"), payload.get("exp")
+    if sub is not None and isinstance(exp, (int, float)):
+        token_cache.put(token, fingerprint, sub, exp)
+    return sub
@@ -0,0 +1,89 @@
+"""
+token_cache.py — JWT 解码结果的进程内缓存
+
+同一个 bearer token 在有效期内会被反复提交，每次都要重新解析并做 HMAC 校验。
+这里按 token 的 SHA-256 摘要缓存解码出的 sub：
+  - 条目只保存到 token 自身的 exp，过期后查询即删除，绝不会延长 token 的有效期
+  - 总数不超过 JWT_CACHE_MAX_SIZE，超出时淘汰最久未用的条目
+  - 只缓存校验通过的 token，伪造/无效 token 不会占用缓存
+  - 缓存与签名密钥绑定：SECRET_KEY 或 ALGORITHM 变化（密钥轮换）时整体清空
+  - 键使用摘要而非原始 token，内存中不保留可直接重放的凭据
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def _digest(value: str) -> bytes:
+    return hashlib.sha256(value.encode()).digest()
+
+
+class TokenCache:
+    def __init__(self, max_size: int = 4096, enabled: bool = True) -> None:
+        self._max_size = max(1, max_size)
+        self._enabled = enabled
+        self._data: "OrderedDict[bytes, tuple[float, str]]" = OrderedDict()
+        self._key_fingerprint: Optional[bytes] = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._rotations = 0
+
+    def _check_key(self, key_fingerprint: bytes) -> None:
+        # 调用方已持有 self._lock
+        if self._key_fingerprint != key_fingerprint:
+            if self._key_fingerprint is not None:
+                self._rotations += 1
+            self._data.clear()
+            self._key_fingerprint = key_fingerprint
+
+    def get(self, token: str, key_fingerprint: bytes) -> Optional[str]:
+        """命中且未过期时返回 sub，否则返回 None。"""
+        if not self._enabled:
+            return None
+        digest = _digest(token)
+        now = time.time()
+        with self._lock:
+            self._check_key(key_fingerprint)
+            entry = self._data.get(digest)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[digest]
+                self._misses += 1
+                return None
+            self._data.move_to_end(digest)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, token: str, key_fingerprint: bytes, sub: str, exp: float) -> None:
+        if not self._enabled or exp <= time.time():
+            return
+        digest = _digest(token)
+        with self._lock:
+            self._check_key(key_fingerprint)
+            self._data[digest] = (exp, sub)
+            self._data.move_to_end(digest)
+            while len(self._data) > self._max_size:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self._enabled,
+                "size": len(self._data),
+                "max_size": self._max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "key_rotations": self._rotations,
+            }
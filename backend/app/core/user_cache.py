@@ -0,0 +1,125 @@
+"""
+user_cache.py — 已认证用户的进程内缓存（TTL + LRU）
+
+每个需要登录的请求都要经过 get_current_user，按 id 读取一次 users 表。
+仪表盘页面会同时发出 5~8 个请求，这些读取全部命中同一行，因此在进程内缓存启用状态的用户：
+  - 以用户 id 为键，条目在 USER_CACHE_TTL_SECONDS 后过期，总数不超过 USER_CACHE_MAX_SIZE（最久未用的先淘汰）
+  - 缓存的是列值快照，命中时返回一个新的、未关联会话的 User 对象；
+    需要修改用户的接口应在自己的会话中重新加载该行
+  - 失效：ORM 会话 flush / commit 时，凡是被修改或删除的 User 都会自动失效（覆盖改密码、改角色、停用），
+    修改用户的接口也应显式调用 invalidate()；绕过 ORM 的批量 UPDATE 不会触发失效，最长延迟一个 TTL
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.user import User
+
+_COLUMNS = [c.key for c in User.__table__.columns]
+_PENDING_KEY = "user_cache_invalidate"
+
+
+class UserCache:
+    def __init__(self, ttl: float = 60.0, max_size: int = 1024, enabled: bool = True) -> None:
+        self._ttl = ttl
+        self._max_size = max(1, max_size)
+        self._enabled = enabled
+        self._data: "OrderedDict[int, tuple[float, dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, user_id: int) -> Optional[User]:
+        """命中时返回 User 快照副本；未命中或已过期返回 None。"""
+        if not self._enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[user_id]
+                self._misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self._hits += 1
+            values = entry[1]
+        return User(**values)
+
+    def put(self, user: User) -> None:
+        """缓存启用状态的用户；停用用户不缓存。"""
+        if not self._enabled or not user.is_active:
+            return
+        values = {key: getattr(user, key) for key in _COLUMNS}
+        expires_at = time.monotonic() + self._ttl
+        with self._lock:
+            self._data[user.id] = (expires_at, values)
+            self._data.move_to_end(user.id)
+            while len(self._data) > self._max_size:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            if self._data.pop(user_id, None) is not None:
+                self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self._enabled,
+                "size": len(self._data),
+                "max_size": self._max_size,
+                "ttl_seconds": self._ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+user_cache = UserCache(
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    enabled=settings.USER_CACHE_ENABLED,
+)
+
+
+# ── ORM 事件：被修改 / 删除的用户自动失效 ───────────────────────────────────────
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session: Session, flush_context) -> None:
+    changed = {
+        obj.id for obj in (*session.dirty, *session.deleted)
+        if isinstance(obj, User) and obj.id is not None
+    }
+    if not changed:
+        return
+    session.info.setdefault(_PENDING_KEY, set()).update(changed)
+    # flush 后立即失效一次；提交后再失效一次，防止并发请求在提交前把旧值重新放回缓存
+    for user_id in changed:
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_users(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,238 @@
+"""
+write_queue.py — SQLite 单写者执行器
+
+SQLite 同一时刻只允许一个写事务。多个请求线程各自开事务写库时，
+后到者只能在 busy_timeout 内轮询等锁，高并发下会出现 "database is locked" 与长尾延迟。
+
+WriteExecutor 把所有写操作（unit of work）放进一个队列，由唯一的写线程持有唯一的写连接串行执行：
+  - 每个 unit of work 是一个函数 fn(session, *args)，在独立 SAVEPOINT 中执行，
+    单个失败只回滚自身，不影响同批次的其他写操作
+  - 写线程每次从队列中取出当前已排队的全部任务（最多 batch_max 个），合并为一次 COMMIT（group commit）
+  - fn 的返回值 / 异常通过 Future 传回调用方；fn 内不应调用 session.commit()
+  - 等待超时只针对排队阶段：任务一旦开始执行，调用方就等到它提交完成
+
+enabled=False 时退化为在调用线程内直接执行并提交（便于排查问题或在非 SQLite 数据库上使用）。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core.metrics import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_STOP = object()
+
+
+class WriteQueueTimeout(Exception):
+    """写操作在队列中等待超时（写线程繁忙），任务已取消、未执行。"""
+
+
+@dataclass
+class _WriteJob:
+    fn: Callable[..., Any]
+    args: tuple
+    future: Future
+    enqueued_at: float
+
+
+class WriteExecutor:
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        *,
+        batch_max: int = 32,
+        timeout: float = 30.0,
+        enabled: bool = True,
+        name: str = "sqlite-writer",
+    ) -> None:
+        self._session_factory = session_factory
+        self._batch_max = max(1, batch_max)
+        self._timeout = timeout
+        self._enabled = enabled
+        self._name = name
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+        # 指标
+        self._stats_lock = threading.Lock()
+        self._wait = LatencyRecorder()
+        self._jobs_total = 0
+        self._jobs_failed = 0
+        self._batches_total = 0
+        self._commits_failed = 0
+
+    # ── 生命周期 ────────────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        if not self._enabled:
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name=self._name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """排空队列中已提交的任务后停止写线程。"""
+        with self._start_lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._queue.put(_STOP)
+            thread.join(timeout)
+            self._thread = None
+
+    # ── 提交写操作 ──────────────────────────────────────────────────────────────
+
+    def submit(self, fn: Callable[..., T], *args: Any) -> "Future[T]":
+        """提交一个写操作 fn(session, *args)，返回 Future。"""
+        future: Future = Future()
+        if not self._enabled:
+            if future.set_running_or_notify_cancel():
+                self._run_inline(_WriteJob(fn, args, future, time.perf_counter()))
+            return future
+        self.start()
+        self._queue.put(_WriteJob(fn, args, future, time.perf_counter()))
+        return future
+
+    def run(self, fn: Callable[..., T], *args: Any, timeout: float | None = None) -> T:
+        """
+        同步提交并等待结果（供 def 路由 / 定时任务使用）。
+        timeout 只限制在队列中排队的时间（默认取构造时的值）：超时且任务尚未开始时取消任务并抛出
+        WriteQueueTimeout，调用方可以安全重试；任务已开始执行则一直等到它提交完成，
+        不会出现调用方收到超时、写入却已生效的情况。
+        """
+        timeout = self._timeout if timeout is None else timeout
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                raise WriteQueueTimeout(f"写队列等待超过 {timeout}s")
+        return future.result()
+
+    async def run_async(self, fn: Callable[..., T], *args: Any, timeout: float | None = None) -> T:
+        """异步提交并等待结果（供 async def 路由使用，不占用线程池）。timeout 同 run()。"""
+        timeout = self._timeout if timeout is None else timeout
+        future = self.submit(fn, *args)
+        waiter = asyncio.wrap_future(future)
+        # asyncio.wait 超时不会取消 waiter；是否放弃由 future.cancel() 按任务是否已开始决定
+        done, _ = await asyncio.wait({waiter}, timeout=timeout)
+        if not done and future.cancel():
+            raise WriteQueueTimeout(f"写队列等待超过 {timeout}s")
+        return await waiter
+
+    # ── 写线程 ──────────────────────────────────────────────────────────────────
+
+    def _loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop_after = False
+            # 取出当前已排队的任务，合并为一次提交
+            while len(batch) < self._batch_max:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stop_after = True
+                    break
+                batch.append(nxt)
+            try:
+                self._run_batch(batch)
+            except Exception as exc:  # 兜底：写线程不能因单个批次异常退出
+                logger.exception("Write batch crashed: %s", exc)
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(exc)
+            if stop_after:
+                return
+
+    def _run_batch(self, batch: list[_WriteJob]) -> None:
+        succeeded: list[tuple[_WriteJob, Any]] = []
+        with self._session_factory() as session:
+            for job in batch:
+                if not job.future.set_running_or_notify_cancel():
+                    continue  # 调用方已超时取消
+                self._wait.record(time.perf_counter() - job.enqueued_at)
+                try:
+                    with session.begin_nested():
+                        result = job.fn(session, *job.args)
+                except Exception as exc:
+                    self._record_job(failed=True)
+                    job.future.set_exception(exc)
+                    continue
+                succeeded.append((job, result))
+
+            try:
+                session.commit()
+            except Exception as exc:
+                session.rollback()
+                logger.error("Write batch commit failed (%d job(s)): %s", len(succeeded), exc)
+                with self._stats_lock:
+                    self._batches_total += 1
+                    self._commits_failed += 1
+                for job, _ in succeeded:
+                    self._record_job(failed=True)
+                    job.future.set_exception(exc)
+                return
+
+        with self._stats_lock:
+            self._batches_total += 1
+        for job, result in succeeded:
+            self._record_job(failed=False)
+            job.future.set_result(result)
+
+    def _run_inline(self, job: _WriteJob) -> None:
+        try:
+            with self._session_factory() as session:
+                result = job.fn(session, *job.args)
+                session.commit()
+        except Exception as exc:
+            self._record_job(failed=True)
+            job.future.set_exception(exc)
+            return
+        with self._stats_lock:
+            self._batches_total += 1
+        self._record_job(failed=False)
+        job.future.set_result(result)
+
+    # ── 指标 ────────────────────────────────────────────────────────────────────
+
+    def _record_job(self, failed: bool) -> None:
+        with self._stats_lock:
+            self._jobs_total += 1
+            if failed:
+                self._jobs_failed += 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            jobs = self._jobs_total
+            batches = self._batches_total
+            snapshot = {
+                "enabled": self._enabled,
+                "queue_depth": self._queue.qsize(),
+                "jobs_total": jobs,
+                "jobs_failed": self._jobs_failed,
+                "batches_total": batches,
+                "commits_failed": self._commits_failed,
+                "avg_batch_size": round(jobs / batches, 2) if batches else 0.0,
+            }
+        snapshot["wait"] = self._wait.snapshot()
+        return snapshot
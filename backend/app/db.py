@@ -1,16 +1,128 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from typing import Any, Callable, TypeVar, Union
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings
+from app.core.write_queue import WriteExecutor
+
+T = TypeVar("T")
+
+# 只读依赖注入得到的会话类型：异步模式下为 AsyncSession，同步模式下为 Session
+ReadSession = Union[AsyncSession, Session]
+
+
+def sqlite_pragmas() -> list[tuple[str, object]]:
+    """按 settings 生成需要在每个 SQLite 连接上执行的 PRAGMA 列表。"""
+    return [
+        ("journal_mode", settings.SQLITE_JOURNAL_MODE),
+        ("synchronous", settings.SQLITE_SYNCHRONOUS),
+        ("busy_timeout", settings.SQLITE_BUSY_TIMEOUT_MS),
+        ("cache_size", settings.SQLITE_CACHE_SIZE),
+        ("mmap_size", settings.SQLITE_MMAP_SIZE),
+        ("temp_store", settings.SQLITE_TEMP_STORE),
+        ("foreign_keys", "ON" if settings.SQLITE_FOREIGN_KEYS else "OFF"),
+    ]
+
+
+def apply_sqlite_profile(engine: Engine, read_only: bool = False) -> None:
+    """
+    为 SQLite 引擎注册 connect 事件，新建连接时依次执行 PRAGMA。
+    PRAGMA 均为连接级设置（journal_mode=WAL 除外，它会持久化到库文件），
+    因此必须在连接池创建每个连接时都执行一遍。
+    异步引擎请传入 async_engine.sync_engine。
+    SQLITE_TUNING_ENABLED=False 时跳过调优参数；read_only=True 时额外开启 query_only，用于只读连接池。
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = sqlite_pragmas() if settings.SQLITE_TUNING_ENABLED else []
+    if read_only:
+        pragmas.append(("query_only", "ON"))
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def to_async_url(url: str) -> str:
+    """sqlite:///path → sqlite+aiosqlite:///path"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    return url
+
+
+def create_writer_engine(url: str) -> Engine:
+    """
+    单写者专用引擎：连接池只有 1 个连接，由写线程独占。
+    pysqlite 默认的隐式事务会让 SAVEPOINT 失效，这里改为由 SQLAlchemy 显式发出
+    BEGIN IMMEDIATE：既保证 SAVEPOINT 语义正确，也在事务开始时就拿到写锁。
+    """
+    writer = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=1,
+        max_overflow=0,
+        echo=False,
+    )
+    apply_sqlite_profile(writer)
+    if writer.dialect.name == "sqlite":
+        @event.listens_for(writer, "connect")
+        def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(writer, "begin")
+        def _begin_immediate(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+    return writer
+
 
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args={"check_same_thread": False},  # SQLite 多线程
     echo=False,
 )
+apply_sqlite_profile(engine)
 
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+# 只读连接池：与写连接分离，连接级 query_only 防止误写
+read_engine = create_engine(
+    settings.DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    echo=False,
+)
+apply_sqlite_profile(read_engine, read_only=True)
+ReadSessionLocal = sessionmaker(bind=read_engine, autocommit=False, autoflush=False)
+
+# 单写者：专用写连接 + 写队列
+writer_engine = create_writer_engine(settings.DATABASE_URL)
+WriterSessionLocal = sessionmaker(bind=writer_engine, autoflush=False, expire_on_commit=False)
+write_executor = WriteExecutor(
+    WriterSessionLocal,
+    batch_max=settings.DB_WRITE_BATCH_MAX,
+    timeout=settings.DB_WRITE_TIMEOUT_SECONDS,
+    enabled=settings.DB_WRITE_QUEUE_ENABLED,
+)
+
+# 异步引擎仅在启用时创建（未安装 aiosqlite 时可关闭 DB_ASYNC_ENABLED 回退同步）；
+# 只承担只读查询，同样开启 query_only
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_ASYNC_ENABLED:
+    async_engine = create_async_engine(to_async_url(settings.DATABASE_URL), echo=False)
+    apply_sqlite_profile(async_engine.sync_engine, read_only=True)
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+
 
 class Base(DeclarativeBase):
     pass
@@ -23,3 +135,39 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_readonly_db():
+    """FastAPI 依赖注入：提供只读连接池上的同步会话。"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """FastAPI 依赖注入：提供异步数据库会话（aiosqlite），不占用线程池。"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# 热点只读接口使用的会话依赖，由 DB_ASYNC_ENABLED 决定走异步还是同步
+get_read_db = get_async_db if settings.DB_ASYNC_ENABLED else get_readonly_db
+
+
+def get_write_executor() -> WriteExecutor:
+    """FastAPI 依赖注入：提供单写者执行器，写操作通过 run()/run_async() 提交。"""
+    return write_executor
+
+
+async def run_read(db: ReadSession, fn: Callable[..., T], *args: Any) -> T:
+    """
+    在只读会话上执行一段同步查询逻辑 fn(session, *args)。
+    - AsyncSession：通过 run_sync 在事件循环内以 greenlet 方式执行，不占用线程池
+    - Session：交给 Starlette 线程池执行（同步模式）
+    查询逻辑只需按同步 Session 编写一次，两种模式共用。
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
@@ -3,27 +3,55 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
 from app.core.security import decode_access_token
-from app.db import get_db
+from app.core.user_cache import user_cache
+from app.db import ReadSession, get_db, get_read_db, run_read
 from app.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无效的认证凭据",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _load_active_user(db: Session, user_id: int) -> User | None:
+    user = db.get(User, user_id)
+    if user is None or not user.is_active:
+        return None
+    user_cache.put(user)
+    return user
+
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> User:
     user_id_str = decode_access_token(token)
     if user_id_str is None:
-        raise credentials_exception
-    user = db.get(User, int(user_id_str))
-    if user is None or not user.is_active:
-        raise credentials_exception
+        raise _credentials_exception()
+    user_id = int(user_id_str)
+    user = user_cache.get(user_id) or _load_active_user(db, user_id)
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: ReadSession = Depends(get_read_db),
+) -> User:
+    """get_current_user 的异步版本，供 async 只读接口使用，避免占用线程池。"""
+    user_id_str = decode_access_token(token)
+    if user_id_str is None:
+        raise _credentials_exception()
+    user_id = int(user_id_str)
+    user = user_cache.get(user_id) or await run_read(db, _load_active_user, user_id)
+    if user is None:
+        raise _credentials_exception()
     return user
 
 
@@ -1,12 +1,18 @@
 import logging
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from app.core.backup import ensure_backup_log_columns
 from app.core.config import settings
+from app.core.password_pool import PasswordPoolBusy, password_pool
+from app.core.rollup import ensure_monthly_totals
+from app.core.schedule_store import ensure_schedule_mode_column
 from app.core.scheduler import start_scheduler, stop_scheduler
-from app.db import engine, Base
-from app.models import User, Account, MonthlyBalance, BackupLog, DebtItem, RepaymentSchedule  # noqa: F401 触发模型注册
+from app.core.write_queue import WriteQueueTimeout
+from app.db import engine, async_engine, write_executor, Base
+from app.models import User, Account, MonthlyBalance, MonthlyTotal, BackupLog, DebtItem, RepaymentSchedule, RepaymentStatusOverlay, JobWatermark, JobRun  # noqa: F401 触发模型注册
 from app.core.security import hash_password
 
 logging.basicConfig(level=logging.INFO)
@@ -23,22 +29,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ---------- 异常处理 ----------
+@app.exception_handler(WriteQueueTimeout)
+async def write_queue_timeout_handler(request: Request, exc: WriteQueueTimeout):
+    return JSONResponse(status_code=503, content={"detail": "数据库繁忙，请稍后重试"})
+
+
+@app.exception_handler(PasswordPoolBusy)
+async def password_pool_busy_handler(request: Request, exc: PasswordPoolBusy):
+    return JSONResponse(status_code=503, content={"detail": "登录请求过多，请稍后重试"})
+
+
 # ---------- 路由注册 ----------
 from app.api.auth import router as auth_router
 from app.api.income.balances import router as balances_router
 from app.api.backup import router as backup_router
 from app.api.debt.debts import router as debts_router
+from app.api.metrics import router as metrics_router
+from app.api.scheduler import router as scheduler_router
 
 app.include_router(auth_router,     prefix="/api/auth",    tags=["认证"])
 app.include_router(balances_router, prefix="/api/income",  tags=["余额管理"])
 app.include_router(backup_router,   prefix="/api/backup",  tags=["数据备份"])
 app.include_router(debts_router,    prefix="/api/debt",    tags=["债务管理"])
+app.include_router(metrics_router,  prefix="/api/metrics", tags=["系统"])
+app.include_router(scheduler_router, prefix="/api/scheduler", tags=["系统"])
 
 
 # ---------- 生命周期 ----------
 @app.on_event("startup")
 def on_startup() -> None:
     Base.metadata.create_all(bind=engine)
+    ensure_schedule_mode_column(engine)
+    ensure_backup_log_columns(engine)
     logger.info("Database tables ensured.")
 
     from app.db import SessionLocal
@@ -61,7 +84,7 @@ def on_startup() -> None:
             existing = admin
 
         # 数据迁移：若 monthly_balances 中有 account_id 1-6 但 accounts 表为空，
-        # 则自动创建默认账户并修正 account_id FK（SQLite 不强制 FK，但需保持一致）
+        # 则自动创建默认账户并修正 account_id（连接已开启 foreign_keys=ON，修正后的 account_id 须指向已存在的账户）
         acc_count = db.query(Account).filter(Account.user_id == existing.id).count()
         if acc_count == 0:
             old_balance_count = db.query(MonthlyBalance).filter(
@@ -91,12 +114,19 @@ def on_startup() -> None:
                 db.commit()
                 logger.info("Migrated existing monthly_balances to new accounts table.")
 
+        # 汇总表为空（新建表 / 旧库升级）时从 monthly_balances 重建
+        ensure_monthly_totals(db)
+
     start_scheduler()
 
 
 @app.on_event("shutdown")
-def on_shutdown() -> None:
+async def on_shutdown() -> None:
     stop_scheduler()
+    write_executor.stop()
+    password_pool.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 @app.get("/api/health", tags=["系统"])
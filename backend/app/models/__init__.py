@@ -1,6 +1,8 @@
 from .user import User
-from .income import Account, MonthlyBalance
+from .income import Account, MonthlyBalance, MonthlyTotal
 from .backup import BackupLog
-from .debt import DebtItem, RepaymentSchedule
+from .debt import DebtItem, RepaymentSchedule, RepaymentStatusOverlay
+from .job import JobRun, JobWatermark
 
-__all__ = ["User", "Account", "MonthlyBalance", "BackupLog", "DebtItem", "RepaymentSchedule"]
+__all__ = ["User", "Account", "MonthlyBalance", "MonthlyTotal", "BackupLog", "DebtItem", "RepaymentSchedule",
+           "RepaymentStatusOverlay", "JobWatermark", "JobRun"]
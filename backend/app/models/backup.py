@@ -13,6 +13,13 @@ class BackupLog(Base):
     file_size: Mapped[int | None] = mapped_column(Integer, nullable=True)
     status: Mapped[str] = mapped_column(String(16), nullable=False)   # success | failed
     message: Mapped[str | None] = mapped_column(String(512), nullable=True)
+    pages_copied: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    duration_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    original_size: Mapped[int | None] = mapped_column(Integer, nullable=True)   # 压缩前大小
+    compression: Mapped[str | None] = mapped_column(String(8), nullable=True)  # none | gzip | zstd
+    sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)      # 备份文件的校验和
+    backup_type: Mapped[str | None] = mapped_column(String(16), nullable=True) # full | incremental
+    base_file: Mapped[str | None] = mapped_column(String(512), nullable=True)  # 增量备份依赖的全量备份文件名
     created_at: Mapped[datetime] = mapped_column(
         DateTime, nullable=False, server_default=func.now()
     )
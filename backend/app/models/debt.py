@@ -1,7 +1,7 @@
 from datetime import date, datetime
 from sqlalchemy import (
     Integer, String, Boolean, Float, Date, DateTime,
-    ForeignKey, CheckConstraint, Index, func,
+    ForeignKey, CheckConstraint, Index, UniqueConstraint, func,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -44,6 +44,12 @@ class DebtItem(Base):
     first_repay_date: Mapped[date] = mapped_column(Date, nullable=False, comment="首期还款日期")
     monthly_repay_day: Mapped[int] = mapped_column(Integer, nullable=False, comment="每月约定还款日（1-31）")
 
+    # 还款计划存储方式（见 app/core/schedule_store.py）
+    schedule_mode: Mapped[str] = mapped_column(
+        String(16), nullable=False, default="materialized", server_default="materialized",
+        comment="materialized=逐期落库 repayment_schedules | lazy=按需计算，仅状态变化写入 repayment_status_overlay"
+    )
+
     # 计算结果（保存时由后端自动填充）
     monthly_payment: Mapped[float] = mapped_column(
         Float, nullable=False, default=0.0,
@@ -71,6 +77,9 @@ class DebtItem(Base):
     schedules: Mapped[list["RepaymentSchedule"]] = relationship(
         "RepaymentSchedule", back_populates="debt", cascade="all, delete-orphan"
     )
+    status_overlays: Mapped[list["RepaymentStatusOverlay"]] = relationship(
+        "RepaymentStatusOverlay", back_populates="debt", cascade="all, delete-orphan"
+    )
 
 
 class RepaymentSchedule(Base):
@@ -110,3 +119,30 @@ class RepaymentSchedule(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
 
     debt: Mapped["DebtItem"] = relationship("DebtItem", back_populates="schedules")
+
+
+class RepaymentStatusOverlay(Base):
+    """
+    还款状态覆盖表（lazy 模式）。
+    lazy 模式的债务不落库还款计划，每期金额由 generate_schedule 按需计算；
+    只有状态离开 pending 的期次（已还 / 逾期）才在这里记一行，没有记录即为 pending。
+    """
+    __tablename__ = "repayment_status_overlay"
+    __table_args__ = (
+        UniqueConstraint("debt_id", "period_no", name="uq_repay_overlay_debt_period"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    debt_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("debt_items.id", ondelete="CASCADE"), nullable=False
+    )
+    period_no: Mapped[int] = mapped_column(Integer, nullable=False, comment="期数，从 1 开始")
+    status: Mapped[str] = mapped_column(
+        String(16), nullable=False, comment="paid=已还 | overdue=逾期"
+    )
+    paid_at: Mapped[datetime | None] = mapped_column(
+        DateTime, nullable=True, comment="自动扣减完成的时间戳"
+    )
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
+
+    debt: Mapped["DebtItem"] = relationship("DebtItem", back_populates="status_overlays")
@@ -69,3 +69,28 @@ class MonthlyBalance(Base):
 
     user: Mapped["User"] = relationship("User", back_populates="monthly_balances")  # noqa: F821
     account: Mapped["Account"] = relationship("Account", back_populates="monthly_balances")
+
+
+class MonthlyTotal(Base):
+    """
+    月度总额汇总表（由 monthly_balances 派生，可随时重建）。
+    每条记录 = 某用户某月在启用账户上的余额合计，与 monthly_balances 在同一事务中维护，
+    供月份列表（月份窗口）、趋势等聚合接口直接读取，无需逐行求和。
+    """
+    __tablename__ = "monthly_totals"
+    __table_args__ = (
+        UniqueConstraint("user_id", "month", name="uq_total_user_month"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    month: Mapped[str] = mapped_column(String(7), nullable=False)
+    # 启用账户余额合计（未四舍五入，读取时再保留两位小数）
+    total: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    # 参与合计的启用账户记录数
+    account_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, server_default=func.now(), onupdate=func.now()
+    )
@@ -0,0 +1,42 @@
+from datetime import date, datetime
+from sqlalchemy import Integer, String, Date, DateTime, Index, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db import Base
+
+
+class JobWatermark(Base):
+    """
+    定时任务的处理水位线。
+    watermark 及之前到期的数据已由对应任务处理完毕，下次运行只需处理 watermark 之后的部分。
+    """
+    __tablename__ = "job_watermarks"
+
+    job_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    watermark: Mapped[date] = mapped_column(Date, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, server_default=func.now(), onupdate=func.now()
+    )
+
+
+class JobRun(Base):
+    """
+    定时任务运行记录。
+    每次 APScheduler 任务执行都记一行（由 scheduler.tracked_job 写入）；
+    错过计划时间未执行的记为 missed，started_at 为原计划时间。
+    """
+    __tablename__ = "job_runs"
+    __table_args__ = (
+        Index("idx_job_runs_job_started", "job_id", "started_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    job_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    duration_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    rows_processed: Mapped[int | None] = mapped_column(
+        Integer, nullable=True, comment="任务处理的数量：自动扣款为扣款期数，备份为复制的页数"
+    )
+    status: Mapped[str] = mapped_column(String(16), nullable=False)   # success | failed | missed
+    error: Mapped[str | None] = mapped_column(String(512), nullable=True)
@@ -5,6 +5,7 @@ from pydantic import BaseModel, Field
 
 RepayMethod = Literal["equal_installment", "equal_principal"]
 RepayStatus = Literal["pending", "paid", "overdue"]
+ScheduleMode = Literal["materialized", "lazy"]
 
 
 # ─────────────────────────────── DebtItem ────────────────────────────────────
@@ -17,6 +18,7 @@ class DebtItemCreate(BaseModel):
     repay_method: RepayMethod = "equal_installment"
     first_repay_date: date = Field(..., description="首期还款日期")
     monthly_repay_day: int = Field(..., ge=1, le=31, description="每月约定还款日")
+    schedule_mode: ScheduleMode | None = Field(None, description="还款计划存储方式，默认取 DEBT_SCHEDULE_MODE")
     note: str | None = Field(None, max_length=256)
 
 
@@ -35,6 +37,7 @@ class DebtItemRead(BaseModel):
     repay_method: str
     first_repay_date: date
     monthly_repay_day: int
+    schedule_mode: str
     monthly_payment: float
     current_balance: float
     paid_periods: int
@@ -48,7 +51,7 @@ class DebtItemRead(BaseModel):
 # ─────────────────────────────── RepaymentSchedule ───────────────────────────
 
 class RepaymentScheduleRead(BaseModel):
-    id: int
+    id: int | None              # lazy 模式下计划行不落库，没有 id
     debt_id: int
     period_no: int
     due_date: date
@@ -62,6 +65,101 @@ class RepaymentScheduleRead(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class PeriodDetailRead(BaseModel):
+    """单期还款明细（按公式直接计算，不含还款状态）"""
+    period_no: int
+    due_date: date
+    payment_amount: float
+    principal_amount: float
+    interest_amount: float
+    remaining_balance: float
+
+    model_config = {"from_attributes": True}
+
+
+class DebtBalanceRead(BaseModel):
+    """指定日期按计划应有的剩余本金"""
+    debt_id: int
+    as_of: date
+    periods_due: int            # 截至 as_of（含当天）已到期的期数
+    remaining_balance: float
+
+
+# ─────────────────────────────── 情景模拟 ────────────────────────────────────
+
+SimulationMode = Literal["shorten_term", "reduce_payment"]
+
+
+class SimulationScenario(BaseModel):
+    """一个提前还款 / 利率变化情景，在第 at_period 期还款之后生效（0 表示首期之前）"""
+    name: str | None = Field(None, max_length=64)
+    at_period: int = Field(0, ge=0, description="在第几期还款之后发生变化")
+    prepay_amount: float = Field(0.0, ge=0, description="一次性提前归还的本金")
+    new_annual_rate: float | None = Field(None, gt=0, description="此后适用的新年利率，不填沿用原利率")
+    mode: SimulationMode = Field("shorten_term", description="shorten_term=月供不变缩短期限 | reduce_payment=期限不变减少月供")
+
+
+class SimulationRequest(BaseModel):
+    scenarios: list[SimulationScenario] = Field(..., min_length=1, max_length=200)
+
+
+class SimulationScenarioResult(BaseModel):
+    name: str | None
+    term_months: int            # 新的总期数（含已还部分）
+    monthly_payment: float      # 变化后第一期月供，一次还清时为 0
+    payoff_date: date
+    total_interest: float
+    interest_saved: float       # 相对原计划少付的利息
+
+
+class SimulationResponse(BaseModel):
+    baseline_term_months: int
+    baseline_monthly_payment: float
+    baseline_payoff_date: date
+    baseline_total_interest: float
+    results: list[SimulationScenarioResult]
+
+
+# ─────────────────────────────── 还款策略规划 ────────────────────────────────
+
+PlannerStrategy = Literal["avalanche", "snowball", "custom"]
+
+
+class PlannerRequest(BaseModel):
+    monthly_extra: float = Field(0.0, ge=0, description="每月在最低还款之外额外投入的金额")
+    strategies: list[PlannerStrategy] = Field(["avalanche", "snowball"], min_length=1)
+    custom_order: list[int] | None = Field(None, description="custom 策略的债务 id 优先顺序，未列出的按利率排在后面")
+    start_month: str | None = Field(
+        None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$", description="第一个还款月（YYYY-MM），默认下个月"
+    )
+
+
+class PlannerDebtPayoff(BaseModel):
+    debt_id: int
+    name: str
+    payoff_month: str | None    # 还清的月份（YYYY-MM），模拟期内未还清为 None
+    months: int | None
+
+
+class PlannerStrategyResult(BaseModel):
+    strategy: str
+    order: list[int]            # 债务 id，按优先顺序
+    paid_off: bool
+    months: int
+    payoff_month: str | None
+    total_interest: float
+    total_paid: float
+    interest_saved: float       # 相对只还最低还款少付的利息
+    debts: list[PlannerDebtPayoff]
+    balance_timeline: list[float]   # 每月月末的剩余本金合计
+
+
+class PlannerResponse(BaseModel):
+    monthly_budget: float       # 每月还款总预算（最低还款之和 + 额外投入）
+    baseline: PlannerStrategyResult
+    strategies: list[PlannerStrategyResult]
+
+
 # ─────────────────────────────── 统计 ────────────────────────────────────────
 
 class DebtSummary(BaseModel):
@@ -0,0 +1,98 @@
+"""
+还款计划计算基准测试：对比标量 generate_schedule（float / cents 两种引擎）与 NumPy 批量引擎 generate_schedules。
+
+运行方式（在 backend/ 目录下）：
+    python -m benchmarks.bench_amortization --loans 10000 --repeat 3
+
+场景：
+1. 单笔 30 年（360 期）等额本息房贷
+2. N 笔贷款组合（随机本金 / 利率 / 还款方式，期数 12~360）
+输出两种实现的耗时（取 repeat 次中的最小值）与加速比，并校验结果逐分一致；
+另外输出同一组合上标量 float 引擎与整数分引擎（engine="cents"）的耗时，
+以及两者共用的还款日推算（_due_dates）与逐期 relativedelta 的耗时。
+
+两种标量引擎都已改用 _due_dates，整数分引擎本身只快约 1.2~1.5 倍
+（2000 笔组合，视机器而定）；早先「cents 快 4.7 倍」的对比里 float 引擎仍逐期构造 relativedelta，
+大部分差距来自日期推算而不是整数运算。
+"""
+import argparse
+import random
+import time
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+from app.core.debt_calculator import _due_dates, generate_schedule, generate_schedule_cents
+from app.core.debt_vectorized import generate_schedules
+
+
+def _best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _portfolio(count: int, seed: int) -> list[tuple]:
+    rng = random.Random(seed)
+    return [
+        (
+            round(rng.uniform(10_000, 3_000_000), 2),
+            round(rng.uniform(2.5, 6.5), 2),
+            rng.choice([12, 24, 36, 60, 120, 240, 360]),
+            rng.choice(["equal_installment", "equal_principal"]),
+            date(2024, rng.randint(1, 12), rng.randint(1, 28)),
+        )
+        for _ in range(count)
+    ]
+
+
+def _report(label: str, scalar: float, vectorized: float) -> None:
+    print(f"[{label}] scalar={scalar * 1000:9.1f} ms  numpy={vectorized * 1000:9.1f} ms  "
+          f"speedup={scalar / vectorized:6.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loans", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    mortgage = (1_000_000.0, 3.85, 360, "equal_installment", date(2024, 1, 20))
+    _report(
+        "1 loan x 360",
+        _best_of(args.repeat, lambda: generate_schedule(*mortgage)),
+        _best_of(args.repeat, lambda: generate_schedules(*zip(mortgage))),
+    )
+
+    loans = _portfolio(args.loans, args.seed)
+    columns = list(zip(*loans))
+    _report(
+        f"{args.loans} loans",
+        _best_of(args.repeat, lambda: [generate_schedule(*loan) for loan in loans]),
+        _best_of(args.repeat, lambda: generate_schedules(*columns)),
+    )
+
+    float_time = _best_of(args.repeat, lambda: [generate_schedule(*loan) for loan in loans])
+    cents_time = _best_of(args.repeat, lambda: [generate_schedule_cents(*loan) for loan in loans])
+    print(f"[{args.loans} loans] float={float_time * 1000:9.1f} ms  cents={cents_time * 1000:9.1f} ms  "
+          f"speedup={float_time / cents_time:6.1f}x")
+
+    relativedelta_time = _best_of(args.repeat, lambda: [
+        [first + relativedelta(months=k) for k in range(term)] for _, _, term, _, first in loans
+    ])
+    due_dates_time = _best_of(args.repeat, lambda: [_due_dates(first, term) for _, _, term, _, first in loans])
+    print(f"[{args.loans} loans] due dates: relativedelta={relativedelta_time * 1000:9.1f} ms  "
+          f"_due_dates={due_dates_time * 1000:9.1f} ms  speedup={relativedelta_time / due_dates_time:6.1f}x")
+
+    batch = generate_schedules(*columns)
+    sample = random.Random(args.seed).sample(range(len(loans)), min(200, len(loans)))
+    assert all(batch.to_period_details(i) == generate_schedule(*loans[i]) for i in sample)
+    print(f"parity check: {len(sample)} sampled loans identical to the scalar engine")
+
+
+if __name__ == "__main__":
+    main()
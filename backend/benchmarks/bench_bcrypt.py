@@ -0,0 +1,34 @@
+"""
+bcrypt cost 基准测试：输出当前主机上各 cost 的单次校验耗时，并给出按目标延迟校准的推荐值。
+
+运行方式（在 backend/ 目录下）：
+    python -m benchmarks.bench_bcrypt --min-rounds 4 --max-rounds 14 --target-ms 250
+
+推荐值写入 .env 的 BCRYPT_ROUNDS 即可生效；已有用户在下次登录成功时自动重新哈希。
+"""
+import argparse
+
+from app.core.config import settings
+from app.core.security import calibrate_bcrypt_rounds, measure_bcrypt_verify
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-rounds", type=int, default=4)
+    parser.add_argument("--max-rounds", type=int, default=14)
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--target-ms", type=float, default=settings.BCRYPT_TARGET_MS)
+    args = parser.parse_args()
+
+    print(f"{'rounds':>6}  {'verify ms':>10}")
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        elapsed = measure_bcrypt_verify(rounds, samples=args.samples)
+        marker = "  <- BCRYPT_ROUNDS" if rounds == settings.BCRYPT_ROUNDS else ""
+        print(f"{rounds:>6}  {elapsed * 1000:>10.1f}{marker}")
+
+    recommended = calibrate_bcrypt_rounds(args.target_ms, args.min_rounds, args.max_rounds)
+    print(f"\nrecommended BCRYPT_ROUNDS for <= {args.target_ms:.0f} ms: {recommended}")
+
+
+if __name__ == "__main__":
+    main()
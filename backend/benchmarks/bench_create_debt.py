@@ -0,0 +1,110 @@
+"""
+create_debt 基准测试：对比还款计划落库的两种写法（materialized 模式）。
+
+运行方式（在 backend/ 目录下）：
+    python -m benchmarks.bench_create_debt --repeat 50
+
+- orm ：旧写法，每期 db.add(RepaymentSchedule(...))，flush 时逐行处理
+- core：现写法，insert(repayment_schedules) 一次 executemany
+分别对 12 / 120 / 360 期的贷款在临时库中执行完整的建债事务（_create_debt_tx + commit），
+输出每种写法的中位数与 p95 延迟。
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.api.debt.debts import _create_debt_tx
+from app.core import schedule_store
+from app.db import Base, apply_sqlite_profile
+from app.models import DebtItem, RepaymentSchedule, RepaymentStatusOverlay  # noqa: F401 触发模型注册
+from app.schemas.debt import DebtItemCreate
+
+
+def _materialize_orm(db, debt, overlay) -> None:
+    """旧写法：每期一个 ORM 对象。"""
+    for p in schedule_store.compute_periods(debt):
+        state = overlay.get(p.period_no)
+        db.add(RepaymentSchedule(
+            debt_id=debt.id,
+            period_no=p.period_no,
+            due_date=p.due_date,
+            payment_amount=p.payment_amount,
+            principal_amount=p.principal_amount,
+            interest_amount=p.interest_amount,
+            remaining_balance=p.remaining_balance,
+            status=state.status if state else "pending",
+            paid_at=state.paid_at if state else None,
+        ))
+
+
+@contextmanager
+def _using(variant: str):
+    original = schedule_store._materialize
+    if variant == "orm":
+        schedule_store._materialize = _materialize_orm
+    try:
+        yield
+    finally:
+        schedule_store._materialize = original
+
+
+def _p95(samples: list[float]) -> float:
+    return statistics.quantiles(samples, n=20)[-1] if len(samples) >= 2 else samples[0]
+
+
+def _run(Session, variant: str, term: int, repeat: int) -> list[float]:
+    payload = DebtItemCreate(
+        name=f"bench-{term}",
+        principal=1_000_000.0,
+        annual_rate=3.85,
+        term_months=term,
+        first_repay_date=date(2024, 1, 20),
+        monthly_repay_day=20,
+        schedule_mode="materialized",
+    )
+    samples = []
+    with _using(variant):
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            with Session() as db:
+                _create_debt_tx(db, 1, payload)
+                db.commit()
+            samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--terms", type=int, nargs="+", default=[12, 120, 360])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        apply_sqlite_profile(engine)
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO users (id, username, hashed_password, role, is_active) "
+                "VALUES (1, 'bench', 'x', 'user', 1)"
+            ))
+        Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+        for term in args.terms:
+            for variant in ("orm", "core"):
+                _run(Session, variant, term, 3)   # 预热
+                samples = _run(Session, variant, term, args.repeat)
+                print(f"[{term:3d} periods] {variant:4s}  median={statistics.median(samples) * 1000:7.2f} ms  "
+                      f"p95={_p95(samples) * 1000:7.2f} ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
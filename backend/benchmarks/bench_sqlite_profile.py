@@ -0,0 +1,166 @@
+"""
+SQLite 连接参数基准测试：对比默认配置（rollback journal）与 settings 中的调优配置（WAL 等）
+在读写并发下的表现。
+
+运行方式（在 backend/ 目录下）：
+    python -m benchmarks.bench_sqlite_profile --seconds 5 --readers 8
+
+流程：
+1. 在临时目录中生成一个种子库（N 个月 × M 个账户的 monthly_balances）
+2. 启动 1 个写线程持续按月更新余额，多个读线程持续执行月度汇总查询
+3. 分别输出两种配置下的读/写吞吐、p95 延迟与 "database is locked" 次数
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.db import Base, apply_sqlite_profile
+from app.models import User, Account, MonthlyBalance  # noqa: F401 触发模型注册
+
+
+def _seed(path: str, months: int, accounts: int) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO users (id, username, hashed_password, role, is_active) "
+            "VALUES (1, 'bench', 'x', 'user', 1)"
+        ))
+        conn.execute(
+            text("INSERT INTO accounts (id, user_id, name, sort_order, is_active) VALUES (:id, 1, :name, :id, 1)"),
+            [{"id": a + 1, "name": f"acc{a}"} for a in range(accounts)],
+        )
+        rows = [
+            {
+                "month": f"{2000 + m // 12}-{m % 12 + 1:02d}",
+                "account_id": a + 1,
+                "name": f"acc{a}",
+                "balance": float(m * 100 + a),
+            }
+            for m in range(months)
+            for a in range(accounts)
+        ]
+        conn.execute(
+            text(
+                "INSERT INTO monthly_balances (user_id, month, account_id, account_name, balance) "
+                "VALUES (1, :month, :account_id, :name, :balance)"
+            ),
+            rows,
+        )
+    engine.dispose()
+
+
+def _p95(samples: list[float]) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=20)[-1]
+
+
+def _run(path: str, tuned: bool, seconds: float, readers: int) -> dict:
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False, "timeout": 5},
+        pool_size=readers + 1,
+    )
+    if tuned:
+        apply_sqlite_profile(engine)
+    else:
+        # 确保基线处于 rollback journal 模式（WAL 会持久化到库文件）
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=DELETE")
+
+    stop = threading.Event()
+    read_lat: list[float] = []
+    write_lat: list[float] = []
+    errors = {"locked": 0}
+    lock = threading.Lock()
+
+    def reader() -> None:
+        local: list[float] = []
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text(
+                        "SELECT month, SUM(balance) FROM monthly_balances "
+                        "WHERE user_id = 1 GROUP BY month ORDER BY month DESC LIMIT 24"
+                    )).all()
+            except OperationalError:
+                with lock:
+                    errors["locked"] += 1
+                continue
+            local.append(time.perf_counter() - t0)
+        with lock:
+            read_lat.extend(local)
+
+    def writer() -> None:
+        i = 0
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(
+                        text(
+                            "UPDATE monthly_balances SET balance = balance + 1 "
+                            "WHERE user_id = 1 AND month = :month"
+                        ),
+                        {"month": f"{2000 + (i % 120) // 12}-{(i % 12) + 1:02d}"},
+                    )
+            except OperationalError:
+                with lock:
+                    errors["locked"] += 1
+                continue
+            write_lat.append(time.perf_counter() - t0)
+            i += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    return {
+        "reads/s": len(read_lat) / seconds,
+        "writes/s": len(write_lat) / seconds,
+        "read p95 ms": _p95(read_lat) * 1000,
+        "write p95 ms": _p95(write_lat) * 1000,
+        "locked errors": errors["locked"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--months", type=int, default=120)
+    parser.add_argument("--accounts", type=int, default=30)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_sqlite_")
+    try:
+        seed = os.path.join(tmp, "seed.db")
+        _seed(seed, args.months, args.accounts)
+        for label, tuned in (("default", False), ("tuned", True)):
+            path = os.path.join(tmp, f"{label}.db")
+            shutil.copy(seed, path)
+            result = _run(path, tuned, args.seconds, args.readers)
+            print(f"[{label:>7}] " + "  ".join(
+                f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()
+            ))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,29 @@ pytest 配置文件：提供共享 fixtures。
 """
 import os
 import tempfile
+
+# 每个测试都会启动/关闭一次应用，进程池反复 spawn 开销较大，测试中口令计算改用线程池
+# （须在导入 app 之前设置；进程池本身由 test_password_pool 单独覆盖）
+os.environ.setdefault("PASSWORD_POOL_MODE", "thread")
+# 测试中使用最低的 bcrypt cost，避免每次登录都消耗数百毫秒
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
-from app.db import Base, get_db
+from app.core.rate_limit import login_throttle
+from app.core.security import token_cache
+from app.core.user_cache import user_cache
+from app.core.write_queue import WriteExecutor
+from app.db import (
+    Base, get_db, get_async_db, get_readonly_db, get_write_executor,
+    apply_sqlite_profile, create_writer_engine, to_async_url,
+)
 from app.main import app
 from app.models.user import User
 from app.core.security import hash_password
@@ -24,6 +41,7 @@ def db_engine():
         f"sqlite:///{path}",
         connect_args={"check_same_thread": False},
     )
+    apply_sqlite_profile(engine)
     Base.metadata.create_all(bind=engine)
     yield engine
     engine.dispose()
@@ -39,9 +57,38 @@ def db_session(db_engine):
 
 
 @pytest.fixture(scope="function")
-def client(db_engine):
-    """返回 TestClient，同时将 get_db 依赖替换为使用测试数据库的 session。"""
+def async_db_engine(db_engine):
+    """指向同一个临时库文件的 aiosqlite 引擎（NullPool：连接不跨事件循环复用）。"""
+    engine = create_async_engine(to_async_url(str(db_engine.url)), poolclass=NullPool)
+    apply_sqlite_profile(engine.sync_engine, read_only=True)
+    yield engine
+
+
+@pytest.fixture(scope="function")
+def readonly_db_engine(db_engine):
+    """指向同一个临时库的 query_only 同步引擎（对应生产中的只读连接池）。"""
+    engine = create_engine(str(db_engine.url), connect_args={"check_same_thread": False})
+    apply_sqlite_profile(engine, read_only=True)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def write_executor(db_engine):
+    """绑定到临时库的单写者执行器。"""
+    writer_engine = create_writer_engine(str(db_engine.url))
+    executor = WriteExecutor(sessionmaker(bind=writer_engine, autoflush=False, expire_on_commit=False))
+    yield executor
+    executor.stop()
+    writer_engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def client(db_engine, readonly_db_engine, async_db_engine, write_executor):
+    """返回 TestClient，同时将数据库相关依赖替换为使用测试数据库的 session / 写队列。"""
     Session = sessionmaker(bind=db_engine, autocommit=False, autoflush=False)
+    ReadonlySession = sessionmaker(bind=readonly_db_engine, autocommit=False, autoflush=False)
+    AsyncSession = async_sessionmaker(bind=async_db_engine, autoflush=False, expire_on_commit=False)
 
     def _override_get_db():
         db = Session()
@@ -50,7 +97,22 @@ def client(db_engine):
         finally:
             db.close()
 
+    def _override_get_readonly_db():
+        with ReadonlySession() as db:
+            yield db
+
+    async def _override_get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
     app.dependency_overrides[get_db] = _override_get_db
+    app.dependency_overrides[get_readonly_db] = _override_get_readonly_db
+    app.dependency_overrides[get_async_db] = _override_get_async_db
+    app.dependency_overrides[get_write_executor] = lambda: write_executor
+    # 每个测试使用全新的库，用户 id 会重复，需清空进程内的用户 / token 缓存与登录限流桶
+    user_cache.clear()
+    token_cache.clear()
+    login_throttle.clear()
     # raise_server_exceptions=True so test failures surface cleanly
     with TestClient(app, raise_server_exceptions=True) as c:
         yield c
@@ -79,3 +141,49 @@ def admin_token(client, db_engine):
 @pytest.fixture(scope="function")
 def auth_headers(admin_token):
     return {"Authorization": f"Bearer {admin_token}"}
+
+
+@pytest.fixture(scope="function")
+def make_debt(client, auth_headers):
+    """
+    创建债务的工厂：make_debt(**overrides) 通过接口创建一笔债务并返回响应体。
+    默认是一笔 100 万、30 年的等额本息房贷，overrides 覆盖任意字段。
+    """
+    def _make(**overrides) -> dict:
+        payload = {
+            "name": "房贷",
+            "principal": 1_000_000.0,
+            "annual_rate": 3.85,
+            "term_months": 360,
+            "repay_method": "equal_installment",
+            "first_repay_date": "2024-01-20",
+            "monthly_repay_day": 20,
+        }
+        payload.update(overrides)
+        resp = client.post("/api/debt", json=payload, headers=auth_headers)
+        assert resp.status_code == 201, resp.text
+        return resp.json()
+
+    return _make
+
+
+class QueryCounter:
+    """记录期间所有引擎执行的 SQL 语句。"""
+
+    def __init__(self):
+        self.statements: list[str] = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def count(self, table: str) -> int:
+        """统计涉及某张表的语句数（按表名子串匹配）。"""
+        return sum(1 for s in self.statements if table in s)
+
+
+@pytest.fixture(scope="function")
+def query_counter():
+    counter = QueryCounter()
+    event.listen(Engine, "before_cursor_execute", counter._on_execute)
+    yield counter
+    event.remove(Engine, "before_cursor_execute", counter._on_execute)
@@ -0,0 +1,161 @@
+"""
+自动扣款任务测试：
+1. 不要求「日」匹配：小月的 29~31 日账单、停机期间漏跑的账单都会在下一次运行时补扣（两种存储方式）
+2. 水位线：成功运行后推进到当天，重复运行不会重复扣款；补录历史贷款会回拨水位线（运行期间补录也不会被覆盖）；
+   有批次失败时水位线不动
+3. 分批：每批一条 UPDATE、一次查询债务，不再逐笔 session.get
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.core import scheduler
+from app.core.scheduler import run_auto_repay
+from app.models.job import JobWatermark
+
+
+CAR_LOAN = {
+    "name": "车贷",
+    "principal": 120_000.0,
+    "annual_rate": 4.0,
+    "term_months": 12,
+    "repay_method": "equal_principal",
+    "first_repay_date": "2024-01-31",
+    "monthly_repay_day": 31,
+}
+
+
+def _paid(client, auth_headers, debt_id) -> list[int]:
+    rows = client.get(f"/api/debt/{debt_id}/schedule", params={"status": "paid"}, headers=auth_headers).json()
+    return [r["period_no"] for r in rows]
+
+
+def _watermark(db_engine):
+    with sessionmaker(bind=db_engine)() as session:
+        row = session.get(JobWatermark, "auto_repay")
+        return row.watermark if row else None
+
+
+@pytest.fixture
+def make_car_loan(make_debt):
+    """本模块默认使用 12 期等额本金车贷，每月 31 日还款（覆盖小月月末）。"""
+    return lambda **overrides: make_debt(**{**CAR_LOAN, **overrides})
+
+
+@pytest.fixture
+def repay(db_engine, write_executor):
+    factory = sessionmaker(bind=db_engine)
+    return lambda today, **kwargs: run_auto_repay(factory, write_executor, today, **kwargs)
+
+
+class TestCatchUp:
+
+    @pytest.mark.parametrize("mode", ["lazy", "materialized"])
+    def test_month_end_and_downtime(self, client, auth_headers, make_car_loan, repay, mode):
+        debt = make_car_loan(schedule_mode=mode)
+        # 1/31 到期；2 月只有 29 日；3 月 31 日之前停机，4 月 10 日才运行
+        assert repay(date(2024, 1, 31)) == 1
+        assert repay(date(2024, 3, 1)) == 1
+        assert _paid(client, auth_headers, debt["id"]) == [1, 2]
+        assert repay(date(2024, 4, 10)) == 1
+        assert _paid(client, auth_headers, debt["id"]) == [1, 2, 3]
+
+        body = client.get(f"/api/debt/{debt['id']}", headers=auth_headers).json()
+        assert body["paid_periods"] == 3
+        assert body["current_balance"] == 90_000.0
+
+    def test_final_period_closes_debt(self, client, auth_headers, make_car_loan, repay):
+        debt = make_car_loan(term_months=3)
+        assert repay(date(2025, 1, 1)) == 3
+        body = client.get(f"/api/debt/{debt['id']}", headers=auth_headers).json()
+        assert (body["is_active"], body["current_balance"]) == (False, 0.0)
+
+
+class TestWatermark:
+
+    def test_idempotent(self, client, auth_headers, make_car_loan, repay, db_engine):
+        debt = make_car_loan(schedule_mode="materialized")
+        assert repay(date(2024, 5, 1)) == 4
+        assert _watermark(db_engine) == date(2024, 5, 1)
+        assert repay(date(2024, 5, 1)) == 0
+
+        # 即使水位线丢失、全量重扫，也只处理仍为 pending 的期次
+        with sessionmaker(bind=db_engine)() as session:
+            session.query(JobWatermark).delete()
+            session.commit()
+        assert repay(date(2024, 5, 1)) == 0
+        body = client.get(f"/api/debt/{debt['id']}", headers=auth_headers).json()
+        assert body["paid_periods"] == 4
+
+    def test_backdated_debt_rewinds_watermark(self, client, auth_headers, make_car_loan, repay, db_engine):
+        make_car_loan()
+        repay(date(2024, 6, 1))
+        assert _watermark(db_engine) == date(2024, 6, 1)
+
+        old = make_car_loan(first_repay_date="2024-02-10", monthly_repay_day=10)
+        assert _watermark(db_engine) == date(2024, 2, 9)
+        assert repay(date(2024, 6, 2)) == 4
+        assert _paid(client, auth_headers, old["id"]) == [1, 2, 3, 4]
+        assert _watermark(db_engine) == date(2024, 6, 2)
+
+    def test_backdated_debt_between_chunks(self, client, auth_headers, make_car_loan, db_engine, write_executor):
+        make_car_loan()
+        factory = sessionmaker(bind=db_engine)
+        run_auto_repay(factory, write_executor, date(2024, 6, 1))
+        created = []
+
+        class _CreateBetweenChunks:
+            """第一批完成后、第二批提交前补录一笔历史贷款（和写接口一样经过写队列）。"""
+            chunks = 0
+
+            def submit(self, fn, *args):
+                if fn is scheduler._repay_chunk:
+                    self.chunks += 1
+                    if self.chunks == 2:
+                        created.append(make_car_loan(first_repay_date="2024-02-10", monthly_repay_day=10))
+                return write_executor.submit(fn, *args)
+
+        assert run_auto_repay(factory, _CreateBetweenChunks(), date(2024, 9, 1), chunk_size=1) == 3
+        # 回拨后的水位线不能被本次运行覆盖，否则补录贷款的已到期期次永远不会扣款
+        assert _watermark(db_engine) == date(2024, 2, 9)
+        assert run_auto_repay(factory, write_executor, date(2024, 9, 2)) == 7
+        assert _paid(client, auth_headers, created[0]["id"]) == list(range(1, 8))
+        assert _watermark(db_engine) == date(2024, 9, 2)
+
+    def test_failed_chunk_keeps_watermark(self, client, auth_headers, make_car_loan, repay, db_engine, monkeypatch):
+        debt = make_car_loan()
+        repay(date(2024, 1, 31))
+        original = scheduler._repay_chunk
+
+        def flaky(session, bill_ids, lazy_bills):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(scheduler, "_repay_chunk", flaky)
+        assert repay(date(2024, 4, 1)) == 0
+        assert _watermark(db_engine) == date(2024, 1, 31)
+
+        monkeypatch.setattr(scheduler, "_repay_chunk", original)
+        assert repay(date(2024, 4, 1)) == 2
+        assert _paid(client, auth_headers, debt["id"]) == [1, 2, 3]
+
+
+class TestChunks:
+
+    @pytest.mark.parametrize("mode", ["lazy", "materialized"])
+    def test_set_based_chunks(self, client, auth_headers, make_car_loan, repay, query_counter, mode):
+        debts = [make_car_loan(schedule_mode=mode, name=f"d{i}") for i in range(3)]
+        query_counter.statements.clear()
+        assert repay(date(2025, 1, 1), chunk_size=5) == 36
+
+        chunks = 36 // 5 + 1
+        if mode == "materialized":
+            assert query_counter.count("UPDATE repayment_schedules") == chunks
+        else:
+            assert query_counter.count("INSERT INTO repayment_status_overlay") == chunks
+        debt_selects = [st for st in query_counter.statements
+                        if st.startswith("SELECT") and "FROM debt_items" in st and "JOIN" not in st]
+        # 每批一次查询债务，另有一次是扫描 lazy 债务
+        assert len(debt_selects) == chunks + 1
+        for debt in debts:
+            assert _paid(client, auth_headers, debt["id"]) == list(range(1, 13))
@@ -0,0 +1,361 @@
+"""
+数据库备份测试：
+1. 在线备份得到完整一致的副本，页数与源库一致，不留下 .part 临时文件
+2. 分步复制期间写入方可以继续提交，备份仍是某一时刻的完整快照；失败时不留下半个文件
+3. 流式压缩：gzip / 不压缩均可还原为相同内容，SHA-256 与文件一致；未安装 zstandard 时退回 gzip；
+   快照在内存中直接压缩，不写未压缩的中间文件，库超过内存上限时才落盘
+4. 还原先校验 SHA-256，文件被篡改或缺少校验和时拒绝还原且不改动目标
+5. _do_backup 经写队列在 BackupLog 中记录页数、耗时、压缩前后大小与校验和；备份列表返回两种大小
+6. 旧库自动补 backup_logs 的新列
+7. 增量备份：只保存相对全量基线变化的页，「基线 + 增量」还原出与备份时逐字节相同的库；
+   基线过期 / 页大小改变时改做全量；保留策略不删除仍被依赖的基线；verify 能发现损坏的链
+"""
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+import app.db
+from app.core import backup as backup_module
+from app.core import backup_chain, scheduler
+from app.core.backup import (
+    backup_sqlite,
+    create_backup,
+    ensure_backup_log_columns,
+    read_checksum,
+    resolve_compression,
+    restore_backup,
+)
+from app.models.backup import BackupLog
+
+
+def _make_db(path, rows: int = 5000) -> None:
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, payload TEXT)")
+        conn.executemany("INSERT INTO t (payload) VALUES (?)", [("x" * 200,) for _ in range(rows)])
+        conn.commit()
+
+
+def _count(path) -> int:
+    with closing(sqlite3.connect(path)) as conn:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        return conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+
+
+class TestOnlineBackup:
+
+    def test_consistent_copy(self, tmp_path):
+        src, dest = tmp_path / "src.db", tmp_path / "backup.db"
+        _make_db(src)
+        result = backup_sqlite(src, dest, pages_per_step=16, step_sleep_ms=0)
+        assert _count(dest) == 5000
+        with closing(sqlite3.connect(src)) as conn:
+            assert result.pages_copied == conn.execute("PRAGMA page_count").fetchone()[0]
+        assert result.restarts == 0
+        assert result.file_size == dest.stat().st_size
+        assert not (tmp_path / "backup.db.part").exists()
+
+    def test_writer_not_blocked(self, tmp_path):
+        src, dest = tmp_path / "src.db", tmp_path / "backup.db"
+        _make_db(src)
+        done = threading.Event()
+        commits = []
+
+        def writer():
+            with closing(sqlite3.connect(src, timeout=5)) as conn:
+                conn.execute("PRAGMA synchronous=OFF")
+                while not done.is_set():
+                    conn.execute("INSERT INTO t (payload) VALUES ('y')")
+                    conn.commit()
+                    commits.append(1)
+                    time.sleep(0.001)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            result = backup_sqlite(src, dest, pages_per_step=8, step_sleep_ms=2, max_restarts=2)
+        finally:
+            done.set()
+            thread.join()
+        # 写入方在备份期间持续提交；备份是某一时刻的完整快照
+        assert commits
+        assert 5000 <= _count(dest) <= 5000 + len(commits)
+        assert result.restarts <= 2
+
+    def test_failure_removes_partial_file(self, tmp_path):
+        src, dest = tmp_path / "src.db", tmp_path / "missing" / "backup.db"
+        _make_db(src, rows=10)
+        try:
+            backup_sqlite(src, dest)
+        except sqlite3.Error:
+            pass
+        assert not dest.exists()
+        assert not (tmp_path / "missing" / "backup.db.part").exists()
+
+
+class TestCompressedBackup:
+
+    @pytest.mark.parametrize("compression", ["gzip", "none"])
+    def test_round_trip(self, tmp_path, compression):
+        src = tmp_path / "src.db"
+        _make_db(src)
+        result = create_backup(src, tmp_path, compression=compression, step_sleep_ms=0)
+        assert result.compression == compression
+        assert result.path.name.endswith(".db.gz" if compression == "gzip" else ".db")
+        assert result.original_size == src.stat().st_size
+        assert result.file_size == result.path.stat().st_size
+        assert result.sha256 == hashlib.sha256(result.path.read_bytes()).hexdigest() == read_checksum(result.path)
+        if compression == "gzip":
+            assert result.file_size < result.original_size / 5
+        # 只留下备份与校验和文件
+        assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+            ["src.db", result.path.name, result.path.name + ".sha256"])
+
+        dest = tmp_path / "restored.db"
+        (tmp_path / "restored.db-wal").write_bytes(b"stale")
+        assert restore_backup(result.path, dest) == result.original_size
+        assert _count(dest) == 5000
+        if compression == "gzip":
+            assert gzip.decompress(result.path.read_bytes()) == dest.read_bytes()
+        assert not (tmp_path / "restored.db-wal").exists()
+
+    def test_snapshot_not_written_to_disk(self, tmp_path, monkeypatch):
+        src = tmp_path / "src.db"
+        with closing(sqlite3.connect(src)) as conn:
+            conn.execute("PRAGMA page_size=1024")      # 与内存库默认页大小不同
+            conn.execute("PRAGMA journal_mode=WAL")
+        _make_db(src, rows=2000)
+        backups = tmp_path / "backups"
+        backups.mkdir()
+
+        def no_disk_snapshot(*args, **kwargs):
+            raise AssertionError("snapshot written to disk")
+
+        monkeypatch.setattr(backup_module, "backup_sqlite", no_disk_snapshot)
+        full = backup_chain.create_chain_backup(src, backups, compression="gzip", step_sleep_ms=0)
+        _insert(src, 10)
+        inc = backup_chain.create_chain_backup(src, backups, compression="gzip", step_sleep_ms=0)
+        assert (full.kind, inc.kind) == ("full", "incremental")
+        assert full.original_size == full.pages_copied * 1024
+
+        restore_backup(inc.path, tmp_path / "restored.db")
+        assert _count(tmp_path / "restored.db") == 2010
+
+    def test_large_database_falls_back_to_disk_snapshot(self, tmp_path, monkeypatch):
+        src = tmp_path / "src.db"
+        _make_db(src, rows=1000)
+        backups = tmp_path / "backups"
+        backups.mkdir()
+        snapshots = []
+        original = backup_module.backup_sqlite
+        monkeypatch.setattr(backup_module, "backup_sqlite",
+                            lambda src, dest, *args: snapshots.append(dest) or original(src, dest, *args))
+
+        result = create_backup(src, backups, compression="gzip", memory_limit_bytes=0)
+        assert len(snapshots) == 1 and not snapshots[0].exists()
+        assert sorted(p.name for p in backups.iterdir()) == sorted([result.path.name, result.path.name + ".sha256"])
+        # 与内存快照相比只有文件头中的修改计数不同
+        in_memory = create_backup(src, tmp_path, compression="gzip")
+        assert gzip.decompress(result.path.read_bytes())[100:] == gzip.decompress(in_memory.path.read_bytes())[100:]
+        restore_backup(result.path, tmp_path / "restored.db")
+        assert _count(tmp_path / "restored.db") == 1000
+
+    def test_zstd_falls_back_to_gzip(self, monkeypatch):
+        monkeypatch.setattr(backup_module, "zstandard", None)
+        assert resolve_compression("auto") == "gzip"
+        assert resolve_compression("zstd") == "gzip"
+        with pytest.raises(ValueError):
+            resolve_compression("bzip2")
+
+    def test_restore_rejects_bad_checksum(self, tmp_path):
+        src = tmp_path / "src.db"
+        _make_db(src, rows=100)
+        result = create_backup(src, tmp_path, compression="gzip")
+        dest = tmp_path / "live.db"
+        dest.write_bytes(b"live")
+
+        data = bytearray(result.path.read_bytes())
+        data[len(data) // 2] ^= 0xFF
+        result.path.write_bytes(bytes(data))
+        with pytest.raises(ValueError, match="校验和不匹配"):
+            restore_backup(result.path, dest)
+        with pytest.raises(ValueError, match="校验和不匹配"):
+            restore_backup(result.path, dest, expected_sha256=result.sha256)
+        backup_module.checksum_path(result.path).unlink()
+        with pytest.raises(ValueError, match="没有可用"):
+            restore_backup(result.path, dest)
+        assert dest.read_bytes() == b"live"
+        assert not (tmp_path / "live.db.restore").exists()
+
+
+class TestDoBackup:
+
+    def test_logs_backup(self, tmp_path, db_engine, monkeypatch, write_executor):
+        monkeypatch.setattr(scheduler.settings, "DATABASE_URL", str(db_engine.url))
+        monkeypatch.setattr(scheduler.settings, "BACKUP_DIR", tmp_path)
+        monkeypatch.setattr(scheduler.settings, "BACKUP_COMPRESSION", "gzip")
+        monkeypatch.setattr(app.db, "write_executor", write_executor)
+        scheduler._do_backup()
+
+        with sessionmaker(bind=db_engine)() as session:
+            log = session.query(BackupLog).one()
+        assert log.status == "success"
+        assert log.pages_copied > 0
+        assert log.duration_ms is not None
+        assert log.compression == "gzip"
+        assert log.file_path.endswith(".db.gz")
+        assert log.file_size < log.original_size
+        assert log.sha256 == read_checksum(tmp_path / log.file_path.rsplit("/", 1)[-1])
+
+    def test_logs_failure(self, tmp_path, db_engine, write_executor, monkeypatch):
+        monkeypatch.setattr(scheduler.settings, "DATABASE_URL", str(db_engine.url))
+        monkeypatch.setattr(scheduler.settings, "BACKUP_DIR", tmp_path)
+        monkeypatch.setattr(scheduler.settings, "BACKUP_INCREMENTAL", False)
+        monkeypatch.setattr(app.db, "write_executor", write_executor)
+
+        def broken(*args, **kwargs):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(scheduler, "create_backup", broken)
+        jobs_before = write_executor.stats()["jobs_total"]
+        with pytest.raises(OSError):
+            scheduler._do_backup()
+
+        # 失败日志同样作为写队列任务写入
+        assert write_executor.stats()["jobs_total"] - jobs_before == 1
+        with sessionmaker(bind=db_engine)() as session:
+            log = session.query(BackupLog).one()
+        assert (log.status, log.message) == ("failed", "disk full")
+
+    def test_list_reports_both_sizes(self, client, auth_headers, tmp_path, db_engine, monkeypatch, write_executor):
+        monkeypatch.setattr(scheduler.settings, "DATABASE_URL", str(db_engine.url))
+        monkeypatch.setattr(scheduler.settings, "BACKUP_DIR", tmp_path)
+        monkeypatch.setattr(scheduler.settings, "BACKUP_COMPRESSION", "gzip")
+        monkeypatch.setattr(app.db, "write_executor", write_executor)
+        (tmp_path / "ai_platform_20200101_000000.db").write_bytes(b"x" * 4096)     # 旧的未压缩备份
+        scheduler._do_backup()
+
+        resp = client.get("/api/backup/list", headers=auth_headers)
+        assert resp.status_code == 200
+        latest, legacy = resp.json()
+        assert latest["compression"] == "gzip"
+        assert latest["size_bytes"] < latest["original_size_bytes"]
+        assert len(latest["sha256"]) == 64
+        assert legacy["filename"] == "ai_platform_20200101_000000.db"
+        assert legacy["size_bytes"] == legacy["original_size_bytes"] == 4096
+        assert legacy["sha256"] is None
+
+    def test_incremental_schedule(self, tmp_path, db_engine, monkeypatch, write_executor):
+        monkeypatch.setattr(scheduler.settings, "DATABASE_URL", str(db_engine.url))
+        monkeypatch.setattr(scheduler.settings, "BACKUP_DIR", tmp_path)
+        monkeypatch.setattr(scheduler.settings, "BACKUP_COMPRESSION", "gzip")
+        monkeypatch.setattr(app.db, "write_executor", write_executor)
+        scheduler._do_backup()
+        scheduler._do_backup()
+
+        with sessionmaker(bind=db_engine)() as session:
+            full, inc = session.query(BackupLog).order_by(BackupLog.id).all()
+        assert (full.backup_type, full.base_file) == ("full", None)
+        assert inc.backup_type == "incremental"
+        assert inc.base_file == full.file_path.rsplit("/", 1)[-1]
+        assert inc.file_path.endswith(".inc.gz")
+
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE backup_logs (id INTEGER PRIMARY KEY, file_path VARCHAR(512), status VARCHAR(16))"
+            ))
+        added = ["pages_copied", "duration_ms", "original_size", "compression", "sha256", "backup_type", "base_file"]
+        assert ensure_backup_log_columns(engine) == added
+        assert ensure_backup_log_columns(engine) == []
+        assert set(added) <= {c["name"] for c in inspect(engine).get_columns("backup_logs")}
+        engine.dispose()
+
+
+def _insert(path, rows: int) -> None:
+    with closing(sqlite3.connect(path)) as conn:
+        conn.executemany("INSERT INTO t (payload) VALUES (?)", [("z" * 50,) for _ in range(rows)])
+        conn.commit()
+
+
+class TestBackupChain:
+
+    def _chain(self, tmp_path):
+        src, backups = tmp_path / "src.db", tmp_path / "backups"
+        backups.mkdir()
+        _make_db(src, rows=20_000)
+        full = backup_chain.create_chain_backup(src, backups, compression="gzip", step_sleep_ms=0)
+        _insert(src, 30)
+        first = backup_chain.create_chain_backup(src, backups, compression="gzip", step_sleep_ms=0)
+        _insert(src, 3000)
+        second = backup_chain.create_chain_backup(src, backups, compression="gzip", step_sleep_ms=0)
+        return src, backups, full, first, second
+
+    def test_increments_replay_to_identical_db(self, tmp_path):
+        src, backups, full, first, second = self._chain(tmp_path)
+        assert full.kind == "full"
+        assert first.kind == second.kind == "incremental"
+        assert first.base == second.base == full.path
+        assert 0 < first.changed_pages < second.changed_pages < full.pages_copied / 4
+        assert first.file_size < full.file_size / 10
+
+        files = backup_module.list_backup_files(backups)
+        increments = [f for f in reversed(files) if backup_module.is_increment(f)]
+        assert len(increments) == 2
+        for inc, rows in zip(increments, (20_030, 23_030)):
+            dest = tmp_path / f"restored_{rows}.db"
+            restore_backup(inc, dest)
+            assert _count(dest) == rows
+        # 最新增量重建出的库与源库内容一致（源库此后未再修改）
+        assert hashlib.sha256((tmp_path / "restored_23030.db").read_bytes()).hexdigest() == \
+            backup_chain.read_increment_header(increments[-1])["db_sha256"]
+        assert [error for _, error in backup_chain.verify_backups(backups)] == [None] * 3
+
+    def test_full_when_base_is_old_or_page_size_changes(self, tmp_path):
+        src, backups, full, *_ = self._chain(tmp_path)
+        week_ago = full.path.stat().st_mtime - 7 * 86400
+        os.utime(full.path, (week_ago, week_ago))
+        _insert(src, 1)
+        assert backup_chain.create_chain_backup(src, backups, compression="gzip").kind == "full"
+
+        with closing(sqlite3.connect(src)) as conn:
+            conn.execute("PRAGMA page_size=8192")
+            conn.execute("VACUUM")
+        assert backup_chain.create_chain_backup(src, backups, compression="gzip").kind == "full"
+
+    def test_corrupt_base_detected(self, tmp_path):
+        src, backups, full, first, second = self._chain(tmp_path)
+        data = bytearray(full.path.read_bytes())
+        data[100] ^= 0xFF
+        full.path.write_bytes(bytes(data))
+
+        results = dict(backup_chain.verify_backups(backups))
+        assert all("校验和不匹配" in error for error in results.values())
+        with pytest.raises(ValueError):
+            restore_backup(sorted(backups.glob("*.inc.gz"))[0], tmp_path / "restored.db")
+        with pytest.raises(SystemExit) as exc:
+            backup_module.main(["verify", "--dir", str(backups)])
+        assert exc.value.code == 1
+
+        # 基线损坏时下一次备份改做全量
+        assert backup_chain.create_chain_backup(src, backups, compression="gzip").kind == "full"
+
+    def test_retention_keeps_referenced_base(self, tmp_path):
+        src, backups, full, *_ = self._chain(tmp_path)
+        old = full.path.stat().st_mtime - 30 * 86400
+        os.utime(full.path, (old, old))
+        cutoff = full.path.stat().st_mtime + 1
+        assert backup_chain.expired_backups(backups, cutoff) == []
+
+        for f in backups.glob("*.inc.gz"):
+            os.utime(f, (old, old))
+        expired = backup_chain.expired_backups(backups, cutoff)
+        assert sorted(expired) == sorted(backup_module.list_backup_files(backups))
@@ -0,0 +1,100 @@
+"""
+数据库连接层测试：
+1. SQLite PRAGMA 配置在每个新连接上生效
+2. run_read 在同步 / 异步两种会话下行为一致
+3. 同步只读连接池（DB_ASYNC_ENABLED=False）上的读接口可用，且只读会话拒绝写入
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db import get_async_db, get_readonly_db, run_read
+from app.main import app
+from app.models.user import User
+
+
+def _count_users(db, username: str) -> int:
+    return db.query(User).filter(User.username == username).count()
+
+
+class TestSqliteProfile:
+
+    def test_pragmas_applied_on_connect(self, db_engine):
+        with db_engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == settings.SQLITE_BUSY_TIMEOUT_MS
+            assert conn.execute(text("PRAGMA cache_size")).scalar() == settings.SQLITE_CACHE_SIZE
+            # synchronous: 0=OFF 1=NORMAL 2=FULL
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+            # temp_store: 0=DEFAULT 1=FILE 2=MEMORY
+            assert conn.execute(text("PRAGMA temp_store")).scalar() == 2
+
+    def test_pragmas_applied_to_every_pooled_connection(self, db_engine):
+        """连接池中同时存在的多个连接都应带有相同的 PRAGMA。"""
+        with db_engine.connect() as c1, db_engine.connect() as c2:
+            for conn in (c1, c2):
+                assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+
+
+class TestRunRead:
+
+    def _seed(self, db_session):
+        db_session.add(User(username="reader", hashed_password="x", role="user", is_active=True))
+        db_session.commit()
+
+    def test_sync_session_runs_in_threadpool(self, db_session):
+        self._seed(db_session)
+        assert asyncio.run(run_read(db_session, _count_users, "reader")) == 1
+
+    def test_async_session_runs_sync_logic(self, db_session, async_db_engine):
+        self._seed(db_session)
+
+        async def _run():
+            async with AsyncSession(async_db_engine) as db:
+                return await run_read(db, _count_users, "reader")
+
+        assert asyncio.run(_run()) == 1
+
+
+class TestSyncReadPool:
+
+    @pytest.fixture
+    def sync_reads(self, client):
+        """让读接口走同步只读会话，等同于 DB_ASYNC_ENABLED=False 时的 get_read_db。"""
+        app.dependency_overrides[get_async_db] = app.dependency_overrides[get_readonly_db]
+
+    def test_read_session_rejects_writes(self, readonly_db_engine):
+        with sessionmaker(bind=readonly_db_engine)() as db:
+            assert db.query(User).count() == 0
+            db.add(User(username="w", hashed_password="x", role="user", is_active=True))
+            with pytest.raises(OperationalError, match="readonly"):
+                db.flush()
+
+    def test_read_routes(self, client, auth_headers, make_debt, sync_reads):
+        accs = client.get("/api/income/accounts", headers=auth_headers).json()
+        client.post(
+            "/api/income/balances",
+            json={"month": "2026-01", "balances": [{"account_id": accs[0]["id"], "balance": 1.0}]},
+            headers=auth_headers,
+        )
+        debt = make_debt(term_months=12)
+
+        for path in (
+            "/api/auth/me",
+            "/api/income/balances",
+            "/api/income/stats/trend",
+            "/api/debt/stats/summary",
+            "/api/debt/stats/bar-chart",
+            f"/api/debt/{debt['id']}/schedule/3",
+            f"/api/debt/{debt['id']}/balance?as_of=2024-06-30",
+        ):
+            resp = client.get(path, headers=auth_headers)
+            assert resp.status_code == 200, (path, resp.text)
+        resp = client.post("/api/debt/planner", json={}, headers=auth_headers)
+        assert resp.status_code == 200, resp.text
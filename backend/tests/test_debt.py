@@ -0,0 +1,152 @@
+"""
+债务模块自动化测试：
+1. 债务创建与还款计划生成
+2. 仪表盘统计接口
+3. 单期计算与按日期查询余额（与 generate_schedule 逐期一致）
+"""
+from datetime import date
+
+import pytest
+
+from app.core.debt_calculator import (
+    calc_balance_as_of,
+    calc_period_detail,
+    count_periods_due,
+    generate_schedule,
+)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 1. 债务创建与还款计划
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class TestDebtCreate:
+
+    def test_create_generates_full_schedule(self, client, auth_headers, make_debt):
+        debt = make_debt(term_months=120)
+        resp = client.get(f"/api/debt/{debt['id']}/schedule", headers=auth_headers)
+        assert resp.status_code == 200
+        rows = resp.json()
+        assert len(rows) == 120
+        assert rows[0]["period_no"] == 1
+        assert rows[-1]["remaining_balance"] == 0.0
+        assert all(r["status"] == "pending" for r in rows)
+
+    @pytest.mark.parametrize("method", ["equal_installment", "equal_principal"])
+    def test_schedule_principal_sums_to_loan(self, client, auth_headers, make_debt, method):
+        debt = make_debt(principal=120_000.0, term_months=24, repay_method=method)
+        rows = client.get(f"/api/debt/{debt['id']}/schedule", headers=auth_headers).json()
+        assert abs(sum(r["principal_amount"] for r in rows) - 120_000.0) < 0.01
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 2. 仪表盘统计
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class TestDebtStats:
+
+    def test_summary_sums_active_debts(self, client, auth_headers, make_debt):
+        a = make_debt(name="A", principal=100_000.0)
+        b = make_debt(name="B", principal=50_000.0)
+        resp = client.get("/api/debt/stats/summary", headers=auth_headers)
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["active_count"] == 2
+        assert abs(body["total_balance"] - 150_000.0) < 0.01
+        assert abs(body["monthly_total_payment"] - (a["monthly_payment"] + b["monthly_payment"])) < 0.01
+
+    def test_bar_chart_sorted_by_balance(self, client, auth_headers, make_debt):
+        make_debt(name="小额", principal=10_000.0)
+        make_debt(name="大额", principal=900_000.0)
+        resp = client.get("/api/debt/stats/bar-chart", headers=auth_headers)
+        assert resp.status_code == 200
+        assert [d["name"] for d in resp.json()] == ["大额", "小额"]
+
+    def test_summary_excludes_inactive(self, client, auth_headers, make_debt):
+        debt = make_debt()
+        client.put(f"/api/debt/{debt['id']}", json={"is_active": False}, headers=auth_headers)
+        body = client.get("/api/debt/stats/summary", headers=auth_headers).json()
+        assert body["active_count"] == 0
+        assert body["total_balance"] == 0.0
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 3. 单期查询
+# ═══════════════════════════════════════════════════════════════════════════════
+
+LOANS = [
+    (1_000_000.0, 3.85, 360, "equal_principal", date(2024, 1, 31)),
+    (12_345.67, 4.9, 37, "equal_principal", date(2023, 2, 28)),
+    (0.05, 3.0, 12, "equal_principal", date(2023, 8, 30)),
+    (100.0, 0.0, 7, "equal_installment", date(2024, 12, 31)),
+    (1_000_000.0, 4.9, 360, "equal_installment", date(2024, 1, 20)),
+    (1_000_000.0, 3.85, 360, "equal_installment", date(2024, 1, 31)),
+    (87_654.32, 18.0, 120, "equal_installment", date(2023, 5, 29)),
+    (300.0, 24.0, 6, "equal_installment", date(2024, 2, 29)),
+]
+
+
+class TestPeriodDetail:
+
+    @pytest.mark.parametrize("loan", LOANS)
+    def test_every_period_matches_schedule(self, loan):
+        for expected in generate_schedule(*loan):
+            assert calc_period_detail(*loan, expected.period_no) == expected
+
+    @pytest.mark.parametrize("loan", LOANS)
+    def test_balance_as_of_matches_schedule(self, loan):
+        for expected in generate_schedule(*loan):
+            assert calc_balance_as_of(*loan, expected.due_date) == (expected.period_no, expected.remaining_balance)
+
+    def test_last_installment_payment(self):
+        loan = (1_000_000.0, 4.9, 360, "equal_installment", date(2024, 1, 20))
+        assert calc_period_detail(*loan, 360).payment_amount == generate_schedule(*loan)[-1].payment_amount
+
+    def test_out_of_range(self):
+        with pytest.raises(ValueError):
+            calc_period_detail(1000.0, 3.0, 12, "equal_principal", date(2024, 1, 1), 13)
+
+    def test_periods_due(self):
+        first = date(2024, 1, 31)
+        assert count_periods_due(first, 12, date(2024, 1, 30)) == 0
+        assert count_periods_due(first, 12, date(2024, 1, 31)) == 1
+        assert count_periods_due(first, 12, date(2024, 2, 28)) == 1
+        assert count_periods_due(first, 12, date(2024, 2, 29)) == 2   # 2 月取月末
+        assert count_periods_due(first, 12, date(2030, 1, 1)) == 12
+
+    def test_balance_as_of(self):
+        loan = (120_000.0, 4.0, 24, "equal_principal", date(2024, 1, 20))
+        assert calc_balance_as_of(*loan, date(2023, 12, 31)) == (0, 120_000.0)
+        assert calc_balance_as_of(*loan, date(2024, 3, 19)) == (2, 110_000.0)
+        assert calc_balance_as_of(*loan, date(2026, 1, 1)) == (24, 0.0)
+
+
+class TestPeriodApi:
+
+    def test_get_single_period(self, client, auth_headers, make_debt):
+        debt = make_debt(term_months=24, repay_method="equal_principal",
+                         principal=120_000.0)
+        rows = client.get(f"/api/debt/{debt['id']}/schedule", headers=auth_headers).json()
+        resp = client.get(f"/api/debt/{debt['id']}/schedule/17", headers=auth_headers)
+        assert resp.status_code == 200
+        body = resp.json()
+        for field in ("period_no", "due_date", "payment_amount", "principal_amount",
+                      "interest_amount", "remaining_balance"):
+            assert body[field] == rows[16][field]
+
+    def test_period_out_of_range(self, client, auth_headers, make_debt):
+        debt = make_debt(term_months=12)
+        assert client.get(f"/api/debt/{debt['id']}/schedule/13", headers=auth_headers).status_code == 404
+        assert client.get(f"/api/debt/{debt['id']}/schedule/0", headers=auth_headers).status_code == 422
+
+    def test_balance_as_of(self, client, auth_headers, make_debt):
+        debt = make_debt(principal=120_000.0, term_months=24,
+                         repay_method="equal_principal")
+        resp = client.get(f"/api/debt/{debt['id']}/balance", params={"as_of": "2024-03-20"},
+                          headers=auth_headers)
+        assert resp.status_code == 200
+        assert resp.json() == {"debt_id": debt["id"], "as_of": "2024-03-20",
+                               "periods_due": 3, "remaining_balance": 105_000.0}
+
+    def test_other_users_debt_404(self, client, auth_headers):
+        assert client.get("/api/debt/9999/balance", headers=auth_headers).status_code == 404
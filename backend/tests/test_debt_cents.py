@@ -0,0 +1,164 @@
+"""
+整数分引擎测试：
+1. 基础运算：元转分、银行家舍入的整数除法、还款日推进
+2. 不变量：各期本金之和恰为贷款本金，月供恰为本金 + 利息
+3. 与 float 引擎的逐期对照：结果不同的贷款必属于下列四类之一（每类附固定样例）
+   - monthly：等额本息月供恰为半分，float 按二进制近似值舍入，cents 取偶；此后每期月供差 1 分
+   - principal：等额本金每期本金 P/n 恰为半分，同上
+   - interest：某期「余额 × 月利率」恰为半分，float 的月利率与乘积都是近似值，舍入方向与取偶不同；
+     该期利息差 1 分，余额随之差 1 分，之后各期可能继续相差，末期轧差吸收
+   - overshoot：本金过小、每期固定本金向上舍入时提前还清，float 引擎之后仍按固定本金记账（本金合计超过贷款），
+     cents 引擎把超出部分截掉
+"""
+import random
+from datetime import date
+from fractions import Fraction
+
+import pytest
+from dateutil.relativedelta import relativedelta
+
+from app.core.debt_calculator import (
+    _div_half_even,
+    _due_dates,
+    _monthly_rate_ratio,
+    calc_monthly_payment_cents,
+    calc_monthly_payment_equal_installment,
+    generate_schedule,
+    generate_schedule_cents,
+    to_cents,
+)
+
+
+def _random_loans(seed: int, count: int) -> list[tuple]:
+    rng = random.Random(seed)
+    return [
+        (
+            round(rng.uniform(1_000, 3_000_000), 2),
+            rng.choice([2.85, 3.1, 3.85, 4.2, 4.9, 5.88, 12.0, round(rng.uniform(1, 24), 4)]),
+            rng.choice([1, 2, 12, 36, 60, 120, 240, 360]),
+            rng.choice(["equal_installment", "equal_principal"]),
+            date(2024, 1, 31) if rng.random() < 0.2 else date(2024, rng.randint(1, 12), rng.randint(1, 28)),
+        )
+        for _ in range(count)
+    ]
+
+
+def _is_half_cent(value: Fraction) -> bool:
+    return value - (value.numerator // value.denominator) == Fraction(1, 2)
+
+
+def classify(loan: tuple) -> str:
+    """返回 'same' 或差异类别（见模块说明）；不属于任何已知类别时返回 'unexplained'。"""
+    principal, annual_rate, term, method, first = loan
+    floats = generate_schedule(*loan)
+    cents = generate_schedule_cents(*loan)
+    if floats == [p.to_period_detail() for p in cents]:
+        return "same"
+
+    p_cents = to_cents(principal)
+    if method == "equal_installment" and \
+            to_cents(calc_monthly_payment_equal_installment(principal, annual_rate, term)) != \
+            calc_monthly_payment_cents(p_cents, annual_rate, term):
+        return "monthly"
+    if method == "equal_principal" and _is_half_cent(Fraction(p_cents, term)):
+        return "principal"
+
+    num, den = _monthly_rate_ratio(annual_rate)
+    balance = p_cents
+    for f, c in zip(floats, cents):
+        if f == c.to_period_detail():
+            balance = c.remaining_balance
+            continue
+        if to_cents(f.interest_amount) != c.interest_amount and _is_half_cent(Fraction(balance * num, den)):
+            return "interest"
+        if c.remaining_balance == 0 and sum(to_cents(p.principal_amount) for p in floats) > p_cents:
+            return "overshoot"
+        return "unexplained"
+    return "unexplained"
+
+
+class TestPrimitives:
+
+    def test_to_cents_uses_decimal_literal(self):
+        assert to_cents(1000.005) == 100000       # 恰好半分，取偶
+        assert to_cents(1000.015) == 100002
+        assert to_cents(2.675) == 268             # float round(2.675, 2) == 2.67
+        assert to_cents(0.1) == 10
+
+    @pytest.mark.parametrize("num,den,expected", [
+        (5, 2, 2), (7, 2, 4), (-5, 2, -2), (11, 4, 3), (9, 4, 2), (10, 3, 3), (0, 7, 0),
+    ])
+    def test_div_half_even(self, num, den, expected):
+        assert _div_half_even(num, den) == expected
+
+    def test_due_dates_match_relativedelta(self):
+        for first in (date(2024, 1, 31), date(2023, 2, 28), date(2024, 2, 29), date(2024, 12, 30)):
+            assert _due_dates(first, 400) == [first + relativedelta(months=k) for k in range(400)]
+
+    def test_unknown_engine(self):
+        with pytest.raises(ValueError):
+            generate_schedule(1000.0, 3.0, 12, "equal_principal", date(2024, 1, 1), engine="decimal")
+
+
+class TestInvariants:
+
+    @pytest.mark.parametrize("seed", [1, 2])
+    def test_exact_totals(self, seed):
+        for loan in _random_loans(seed, 200):
+            periods = generate_schedule_cents(*loan)
+            assert sum(p.principal_amount for p in periods) == to_cents(loan[0])
+            assert all(p.payment_amount == p.principal_amount + p.interest_amount for p in periods)
+            assert periods[-1].remaining_balance == 0
+
+    def test_engine_parameter_returns_period_details(self):
+        loan = (1_000_000.0, 3.85, 360, "equal_installment", date(2024, 1, 20))
+        assert generate_schedule(*loan, engine="cents") == \
+            [p.to_period_detail() for p in generate_schedule_cents(*loan)]
+
+
+class TestFloatParity:
+
+    def test_every_difference_is_explained(self):
+        loans = _random_loans(7, 1500)
+        counts: dict[str, int] = {}
+        for loan in loans:
+            kind = classify(loan)
+            assert kind != "unexplained", loan
+            counts[kind] = counts.get(kind, 0) + 1
+        # 绝大多数贷款两种引擎逐分一致
+        assert counts["same"] > 0.85 * len(loans)
+
+    def test_differences_are_cent_level_for_common_mortgages(self):
+        for loan in _random_loans(8, 300):
+            if loan[1] > 6:
+                continue
+            floats = generate_schedule(*loan)
+            cents = generate_schedule_cents(*loan)
+            for f, c in zip(floats[:-1], cents[:-1]):
+                assert abs(to_cents(f.interest_amount) - c.interest_amount) <= 1
+                assert abs(to_cents(f.remaining_balance) - c.remaining_balance) <= loan[2]
+
+    def test_monthly_half_cent(self):
+        # 24% 单期：M = 2693796.25 × 1.02 = 2747672.175
+        assert calc_monthly_payment_equal_installment(2_693_796.25, 24.0, 1) == 2_747_672.17
+        assert calc_monthly_payment_cents(269_379_625, 24.0, 1) == 274_767_218
+
+    def test_principal_half_cent(self):
+        loan = (1_515_412.98, 3.85, 36, "equal_principal", date(2024, 1, 20))
+        assert classify(loan) == "principal"
+        assert generate_schedule(*loan)[0].principal_amount == 42_094.81
+        assert generate_schedule_cents(*loan)[0].principal_amount == 4_209_480
+
+    def test_interest_half_cent(self):
+        loan = (216_574.54, 4.2, 60, "equal_installment", date(2024, 1, 20))
+        assert classify(loan) == "interest"
+        f = generate_schedule(*loan)[24]
+        c = generate_schedule_cents(*loan)[24]
+        assert (f.interest_amount, c.interest_amount) == (473.73, 47_372)
+        assert (f.remaining_balance, c.remaining_balance) == (131_815.6, 13_181_559)
+
+    def test_overshoot(self):
+        loan = (0.07, 3.0, 12, "equal_principal", date(2024, 1, 20))
+        assert classify(loan) == "overshoot"
+        assert round(sum(p.principal_amount for p in generate_schedule(*loan)), 2) == 0.11
+        assert sum(p.principal_amount for p in generate_schedule_cents(*loan)) == 7
@@ -0,0 +1,160 @@
+"""
+还款策略规划测试：
+1. 数组化模拟与逐笔逐月的参照实现完全一致
+2. 雪崩 / 雪球 / 自定义顺序的语义，额外预算与最低还款滚动
+3. 10+ 笔债务 × 360 个月 × 多个策略的耗时
+4. 接口：月份标注、参数校验、只计入有效债务
+"""
+import random
+import time
+
+import pytest
+
+from app.core.debt_planner import (
+    PlannerDebt,
+    avalanche_order,
+    custom_order,
+    minimum_payment,
+    monthly_budget,
+    plan_payoff,
+    snowball_order,
+)
+
+
+def _annuity(balance: float, annual_rate: float, months: int) -> float:
+    r = annual_rate / 1200
+    return round(balance * r * (1 + r) ** months / ((1 + r) ** months - 1), 2)
+
+
+def _portfolio(seed: int, count: int) -> list[PlannerDebt]:
+    rng = random.Random(seed)
+    debts = []
+    for i in range(count):
+        balance = round(rng.uniform(5_000, 800_000), 2)
+        rate = round(rng.uniform(3, 18), 2)
+        if i % 3 == 0:
+            debts.append(PlannerDebt(i + 1, f"d{i}", balance, rate,
+                                     principal_per_period=round(balance / 240, 2), fixed_principal=True))
+        else:
+            debts.append(PlannerDebt(i + 1, f"d{i}", balance, rate,
+                                     monthly_payment=_annuity(balance, rate, rng.choice([36, 120, 360]))))
+    return debts
+
+
+def _reference(debts: list[PlannerDebt], extra: float, order: list[int], rollover: bool = True):
+    """逐月、逐笔的参照实现。"""
+    by_id = {d.id: d for d in debts}
+    balance = {d.id: d.balance for d in debts}
+    budget = monthly_budget(debts, extra)
+    total_interest, payoff, month = 0.0, {}, 0
+    while any(b > 0 for b in balance.values()) and month < 600:
+        month += 1
+        due, min_pay = {}, {}
+        for i in order:
+            if balance[i] <= 0:
+                continue
+            d = by_id[i]
+            interest = round(balance[i] * d.annual_rate / 100 / 12, 2)
+            total_interest += interest
+            due[i] = balance[i] + interest
+            regular = d.principal_per_period + interest if d.fixed_principal else d.monthly_payment
+            min_pay[i] = min(due[i], regular)
+        left = max(budget - sum(min_pay.values()), 0.0) if rollover else 0.0
+        for i in order:
+            if i not in due:
+                continue
+            extra_pay = min(left, due[i] - min_pay[i])
+            left -= extra_pay
+            balance[i] = max(round(due[i] - min_pay[i] - extra_pay, 2), 0.0)
+            if balance[i] == 0:
+                payoff[i] = month
+    return round(total_interest, 2), payoff
+
+
+class TestPlanner:
+
+    @pytest.mark.parametrize("extra", [0.0, 3_000.0])
+    def test_matches_reference(self, extra):
+        debts = _portfolio(1, 8)
+        strategies = {"avalanche": avalanche_order(debts), "snowball": snowball_order(debts)}
+        plans = plan_payoff(debts, extra, strategies)
+        for name, order in strategies.items():
+            interest, payoff = _reference(debts, extra, order)
+            assert plans[name].total_interest == pytest.approx(interest, abs=0.05)
+            assert plans[name].payoff_months == payoff
+        interest, payoff = _reference(debts, extra, [d.id for d in debts], rollover=False)
+        assert plans["minimum"].payoff_months == payoff
+
+    def test_orders(self):
+        debts = [
+            PlannerDebt(1, "房贷", 800_000.0, 3.85, monthly_payment=_annuity(800_000.0, 3.85, 360)),
+            PlannerDebt(2, "车贷", 60_000.0, 6.0, monthly_payment=_annuity(60_000.0, 6.0, 36)),
+            PlannerDebt(3, "信用卡", 20_000.0, 18.0, monthly_payment=_annuity(20_000.0, 18.0, 12)),
+            PlannerDebt(4, "消费贷", 5_000.0, 9.0, monthly_payment=_annuity(5_000.0, 9.0, 12)),
+        ]
+        assert avalanche_order(debts) == [3, 4, 2, 1]
+        assert snowball_order(debts) == [4, 3, 2, 1]
+        assert custom_order(debts, [2]) == [2, 3, 4, 1]
+        with pytest.raises(ValueError):
+            custom_order(debts, [99])
+
+        plans = plan_payoff(debts, 2_000.0, {"avalanche": avalanche_order(debts),
+                                             "snowball": snowball_order(debts)})
+        assert plans["avalanche"].total_interest <= plans["snowball"].total_interest
+        assert plans["snowball"].payoff_months[4] <= plans["avalanche"].payoff_months[4]
+        for name in ("avalanche", "snowball"):
+            assert plans[name].paid_off
+            assert plans[name].months < plans["minimum"].months
+            assert plans[name].total_interest < plans["minimum"].total_interest
+            assert len(plans[name].balance_timeline) == plans[name].months
+            assert plans[name].balance_timeline[-1] == 0.0
+
+    def test_budget_includes_minimums(self):
+        debts = _portfolio(2, 4)
+        assert monthly_budget(debts, 500.0) == round(sum(minimum_payment(d) for d in debts) + 500.0, 2)
+
+    def test_many_debts_latency(self):
+        debts = _portfolio(3, 12)
+        strategies = {"avalanche": avalanche_order(debts), "snowball": snowball_order(debts),
+                      "custom": custom_order(debts, [5, 2])}
+        plan_payoff(debts, 0.0, strategies)
+        t0 = time.perf_counter()
+        plans = plan_payoff(debts, 0.0, strategies)
+        elapsed = time.perf_counter() - t0
+        assert plans["minimum"].months >= 360
+        # 本机约 20ms；断言留出余量避免 CI 抖动
+        assert elapsed < 0.25
+
+
+class TestPlannerApi:
+
+    def test_plan(self, client, auth_headers, make_debt):
+        a = make_debt(name="低息", principal=100_000.0, annual_rate=3.0, term_months=120)
+        b = make_debt(name="高息", principal=20_000.0, annual_rate=12.0, term_months=24)
+        c = make_debt(name="已停用", principal=100_000.0, annual_rate=4.0, term_months=120)
+        client.put(f"/api/debt/{c['id']}", json={"is_active": False}, headers=auth_headers)
+
+        resp = client.post("/api/debt/planner", json={
+            "monthly_extra": 1000, "strategies": ["avalanche", "snowball", "custom"],
+            "custom_order": [a["id"]], "start_month": "2025-01",
+        }, headers=auth_headers)
+        assert resp.status_code == 200, resp.text
+        body = resp.json()
+        assert body["monthly_budget"] == round(a["monthly_payment"] + b["monthly_payment"] + 1000, 2)
+        assert [s["strategy"] for s in body["strategies"]] == ["avalanche", "snowball", "custom"]
+        avalanche = body["strategies"][0]
+        assert avalanche["order"] == [b["id"], a["id"]]
+        assert avalanche["interest_saved"] > 0
+        assert avalanche["payoff_month"] == avalanche["debts"][-1]["payoff_month"]
+        assert avalanche["debts"][0]["payoff_month"] < avalanche["debts"][1]["payoff_month"]
+        assert body["strategies"][2]["order"] == [a["id"], b["id"]]
+        assert body["baseline"]["payoff_month"] == "2034-12"
+
+    def test_validation(self, client, auth_headers, make_debt):
+        make_debt()
+        assert client.post("/api/debt/planner", json={"strategies": ["custom"]},
+                           headers=auth_headers).status_code == 422
+        assert client.post("/api/debt/planner", json={"strategies": ["custom"], "custom_order": [999]},
+                           headers=auth_headers).status_code == 422
+        assert client.post("/api/debt/planner", json={"start_month": "2025-13"},
+                           headers=auth_headers).status_code == 422
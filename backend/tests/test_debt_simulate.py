@@ -0,0 +1,118 @@
+"""
+提前还款情景模拟测试：
+1. 各情景结果与逐个调用 generate_schedule 拼接出的计划一致
+2. 缩短期限 / 减少月供 / 利率变化 / 一次还清的语义
+3. 接口：批量返回、参数校验、不写库
+"""
+import time
+from datetime import date
+
+import pytest
+
+from app.core.debt_calculator import generate_schedule
+from app.core.debt_simulator import Scenario, simulate
+from app.models.debt import DebtItem
+
+LOAN = (1_000_000.0, 3.85, 360, "equal_installment", date(2024, 1, 20))
+
+
+def _scalar(loan, s: Scenario, periods: int):
+    """参照实现：原计划前 at_period 期 + 剩余部分单独生成。"""
+    base = generate_schedule(*loan)
+    balance = round((base[s.at_period - 1].remaining_balance if s.at_period else loan[0]) - s.prepay_amount, 2)
+    rate = loan[1] if s.new_annual_rate is None else s.new_annual_rate
+    tail = generate_schedule(balance, rate, periods, loan[3], base[s.at_period].due_date)
+    interest = sum(p.interest_amount for p in base[:s.at_period]) + sum(p.interest_amount for p in tail)
+    return tail, round(interest, 2)
+
+
+class TestSimulator:
+
+    @pytest.mark.parametrize("method", ["equal_installment", "equal_principal"])
+    def test_matches_scalar_reference(self, method):
+        loan = LOAN[:3] + (method,) + LOAN[4:]
+        scenarios = [
+            Scenario(at_period=12, prepay_amount=100_000, mode="reduce_payment"),
+            Scenario(at_period=12, prepay_amount=100_000, mode="shorten_term"),
+            Scenario(at_period=0, new_annual_rate=3.1, mode="reduce_payment"),
+            Scenario(at_period=60, prepay_amount=50_000, new_annual_rate=4.2, mode="shorten_term"),
+        ]
+        result = simulate(*loan, scenarios)
+        for s, r in zip(scenarios, result.scenarios):
+            tail, interest = _scalar(loan, s, r.term_months - s.at_period)
+            assert r.monthly_payment == tail[0].payment_amount
+            assert r.payoff_date == tail[-1].due_date
+            assert r.total_interest == interest
+            assert r.interest_saved == round(result.baseline_total_interest - interest, 2)
+
+    def test_shorten_keeps_payment(self):
+        result = simulate(*LOAN, [Scenario(at_period=24, prepay_amount=100_000, mode="shorten_term")])
+        r = result.scenarios[0]
+        assert r.term_months < 360
+        assert r.monthly_payment <= result.baseline_monthly_payment
+        assert r.monthly_payment > result.baseline_monthly_payment - 50
+
+    def test_reduce_keeps_term(self):
+        result = simulate(*LOAN, [Scenario(at_period=24, prepay_amount=100_000, mode="reduce_payment")])
+        r = result.scenarios[0]
+        assert r.term_months == 360
+        assert r.payoff_date == result.baseline_payoff_date
+        assert r.monthly_payment < result.baseline_monthly_payment
+        # 同样的提前还款，缩短期限比减少月供省更多利息
+        shorten = simulate(*LOAN, [Scenario(at_period=24, prepay_amount=100_000)]).scenarios[0]
+        assert shorten.interest_saved > r.interest_saved > 0
+
+    def test_rate_increase_costs_interest(self):
+        r = simulate(*LOAN, [Scenario(at_period=12, new_annual_rate=4.9, mode="reduce_payment")]).scenarios[0]
+        assert r.interest_saved < 0
+
+    def test_full_payoff(self):
+        result = simulate(*LOAN, [Scenario(at_period=12, prepay_amount=2_000_000)])
+        r = result.scenarios[0]
+        assert (r.term_months, r.monthly_payment, r.payoff_date) == (12, 0.0, date(2024, 12, 20))
+
+    def test_invalid_scenarios(self):
+        with pytest.raises(ValueError):
+            simulate(*LOAN, [Scenario(at_period=360)])
+        with pytest.raises(ValueError):
+            # 月供不足以覆盖新利率下的利息
+            simulate(*LOAN, [Scenario(at_period=0, new_annual_rate=60.0, mode="shorten_term")])
+
+    def test_hundred_scenarios_latency(self):
+        scenarios = [
+            Scenario(at_period=(i * 7) % 300, prepay_amount=1_000.0 * i,
+                     new_annual_rate=None if i % 3 else 3.5,
+                     mode="shorten_term" if i % 2 else "reduce_payment")
+            for i in range(100)
+        ]
+        simulate(*LOAN, scenarios)
+        t0 = time.perf_counter()
+        simulate(*LOAN, scenarios)
+        # 目标 50ms（benchmarks/bench_simulate.py），这里留足余量避免偶发抖动
+        assert time.perf_counter() - t0 < 0.5
+
+
+class TestSimulateApi:
+
+    def test_simulate(self, client, auth_headers, make_debt, db_session):
+        debt = make_debt()
+        resp = client.post(f"/api/debt/{debt['id']}/simulate", json={"scenarios": [
+            {"name": "一年后还 10 万", "at_period": 12, "prepay_amount": 100000},
+            {"at_period": 12, "prepay_amount": 100000, "mode": "reduce_payment"},
+        ]}, headers=auth_headers)
+        assert resp.status_code == 200, resp.text
+        body = resp.json()
+        assert body["baseline_term_months"] == 360
+        assert [r["name"] for r in body["results"]] == ["一年后还 10 万", None]
+        assert body["results"][0]["interest_saved"] > body["results"][1]["interest_saved"] > 0
+        item = db_session.get(DebtItem, debt["id"])
+        assert (item.current_balance, item.paid_periods) == (1_000_000.0, 0)
+
+    def test_validation(self, client, auth_headers, make_debt):
+        debt = make_debt()
+        url = f"/api/debt/{debt['id']}/simulate"
+        assert client.post(url, json={"scenarios": []}, headers=auth_headers).status_code == 422
+        resp = client.post(url, json={"scenarios": [{"at_period": 400}]}, headers=auth_headers)
+        assert resp.status_code == 422
+        assert client.post("/api/debt/9999/simulate", json={"scenarios": [{}]},
+                           headers=auth_headers).status_code == 404
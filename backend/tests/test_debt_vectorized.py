@@ -0,0 +1,108 @@
+"""
+NumPy 批量还款计划引擎测试：
+1. round2 与 Python round(x, 2) 逐值一致（含恰好一半、二进制近似的 .xx5、负数与 -0.0）
+2. 还款日推进与 relativedelta 一致（含月末对齐、闰年）
+3. 批量结果与 generate_schedule 按位一致（随机组合 + 边界贷款）
+"""
+import calendar
+import math
+import random
+from datetime import date
+
+import numpy as np
+import pytest
+from dateutil.relativedelta import relativedelta
+
+from app.core.debt_calculator import generate_schedule
+from app.core.debt_vectorized import add_months, generate_schedules, round2
+
+
+def _random_date(rng: random.Random) -> date:
+    year, month = rng.randint(2000, 2035), rng.randint(1, 12)
+    return date(year, month, rng.randint(1, calendar.monthrange(year, month)[1]))
+
+
+def _random_loans(seed: int, count: int) -> list[tuple]:
+    rng = random.Random(seed)
+    return [
+        (
+            round(rng.uniform(0.01, 5_000_000), 2),
+            rng.choice([0.0, 0.01, 3.85, 4.9, 12.0, 24.0, round(rng.uniform(0, 36), 4)]),
+            rng.choice([1, 2, 12, 36, 120, 240, 360, rng.randint(1, 480)]),
+            rng.choice(["equal_installment", "equal_principal"]),
+            _random_date(rng),
+        )
+        for _ in range(count)
+    ]
+
+
+EDGE_LOANS = [
+    (1_000_000.0, 3.85, 360, "equal_installment", date(2024, 1, 31)),
+    (1_000_000.0, 3.85, 360, "equal_principal", date(2024, 2, 29)),
+    (0.01, 10.0, 12, "equal_installment", date(2023, 8, 31)),
+    (0.05, 3.0, 12, "equal_principal", date(2023, 8, 30)),
+    (100.0, 0.0, 7, "equal_installment", date(2024, 12, 31)),
+    (99_999.99, 4.35, 1, "equal_principal", date(2024, 3, 15)),
+    (12_345.67, 36.0, 480, "equal_installment", date(2030, 5, 31)),
+]
+
+
+class TestRound2:
+
+    def test_matches_builtin_round(self):
+        rng = random.Random(0)
+        values = [rng.uniform(-1e7, 1e7) for _ in range(50_000)]
+        values += [rng.random() * 10 ** rng.randint(-6, 12) for _ in range(50_000)]
+        values += [k / 1000 for k in range(-20_000, 20_000)]   # 二进制下近似的 .xx5
+        values += [k / 200 for k in range(-20_000, 20_000)]    # 恰好一半（0.125 等）与近似一半
+        values += [0.0, -0.0, 2.675, 1.005, 0.125, -0.125, 1e-20, -1e-20, 0.004999999999999999]
+        expected = np.array([round(v, 2) for v in values])
+        got = round2(np.array(values))
+        assert np.array_equal(got, expected)
+        assert np.array_equal(np.signbit(got), np.signbit(expected))
+
+
+class TestAddMonths:
+
+    def test_matches_relativedelta(self):
+        rng = random.Random(1)
+        firsts = [_random_date(rng) for _ in range(200)] + [date(2024, 1, 31), date(2024, 2, 29)]
+        due = add_months(firsts, 400)
+        for i, first in enumerate(firsts):
+            for k in range(0, 400, 7):
+                assert due[i, k].astype(object) == first + relativedelta(months=k)
+
+    def test_month_end_clamp(self):
+        due = add_months([date(2024, 1, 31)], 3)[0].astype(object).tolist()
+        assert due == [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31)]
+
+
+class TestScheduleParity:
+
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_random_portfolio_bitwise_equal(self, seed):
+        loans = _random_loans(seed, 300) + EDGE_LOANS
+        batch = generate_schedules(*zip(*loans))
+        for i, loan in enumerate(loans):
+            assert batch.to_period_details(i) == generate_schedule(*loan), loan
+
+    def test_last_period_reconciliation(self):
+        batch = generate_schedules(*zip(*EDGE_LOANS))
+        for i, loan in enumerate(EDGE_LOANS):
+            n = loan[2]
+            assert batch.remaining_balance[i, n - 1] == 0.0
+            assert math.isclose(np.nansum(batch.principal_amount[i]), loan[0], abs_tol=0.005)
+
+    def test_padding_beyond_term(self):
+        batch = generate_schedules(*zip(*EDGE_LOANS))
+        assert batch.payment_amount.shape == (len(EDGE_LOANS), 480)
+        assert np.isnan(batch.payment_amount[0, 360:]).all()
+        assert np.isnat(batch.due_date[0, 360:]).all()
+
+    def test_invalid_method(self):
+        with pytest.raises(ValueError):
+            generate_schedules([1000.0], [3.0], [12], ["balloon"], [date(2024, 1, 1)])
+
+    def test_mismatched_lengths(self):
+        with pytest.raises(ValueError):
+            generate_schedules([1000.0, 2000.0], [3.0], [12], ["equal_principal"], [date(2024, 1, 1)])
@@ -6,6 +6,7 @@
 4. CSV 导入（正常 + 边界值 + 错误数据）
 5. 导入-导出往返一致性（round-trip）
 6. 趋势接口
+7. monthly_totals 汇总表维护
 """
 import csv
 import io
@@ -188,6 +189,63 @@ class TestMonthlyBalances:
         )
         assert resp.status_code == 400
 
+    def test_upsert_response_includes_untouched_accounts(self, client, auth_headers):
+        """只提交部分账户时，返回的快照仍包含该月其他账户，总额为全部之和。"""
+        ids = self._get_account_ids(client, auth_headers)
+        client.post(
+            "/api/income/balances",
+            json={"month": "2026-06", "balances": [{"account_id": ids[0], "balance": 100.0},
+                                                    {"account_id": ids[1], "balance": 200.0}]},
+            headers=auth_headers,
+        )
+        resp = client.post(
+            "/api/income/balances",
+            json={"month": "2026-06", "balances": [{"account_id": ids[1], "balance": 250.0}]},
+            headers=auth_headers,
+        )
+        data = resp.json()
+        assert [i["account_id"] for i in data["items"]] == sorted(ids[:2])
+        assert abs(data["total"] - 350.0) < 0.01
+
+    def test_upsert_statement_count_is_constant(self, client, auth_headers, query_counter):
+        """upsert 的 SQL 语句数不随账户数量增长。"""
+        ids = self._get_account_ids(client, auth_headers)
+        counts = []
+        for month, n in (("2026-07", 1), ("2026-08", len(ids))):
+            query_counter.statements.clear()
+            client.post(
+                "/api/income/balances",
+                json={"month": month, "balances": [{"account_id": i, "balance": 1.0} for i in ids[:n]]},
+                headers=auth_headers,
+            )
+            counts.append(query_counter.count("monthly_balances"))
+        assert counts[0] == counts[1] == 2
+
+    def test_list_months_single_query(self, client, auth_headers, query_counter):
+        """月份列表只发出 1 条查询 monthly_balances 的语句，与月份数无关（防止 N+1 回归）。"""
+        ids = self._get_account_ids(client, auth_headers)
+        for m in range(1, 13):
+            client.post(
+                "/api/income/balances",
+                json={"month": f"2024-{m:02d}", "balances": [{"account_id": ids[0], "balance": m * 1.0},
+                                                             {"account_id": ids[1], "balance": 0.1}]},
+                headers=auth_headers,
+            )
+        query_counter.statements.clear()
+        resp = client.get("/api/income/balances?limit=10", headers=auth_headers)
+        assert resp.status_code == 200
+        assert query_counter.count("monthly_balances") == 1
+        # 每月合计在同一条 SQL 中计算
+        (statement,) = [st for st in query_counter.statements if "monthly_balances" in st]
+        assert "sum(monthly_balances.balance) OVER (PARTITION BY monthly_balances.month)" in statement
+
+        data = resp.json()
+        assert [s["month"] for s in data] == [f"2024-{m:02d}" for m in range(12, 2, -1)]
+        for snapshot in data:
+            m = int(snapshot["month"][-2:])
+            assert [i["account_id"] for i in snapshot["items"]] == sorted(ids[:2])
+            assert snapshot["total"] == round(m + 0.1, 2)
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # 3. CSV 导出格式验证
@@ -241,6 +299,34 @@ class TestCsvExport:
         row = next(reader)
         assert abs(float(row["总资产"]) - 6000.0) < 0.01
 
+    def test_export_streams_in_chunks(self, client, auth_headers, db_engine, monkeypatch):
+        """缓冲阈值很小时按月分块输出，拼接后仍是完整、按月升序的 CSV，BOM 只出现一次。"""
+        from app.api.income import balances
+
+        monkeypatch.setattr(balances, "_EXPORT_FLUSH_BYTES", 1)
+        monkeypatch.setattr(balances, "_EXPORT_YIELD_PER", 2)
+        ids = [a["id"] for a in client.get("/api/income/accounts", headers=auth_headers).json()]
+        for m in (3, 1, 2):
+            client.post(
+                "/api/income/balances",
+                json={"month": f"2025-{m:02d}", "balances": [{"account_id": ids[0], "balance": m * 100.0},
+                                                             {"account_id": ids[1], "balance": 0.5}]},
+                headers=auth_headers,
+            )
+        accs = [(a["id"], a["name"]) for a in client.get("/api/income/accounts", headers=auth_headers).json()]
+        user_id = client.get("/api/auth/me", headers=auth_headers).json()["id"]
+        # TestClient 会缓冲整个响应体，这里直接驱动生成器验证分块
+        chunks = list(balances._iter_export_csv(db_engine, user_id, accs))
+        assert len(chunks) >= 3
+        body = b"".join(chunks)
+        assert body == client.get("/api/income/export/csv", headers=auth_headers).content
+        assert body.startswith("\ufeff".encode("utf-8"))
+        assert body.count("\ufeff".encode("utf-8")) == 1
+
+        rows = list(csv.reader(io.StringIO(body.decode("utf-8-sig"))))
+        assert [r[0] for r in rows[1:]] == ["2025-01", "2025-02", "2025-03"]
+        assert [float(r[-1]) for r in rows[1:]] == [100.5, 200.5, 300.5]
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # 4. CSV 导入
@@ -354,6 +440,83 @@ class TestCsvImport:
         assert "总资产" not in names
 
 
+    def test_import_large_file_in_chunks(self, client, auth_headers, query_counter):
+        """10 年 × 10 账户的历史分块写入，统计与逐格导入一致，查询数与块数成正比。"""
+        client.get("/api/income/accounts", headers=auth_headers)
+        accounts = [f"账户{i}" for i in range(10)]
+        rows = [
+            {"月份": f"{2015 + m // 12}-{m % 12 + 1:02d}", **{a: str(m * 10 + i) for i, a in enumerate(accounts)}}
+            for m in range(120)
+        ]
+        csv_bytes = make_csv(rows, fieldnames=["月份"] + accounts)
+
+        query_counter.statements.clear()
+        first = client.post(
+            "/api/income/import/csv",
+            files={"file": ("big.csv", csv_bytes, "text/csv")},
+            headers=auth_headers,
+        ).json()
+        assert first["inserted"] == 1200
+        assert first["updated"] == 0
+        assert first["chunks"] == 3
+        # 每块：1 次预取 + 1 次批量 upsert + 1 次汇总刷新
+        assert query_counter.count("monthly_balances") == 3 * first["chunks"]
+
+        second = client.post(
+            "/api/income/import/csv",
+            files={"file": ("big.csv", csv_bytes, "text/csv")},
+            headers=auth_headers,
+        ).json()
+        assert second["inserted"] == 0
+        assert second["updated"] == 1200
+
+        snapshot = client.get("/api/income/balances/2024-12", headers=auth_headers).json()
+        assert len(snapshot["items"]) == 10
+
+    def test_import_gbk_encoded(self, client, auth_headers):
+        """非 UTF-8（GBK）编码的 CSV 应能正确识别。"""
+        client.get("/api/income/accounts", headers=auth_headers)
+        csv_bytes = "月份,微众银行\r\n2026-06,1234\r\n".encode("gbk")
+        resp = client.post(
+            "/api/income/import/csv",
+            files={"file": ("gbk.csv", csv_bytes, "text/csv")},
+            headers=auth_headers,
+        )
+        assert resp.status_code == 200
+        assert resp.json()["inserted"] == 1
+
+    def test_import_gbk_bytes_after_utf8_prefix(self, client, auth_headers):
+        """开头 64KB 以上都能按 UTF-8 解码、后面才出现 GBK 字节时，与以前一样整个文件按 GBK 解码，不中途报错。"""
+        client.get("/api/income/accounts", headers=auth_headers)
+        rows = 8000
+        csv_bytes = ("月份,Cash\n" + "2026-01,1\n" * rows).encode("utf-8") + "2026-02,一百\n".encode("gbk")
+        assert len(csv_bytes) > 64 * 1024
+        resp = client.post(
+            "/api/income/import/csv",
+            files={"file": ("mixed.csv", csv_bytes, "text/csv")},
+            headers=auth_headers,
+        )
+        assert resp.status_code == 200, resp.text
+        # 按 GBK 解码后表头中的「月份」变成乱码，每一行都因缺少月份被跳过
+        assert (resp.json()["inserted"], resp.json()["skipped"]) == (0, rows + 1)
+
+    def test_import_duplicate_month_rows_counted_as_update(self, client, auth_headers):
+        """同一月份在文件中出现两次时，后一次计为更新并以其值为准。"""
+        client.get("/api/income/accounts", headers=auth_headers)
+        csv_bytes = make_csv(
+            [{"月份": "2026-07", "微众银行": "1"}, {"月份": "2026-07", "微众银行": "2"}],
+            fieldnames=["月份", "微众银行"],
+        )
+        result = client.post(
+            "/api/income/import/csv",
+            files={"file": ("dup.csv", csv_bytes, "text/csv")},
+            headers=auth_headers,
+        ).json()
+        assert (result["inserted"], result["updated"]) == (1, 1)
+        snapshot = client.get("/api/income/balances/2026-07", headers=auth_headers).json()
+        assert snapshot["items"][0]["balance"] == 2.0
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # 5. 导入-导出往返一致性（round-trip）
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -441,3 +604,147 @@ class TestTrend:
         trend = {a["account_id"]: a["data"] for a in resp.json()}
         total_value = trend[0][0]["value"]
         assert abs(total_value - 3000.0) < 0.01
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 7. monthly_totals 汇总表维护
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _totals(db_engine) -> dict[str, tuple[float, int]]:
+    from sqlalchemy import text
+
+    with db_engine.connect() as conn:
+        rows = conn.execute(text("SELECT month, total, account_count FROM monthly_totals")).all()
+    return {m: (round(t, 2), c) for m, t, c in rows}
+
+
+class TestMonthlyTotals:
+
+    def _ids(self, client, auth_headers):
+        return [a["id"] for a in client.get("/api/income/accounts", headers=auth_headers).json()]
+
+    def test_upsert_and_delete_maintain_rollup(self, client, auth_headers, db_engine):
+        ids = self._ids(client, auth_headers)
+        client.post(
+            "/api/income/balances",
+            json={"month": "2026-01", "balances": [{"account_id": ids[0], "balance": 100.0},
+                                                    {"account_id": ids[1], "balance": 50.5}]},
+            headers=auth_headers,
+        )
+        client.post(
+            "/api/income/balances",
+            json={"month": "2026-01", "balances": [{"account_id": ids[0], "balance": 200.0}]},
+            headers=auth_headers,
+        )
+        assert _totals(db_engine) == {"2026-01": (250.5, 2)}
+
+        client.delete("/api/income/balances/2026-01", headers=auth_headers)
+        assert _totals(db_engine) == {}
+
+    def test_soft_delete_account_excludes_from_totals(self, client, auth_headers, db_engine):
+        ids = self._ids(client, auth_headers)
+        for month in ("2026-01", "2026-02"):
+            client.post(
+                "/api/income/balances",
+                json={"month": month, "balances": [{"account_id": ids[0], "balance": 100.0},
+                                                   {"account_id": ids[1], "balance": 10.0}]},
+                headers=auth_headers,
+            )
+        client.delete(f"/api/income/accounts/{ids[1]}", headers=auth_headers)
+        assert _totals(db_engine) == {"2026-01": (100.0, 1), "2026-02": (100.0, 1)}
+
+        # 趋势的「总资产」只计启用账户；月份列表 / 单月详情的 total 仍是全部明细之和
+        trend = client.get("/api/income/stats/trend", headers=auth_headers).json()
+        assert [p["value"] for p in trend[-1]["data"]] == [100.0, 100.0]
+        listed = client.get("/api/income/balances", headers=auth_headers).json()
+        assert [(s["total"], len(s["items"])) for s in listed] == [(110.0, 2), (110.0, 2)]
+        single = client.get("/api/income/balances/2026-01", headers=auth_headers).json()
+        assert single["total"] == sum(i["balance"] for i in single["items"]) == 110.0
+
+    def test_orphan_balances_and_missing_rollup_row(self, client, auth_headers, db_engine):
+        from sqlalchemy import text
+
+        ids = self._ids(client, auth_headers)
+        client.post(
+            "/api/income/balances",
+            json={"month": "2026-01", "balances": [{"account_id": ids[0], "balance": 100.0}]},
+            headers=auth_headers,
+        )
+        with db_engine.connect() as conn:
+            # 旧库迁移前的余额行：对应的账户行不存在
+            conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            conn.execute(text(
+                "INSERT INTO monthly_balances (user_id, month, account_id, account_name, balance, updated_at) "
+                "SELECT user_id, '2025-12', 9999, '旧账户', 7.5, CURRENT_TIMESTAMP FROM accounts LIMIT 1"
+            ))
+            conn.commit()
+            conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+
+        # 汇总行缺失时单月详情仍由明细计算
+        resp = client.get("/api/income/balances/2025-12", headers=auth_headers)
+        assert resp.status_code == 200
+        assert resp.json()["total"] == 7.5
+
+        # 重建后账户缺失的月份也有汇总行（不计入总资产），月份列表能列出该月
+        from sqlalchemy.orm import Session
+        from app.core.rollup import rebuild_monthly_totals
+
+        with Session(db_engine) as db:
+            rebuild_monthly_totals(db)
+            db.commit()
+        assert _totals(db_engine) == {"2026-01": (100.0, 1), "2025-12": (0.0, 0)}
+        listed = client.get("/api/income/balances", headers=auth_headers).json()
+        assert [(s["month"], s["total"]) for s in listed] == [("2026-01", 100.0), ("2025-12", 7.5)]
+
+    def test_import_reactivating_account_restores_totals(self, client, auth_headers, db_engine):
+        accs = client.get("/api/income/accounts", headers=auth_headers).json()
+        client.post(
+            "/api/income/balances",
+            json={"month": "2026-01", "balances": [{"account_id": accs[0]["id"], "balance": 100.0},
+                                                    {"account_id": accs[1]["id"], "balance": 10.0}]},
+            headers=auth_headers,
+        )
+        client.delete(f"/api/income/accounts/{accs[1]['id']}", headers=auth_headers)
+        csv_bytes = make_csv(
+            [{"月份": "2026-03", accs[1]["name"]: "5"}],
+            fieldnames=["月份", accs[1]["name"]],
+        )
+        client.post(
+            "/api/income/import/csv",
+            files={"file": ("t.csv", csv_bytes, "text/csv")},
+            headers=auth_headers,
+        )
+        assert _totals(db_engine) == {"2026-01": (110.0, 2), "2026-03": (5.0, 1)}
+
+    def test_rebuild_matches_incremental(self, client, auth_headers, db_engine):
+        from sqlalchemy.orm import Session
+        from app.core.rollup import rebuild_monthly_totals
+
+        ids = self._ids(client, auth_headers)
+        for m in range(1, 7):
+            client.post(
+                "/api/income/balances",
+                json={"month": f"2025-{m:02d}", "balances": [{"account_id": i, "balance": m * 1.25 + i}
+                                                             for i in ids[:m]]},
+                headers=auth_headers,
+            )
+        client.delete("/api/income/balances/2025-03", headers=auth_headers)
+        client.delete(f"/api/income/accounts/{ids[2]}", headers=auth_headers)
+        incremental = _totals(db_engine)
+
+        with Session(db_engine) as db:
+            assert rebuild_monthly_totals(db) == len(incremental)
+            db.commit()
+        assert _totals(db_engine) == incremental
+
+    def test_yearly_trend_total_from_rollup(self, client, auth_headers):
+        ids = self._ids(client, auth_headers)
+        for month, balance in (("2024-06", 1.0), ("2024-12", 2.0), ("2025-03", 3.0)):
+            client.post(
+                "/api/income/balances",
+                json={"month": month, "balances": [{"account_id": ids[0], "balance": balance},
+                                                   {"account_id": ids[1], "balance": 0.5}]},
+                headers=auth_headers,
+            )
+        trend = client.get("/api/income/stats/trend/yearly", headers=auth_headers).json()
+        assert trend[-1]["data"] == [{"month": "2024", "value": 2.5}, {"month": "2025", "value": 3.5}]
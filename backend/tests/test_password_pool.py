@@ -0,0 +1,92 @@
+"""
+口令计算池测试：
+1. 进程池模式下哈希 / 校验结果正确
+2. 超出容量的登录请求立即返回 503，且不进入 bcrypt 计算
+3. 排队超时返回 503
+4. 指标接口输出耗时与计数
+"""
+import asyncio
+import threading
+
+import pytest
+
+from app.core.password_pool import PasswordPool, PasswordPoolBusy, get_password_pool
+from app.main import app
+
+
+def _occupy(pool: PasswordPool) -> threading.Event:
+    """提交一个占住工作线程的任务，返回放行用的 Event。"""
+    started, gate = threading.Event(), threading.Event()
+
+    def _blocker():
+        started.set()
+        gate.wait(5)
+
+    pool._submit(_blocker)
+    assert started.wait(5)
+    return gate
+
+
+@pytest.fixture
+def small_pool():
+    pool = PasswordPool(workers=1, max_pending=1, timeout=5.0, mode="thread")
+    app.dependency_overrides[get_password_pool] = lambda: pool
+    yield pool
+    app.dependency_overrides.pop(get_password_pool, None)
+    pool.stop()
+
+
+def test_process_pool_hash_and_verify():
+    pool = PasswordPool(workers=1, max_pending=2, timeout=30.0, mode="process")
+    try:
+        hashed = asyncio.run(pool.hash("secret", 4))
+        assert hashed.startswith("$2b$04$")
+        assert asyncio.run(pool.verify("secret", hashed)) is True
+        assert asyncio.run(pool.verify("wrong", hashed)) is False
+        stats = pool.stats()
+        assert stats["completed"] == 3
+        assert stats["in_flight"] == 0
+    finally:
+        pool.stop()
+
+
+def test_login_rejected_when_pool_full(client, auth_headers, small_pool):
+    gate = _occupy(small_pool)
+    try:
+        resp = client.post("/api/auth/login", data={"username": "admin", "password": "admin123"})
+        assert resp.status_code == 503
+    finally:
+        gate.set()
+    stats = small_pool.stats()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 0
+
+
+def test_login_times_out_in_queue(client, auth_headers, small_pool):
+    small_pool._max_pending = 2
+    small_pool._timeout = 0.1
+    gate = _occupy(small_pool)
+    try:
+        resp = client.post("/api/auth/login", data={"username": "admin", "password": "admin123"})
+        assert resp.status_code == 503
+    finally:
+        gate.set()
+    assert small_pool.stats()["timeouts"] == 1
+
+
+def test_busy_error_raised_directly():
+    pool = PasswordPool(workers=1, max_pending=1, mode="thread")
+    gate = _occupy(pool)
+    try:
+        with pytest.raises(PasswordPoolBusy):
+            asyncio.run(pool.verify("x", "y"))
+    finally:
+        gate.set()
+        pool.stop()
+
+
+def test_metrics_report_password_pool(client, auth_headers):
+    stats = client.get("/api/metrics", headers=auth_headers).json()["password_pool"]
+    assert stats["completed"] >= 1      # auth_headers 触发过一次登录
+    assert stats["compute"]["count"] >= 1
+    assert stats["in_flight"] == 0
@@ -0,0 +1,115 @@
+"""
+登录限流测试：
+1. 令牌桶突发容量、按速率补充、LRU 上限
+2. 超限的登录请求返回 429 + Retry-After，且不会进入口令校验
+3. 按 IP 与按用户名两个维度分别生效
+4. 指标接口输出计数
+"""
+import pytest
+
+from app.core import rate_limit
+from app.core.password_pool import PasswordPool
+from app.core.rate_limit import LoginThrottle, RateLimited, get_login_throttle
+from app.main import app
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def verify_calls(monkeypatch):
+    calls = []
+    real_verify = PasswordPool.verify
+
+    async def counting_verify(self, plain, hashed):
+        calls.append(plain)
+        return await real_verify(self, plain, hashed)
+
+    monkeypatch.setattr(PasswordPool, "verify", counting_verify)
+    return calls
+
+
+def _use_throttle(throttle: LoginThrottle):
+    app.dependency_overrides[get_login_throttle] = lambda: throttle
+
+
+def _login(client, username="admin", password="wrong"):
+    return client.post("/api/auth/login", data={"username": username, "password": password})
+
+
+class TestTokenBucket:
+
+    def test_burst_then_reject(self, clock):
+        throttle = LoginThrottle(ip_burst=100, user_burst=3, user_per_minute=60)
+        for _ in range(3):
+            throttle.check("1.1.1.1", "alice")
+        with pytest.raises(RateLimited) as exc:
+            throttle.check("1.1.1.1", "alice")
+        assert exc.value.scope == "username"
+        assert exc.value.retry_after == pytest.approx(1.0)
+
+    def test_refill_over_time(self, clock):
+        throttle = LoginThrottle(ip_burst=100, user_burst=1, user_per_minute=60)
+        throttle.check("ip", "alice")
+        with pytest.raises(RateLimited):
+            throttle.check("ip", "alice")
+        clock[0] += 1.0
+        throttle.check("ip", "alice")
+
+    def test_username_case_insensitive(self, clock):
+        throttle = LoginThrottle(ip_burst=100, user_burst=1)
+        throttle.check("ip", "Alice")
+        with pytest.raises(RateLimited):
+            throttle.check("ip", " alice ")
+
+    def test_rejected_attempt_does_not_consume_other_bucket(self, clock):
+        throttle = LoginThrottle(ip_burst=2, user_burst=1)
+        throttle.check("ip", "alice")
+        with pytest.raises(RateLimited):
+            throttle.check("ip", "alice")   # 用户名桶已空，IP 桶不扣减
+        throttle.check("ip", "bob")
+        assert throttle.stats()["allowed"] == 2
+
+    def test_lru_bound(self, clock):
+        throttle = LoginThrottle(ip_burst=100, user_burst=1, max_keys=2)
+        for name in ("a", "b", "c"):
+            throttle.check("ip", name)
+        stats = throttle.stats()
+        assert stats["tracked_usernames"] == 2
+        assert stats["evictions"] == 1
+
+
+class TestLoginThrottle:
+
+    def test_username_flood_returns_429_without_verify(self, client, verify_calls):
+        _use_throttle(LoginThrottle(ip_burst=100, user_burst=2, user_per_minute=1))
+        assert _login(client).status_code == 401
+        assert _login(client).status_code == 401
+        resp = _login(client)
+        assert resp.status_code == 429
+        assert int(resp.headers["Retry-After"]) >= 1
+        assert verify_calls == []   # 用户不存在，也不应做口令计算
+
+    def test_unknown_usernames_limited_per_ip(self, client, verify_calls):
+        throttle = LoginThrottle(ip_burst=3, ip_per_minute=1, user_burst=100)
+        _use_throttle(throttle)
+        codes = [_login(client, username=f"ghost{i}").status_code for i in range(5)]
+        assert codes == [401, 401, 401, 429, 429]
+        assert throttle.stats()["rejected_ip"] == 2
+
+    def test_rejected_attempts_never_verify(self, client, auth_headers, verify_calls):
+        _use_throttle(LoginThrottle(ip_burst=100, user_burst=1, user_per_minute=1))
+        verify_calls.clear()
+        assert _login(client, password="admin123").status_code == 200
+        for _ in range(3):
+            assert _login(client, password="admin123").status_code == 429
+        assert verify_calls == ["admin123"]
+
+    def test_metrics_report_throttle(self, client, auth_headers):
+        stats = client.get("/api/metrics", headers=auth_headers).json()["login_throttle"]
+        assert stats["allowed"] >= 1
+        assert {"rejected_ip", "rejected_username", "tracked_ips"} <= stats.keys()
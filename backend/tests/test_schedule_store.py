@@ -0,0 +1,122 @@
+"""
+还款计划存储方式测试：
+1. lazy 模式创建债务不写 repayment_schedules；materialized 模式整张计划表一条 executemany 写入
+2. 两种模式的还款计划接口输出一致（含状态筛选）
+3. 自动扣款在两种模式下结果一致，且重复运行不会重复扣款
+4. 模式转换保留各期状态；旧库自动补 schedule_mode 列
+"""
+from datetime import date
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.scheduler import run_auto_repay
+from app.core.schedule_store import convert_schedule_mode, ensure_schedule_mode_column, load_schedule
+from app.models.debt import DebtItem, RepaymentSchedule, RepaymentStatusOverlay
+
+
+def _schedule(client, auth_headers, debt_id, **params):
+    resp = client.get(f"/api/debt/{debt_id}/schedule", params=params, headers=auth_headers)
+    assert resp.status_code == 200
+    return [
+        {k: v for k, v in row.items() if k not in ("id", "debt_id", "paid_at")}
+        for row in resp.json()
+    ]
+
+
+def _pair(make_debt, **overrides):
+    lazy = make_debt(schedule_mode="lazy", **overrides)
+    materialized = make_debt(schedule_mode="materialized", **overrides)
+    return lazy, materialized
+
+
+class TestLazySchedule:
+
+    def test_lazy_create_writes_no_rows(self, client, auth_headers, make_debt, db_session):
+        lazy, materialized = _pair(make_debt)
+        assert lazy["schedule_mode"] == "lazy"
+        count = lambda debt_id: db_session.query(RepaymentSchedule).filter_by(debt_id=debt_id).count()
+        assert count(lazy["id"]) == 0
+        assert count(materialized["id"]) == 360
+
+    def test_materialized_single_insert(self, client, auth_headers, make_debt, query_counter, db_session):
+        debt = make_debt(schedule_mode="materialized")
+        inserts = [st for st in query_counter.statements if st.startswith("INSERT INTO repayment_schedules")]
+        assert len(inserts) == 1
+        assert db_session.query(RepaymentSchedule).filter_by(debt_id=debt["id"], status="pending").count() == 360
+
+    def test_schedule_output_identical(self, client, auth_headers, make_debt):
+        for method in ("equal_installment", "equal_principal"):
+            lazy, materialized = _pair(make_debt, term_months=120, repay_method=method)
+            assert _schedule(client, auth_headers, lazy["id"]) == \
+                _schedule(client, auth_headers, materialized["id"])
+
+    def test_lazy_rows_have_no_id(self, client, auth_headers, make_debt):
+        lazy = make_debt(schedule_mode="lazy", term_months=12)
+        rows = client.get(f"/api/debt/{lazy['id']}/schedule", headers=auth_headers).json()
+        assert len(rows) == 12
+        assert all(r["id"] is None and r["status"] == "pending" for r in rows)
+
+
+class TestAutoRepay:
+
+    def test_both_modes_produce_same_result(self, client, auth_headers, make_debt, db_engine, write_executor):
+        lazy, materialized = _pair(make_debt, principal=120_000.0, term_months=24,
+                                   repay_method="equal_principal")
+        session_factory = sessionmaker(bind=db_engine)
+        # 4 月 20 日运行：补扣 1~4 期
+        assert run_auto_repay(session_factory, write_executor, date(2024, 4, 20)) == 8
+        assert run_auto_repay(session_factory, write_executor, date(2024, 4, 20)) == 0
+        assert run_auto_repay(session_factory, write_executor, date(2024, 4, 21)) == 0
+
+        paid_lazy = _schedule(client, auth_headers, lazy["id"], status="paid")
+        assert [r["period_no"] for r in paid_lazy] == [1, 2, 3, 4]
+        assert paid_lazy == _schedule(client, auth_headers, materialized["id"], status="paid")
+        assert _schedule(client, auth_headers, lazy["id"]) == \
+            _schedule(client, auth_headers, materialized["id"])
+
+        a = client.get(f"/api/debt/{lazy['id']}", headers=auth_headers).json()
+        b = client.get(f"/api/debt/{materialized['id']}", headers=auth_headers).json()
+        assert a["paid_periods"] == b["paid_periods"] == 4
+        assert a["current_balance"] == b["current_balance"] == 100_000.0
+
+    def test_overlay_is_sparse(self, client, auth_headers, make_debt, db_engine, write_executor, db_session):
+        lazy = make_debt(schedule_mode="lazy", first_repay_date="2024-01-20")
+        run_auto_repay(sessionmaker(bind=db_engine), write_executor, date(2024, 2, 20))
+        rows = db_session.query(RepaymentStatusOverlay).filter_by(debt_id=lazy["id"]).all()
+        assert sorted((r.period_no, r.status) for r in rows) == [(1, "paid"), (2, "paid")]
+        assert all(r.paid_at is not None for r in rows)
+
+
+class TestConversion:
+
+    def test_round_trip_keeps_status(self, client, auth_headers, make_debt, db_engine, write_executor, db_session):
+        debt = make_debt(schedule_mode="materialized", term_months=12,
+                         first_repay_date="2024-01-20")
+        run_auto_repay(sessionmaker(bind=db_engine), write_executor, date(2024, 3, 20))
+        before = _schedule(client, auth_headers, debt["id"])
+
+        item = db_session.get(DebtItem, debt["id"])
+        convert_schedule_mode(db_session, item, "lazy")
+        db_session.commit()
+        assert db_session.query(RepaymentSchedule).filter_by(debt_id=item.id).count() == 0
+        assert db_session.query(RepaymentStatusOverlay).filter_by(debt_id=item.id).count() == 3
+        assert _schedule(client, auth_headers, debt["id"]) == before
+
+        convert_schedule_mode(db_session, item, "materialized")
+        db_session.commit()
+        assert db_session.query(RepaymentStatusOverlay).filter_by(debt_id=item.id).count() == 0
+        assert [r.status for r in load_schedule(db_session, item)][:4] == ["paid"] * 3 + ["pending"]
+        assert _schedule(client, auth_headers, debt["id"]) == before
+
+    def test_adds_missing_column(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE debt_items (id INTEGER PRIMARY KEY, name VARCHAR(64))"))
+            conn.execute(text("INSERT INTO debt_items (name) VALUES ('房贷')"))
+        assert ensure_schedule_mode_column(engine) is True
+        assert ensure_schedule_mode_column(engine) is False
+        assert "schedule_mode" in {c["name"] for c in inspect(engine).get_columns("debt_items")}
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT schedule_mode FROM debt_items")).scalar() == "materialized"
+        engine.dispose()
@@ -0,0 +1,128 @@
+"""
+定时任务运行记录测试：
+1. tracked_job 记录成功 / 失败的运行（耗时、处理数量、错误），异常不向 APScheduler 抛出
+2. 错过计划时间的运行记为 missed（包括停机期间到点的运行，启动时按触发器补记）；超过保留天数的记录被清理
+3. 调度器默认合并积压运行、设置 misfire 宽限时间；注册的任务都经过包装
+4. GET /api/scheduler/jobs 返回下次运行时间、最近一次耗时与 p95
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from apscheduler.events import EVENT_JOB_MISSED, JobExecutionEvent
+from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy.orm import sessionmaker
+
+import app.db
+from app.core import scheduler
+from app.core.config import settings
+from app.models.job import JobRun
+
+
+@pytest.fixture
+def runs(db_engine, write_executor, monkeypatch):
+    """让运行记录写入测试库，返回读取全部记录的函数。"""
+    monkeypatch.setattr(app.db, "write_executor", write_executor)
+    Session = sessionmaker(bind=db_engine)
+
+    def load() -> list[JobRun]:
+        with Session() as session:
+            return session.query(JobRun).order_by(JobRun.id).all()
+
+    return load
+
+
+class TestTrackedJob:
+
+    def test_success(self, runs):
+        scheduler.tracked_job("daily_auto_repay", lambda: 42)()
+        (run,) = runs()
+        assert (run.job_id, run.status, run.rows_processed, run.error) == ("daily_auto_repay", "success", 42, None)
+        assert run.finished_at >= run.started_at
+        assert run.duration_ms >= 0
+
+    def test_failure_is_recorded_not_raised(self, runs):
+        def broken():
+            raise RuntimeError("disk full")
+
+        scheduler.tracked_job("daily_backup", broken)()
+        (run,) = runs()
+        assert (run.status, run.error, run.rows_processed) == ("failed", "disk full", None)
+
+    def test_missed(self, runs):
+        scheduled = datetime(2024, 5, 1, 2, 0, tzinfo=timezone(timedelta(hours=8)))
+        scheduler._on_job_missed(JobExecutionEvent(EVENT_JOB_MISSED, "daily_backup", "default", scheduled))
+        (run,) = runs()
+        assert run.status == "missed"
+        assert run.started_at == scheduled.astimezone().replace(tzinfo=None)
+        assert run.finished_at is None and run.duration_ms is None
+
+    def test_downtime_misses(self, runs, db_engine, write_executor):
+        tz = timezone(timedelta(hours=8))
+        trigger = CronTrigger(hour=2, minute=0, timezone=tz)
+        now = datetime.now(tz).replace(hour=12, minute=0, second=0, microsecond=0)
+        last = (now - timedelta(days=3)).replace(hour=2, second=1)
+        jobs = [("daily_backup", trigger), ("daily_auto_repay", trigger)]
+        with sessionmaker(bind=db_engine)() as session:
+            session.add(JobRun(job_id="daily_backup", status="success",
+                               started_at=last.astimezone().replace(tzinfo=None)))
+            session.commit()
+
+        # 上次运行之后停机 3 天：之后 3 天的 02:00 都应补记；从未运行过的任务不补记
+        assert write_executor.run(scheduler.record_downtime_misses, jobs, now) == 3
+        missed = [r for r in runs() if r.status == "missed"]
+        assert [r.job_id for r in missed] == ["daily_backup"] * 3
+        assert [r.started_at.astimezone(tz).day for r in missed] == [
+            (now - timedelta(days=d)).day for d in (2, 1, 0)]
+        # 再次启动不会重复补记
+        assert write_executor.run(scheduler.record_downtime_misses, jobs, now + timedelta(hours=1)) == 0
+
+    def test_old_runs_pruned(self, runs, db_engine):
+        with sessionmaker(bind=db_engine)() as session:
+            session.add(JobRun(job_id="daily_backup", status="success",
+                               started_at=datetime.now() - timedelta(days=settings.JOB_RUN_RETAIN_DAYS + 1)))
+            session.commit()
+        scheduler.tracked_job("daily_backup", lambda: None)()
+        assert [r.status for r in runs()] == ["success"]
+        assert runs()[0].started_at > datetime.now() - timedelta(days=1)
+
+
+class TestSchedulerConfig:
+
+    def test_job_defaults_and_wrapped_jobs(self, client):
+        defaults = scheduler.scheduler._job_defaults
+        assert defaults["coalesce"] is settings.SCHEDULER_COALESCE
+        assert defaults["misfire_grace_time"] == settings.SCHEDULER_MISFIRE_GRACE_SECONDS
+        jobs = {job.id: job for job in scheduler.scheduler.get_jobs()}
+        assert jobs["daily_backup"].func.__wrapped__ is scheduler._do_backup
+        assert jobs["daily_auto_repay"].func.__wrapped__ is scheduler._do_auto_repay
+
+
+class TestJobsApi:
+
+    def test_summary(self, client, auth_headers, db_engine):
+        start = datetime(2024, 5, 1, 2, 0)
+        with sessionmaker(bind=db_engine)() as session:
+            for day in range(20):
+                session.add(JobRun(job_id="daily_backup", status="success", rows_processed=100,
+                                   started_at=start + timedelta(days=day), duration_ms=(day + 1) * 10))
+            session.add(JobRun(job_id="daily_backup", status="missed", started_at=start + timedelta(days=20)))
+            session.add(JobRun(job_id="daily_auto_repay", status="failed", error="boom",
+                               started_at=start, duration_ms=5))
+            session.commit()
+
+        resp = client.get("/api/scheduler/jobs", headers=auth_headers)
+        assert resp.status_code == 200
+        jobs = {job["job_id"]: job for job in resp.json()}
+        backup = jobs["daily_backup"]
+        assert backup["next_run_time"] is not None
+        assert backup["last_run"]["status"] == "missed"
+        assert backup["last_duration_ms"] == 200
+        assert backup["p95_duration_ms"] == 190
+        assert (backup["recent_runs"], backup["recent_failed"], backup["recent_missed"]) == (21, 0, 1)
+
+        repay = jobs["daily_auto_repay"]
+        assert repay["last_run"]["error"] == "boom"
+        assert repay["recent_failed"] == 1
+
+    def test_requires_admin(self, client):
+        assert client.get("/api/scheduler/jobs").status_code == 401
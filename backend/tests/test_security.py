@@ -0,0 +1,155 @@
+"""
+口令哈希测试：
+1. 解析哈希中的 cost，按配置判断是否需要重新哈希
+2. 按目标延迟校准 cost
+3. 登录成功时透明地升级 / 降级哈希 cost
+4. JWT 解码缓存：命中、过期、容量上限、密钥轮换
+"""
+from datetime import timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core import security, token_cache as token_cache_module
+from app.core.config import settings
+from app.core.security import (
+    bcrypt_rounds,
+    calibrate_bcrypt_rounds,
+    create_access_token,
+    decode_access_token,
+    hash_password,
+    needs_rehash,
+    token_cache,
+    verify_password,
+)
+from app.core.token_cache import TokenCache
+from app.models.user import User
+
+
+def _stored_hash(db_engine, username: str) -> str:
+    Session = sessionmaker(bind=db_engine)
+    with Session() as sess:
+        return sess.query(User).filter(User.username == username).one().hashed_password
+
+
+def _create_user(db_engine, username: str, password: str, rounds: int) -> None:
+    Session = sessionmaker(bind=db_engine)
+    with Session() as sess:
+        sess.add(User(username=username, hashed_password=hash_password(password, rounds), role="user"))
+        sess.commit()
+
+
+class TestBcryptCost:
+
+    def test_hash_uses_configured_rounds(self):
+        hashed = hash_password("secret")
+        assert bcrypt_rounds(hashed) == settings.BCRYPT_ROUNDS
+        assert verify_password("secret", hashed)
+        assert not needs_rehash(hashed)
+
+    def test_needs_rehash_on_cost_mismatch(self):
+        assert needs_rehash(hash_password("secret", settings.BCRYPT_ROUNDS + 1))
+        assert bcrypt_rounds("not-a-bcrypt-hash") is None
+        assert needs_rehash("not-a-bcrypt-hash")
+
+    def test_calibration_bounds(self, monkeypatch):
+        # 模拟：cost 4 耗时 1ms，每加 1 翻倍
+        monkeypatch.setattr(security, "measure_bcrypt_verify", lambda rounds, samples=3: 0.001 * 2 ** (rounds - 4))
+        assert calibrate_bcrypt_rounds(target_ms=10) == 7        # 8ms <= 10ms < 16ms
+        assert calibrate_bcrypt_rounds(target_ms=0.1) == 4       # 不低于 min_rounds
+        assert calibrate_bcrypt_rounds(target_ms=1e9, max_rounds=9) == 9
+
+
+class TestRehashOnLogin:
+
+    def test_login_upgrades_cost(self, client, db_engine):
+        _create_user(db_engine, "alice", "alice123", settings.BCRYPT_ROUNDS + 1)
+        resp = client.post("/api/auth/login", data={"username": "alice", "password": "alice123"})
+        assert resp.status_code == 200
+        hashed = _stored_hash(db_engine, "alice")
+        assert bcrypt_rounds(hashed) == settings.BCRYPT_ROUNDS
+        assert verify_password("alice123", hashed)
+
+    def test_login_downgrades_cost(self, client, db_engine, monkeypatch):
+        _create_user(db_engine, "bob", "bob12345", 5)
+        monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+        resp = client.post("/api/auth/login", data={"username": "bob", "password": "bob12345"})
+        assert resp.status_code == 200
+        assert bcrypt_rounds(_stored_hash(db_engine, "bob")) == 4
+
+    def test_failed_login_does_not_rehash(self, client, db_engine):
+        _create_user(db_engine, "carol", "carol123", settings.BCRYPT_ROUNDS + 1)
+        before = _stored_hash(db_engine, "carol")
+        resp = client.post("/api/auth/login", data={"username": "carol", "password": "wrong"})
+        assert resp.status_code == 401
+        assert _stored_hash(db_engine, "carol") == before
+
+    def test_matching_cost_is_left_alone(self, client, db_engine):
+        _create_user(db_engine, "dave", "dave1234", settings.BCRYPT_ROUNDS)
+        before = _stored_hash(db_engine, "dave")
+        client.post("/api/auth/login", data={"username": "dave", "password": "dave1234"})
+        assert _stored_hash(db_engine, "dave") == before
+
+
+class TestTokenCache:
+
+    def _count_decodes(self, monkeypatch) -> list:
+        calls = []
+        real_decode = security.jwt.decode
+
+        def counting_decode(*args, **kwargs):
+            calls.append(1)
+            return real_decode(*args, **kwargs)
+
+        monkeypatch.setattr(security.jwt, "decode", counting_decode)
+        return calls
+
+    def test_repeated_decode_hits_cache(self, monkeypatch):
+        token_cache.clear()
+        calls = self._count_decodes(monkeypatch)
+        token = create_access_token(subject=42)
+        assert [decode_access_token(token) for _ in range(5)] == ["42"] * 5
+        assert len(calls) == 1
+
+    def test_invalid_token_not_cached(self, monkeypatch):
+        token_cache.clear()
+        calls = self._count_decodes(monkeypatch)
+        assert decode_access_token("garbage") is None
+        assert decode_access_token("garbage") is None
+        assert len(calls) == 2
+        assert token_cache.stats()["size"] == 0
+
+    def test_expired_token_rejected(self):
+        token_cache.clear()
+        token = create_access_token(subject=1, expires_delta=timedelta(seconds=-1))
+        assert decode_access_token(token) is None
+
+    def test_entry_expires_with_token(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(token_cache_module.time, "time", lambda: now[0])
+        cache = TokenCache()
+        cache.put("t", b"k", "1", exp=1010.0)
+        assert cache.get("t", b"k") == "1"
+        now[0] = 1010.0
+        assert cache.get("t", b"k") is None
+        assert cache.stats()["size"] == 0
+
+    def test_lru_bound(self):
+        cache = TokenCache(max_size=2)
+        far = 4102444800.0  # 2100-01-01
+        cache.put("a", b"k", "1", far)
+        cache.put("b", b"k", "2", far)
+        cache.get("a", b"k")
+        cache.put("c", b"k", "3", far)
+        assert cache.get("b", b"k") is None
+        assert cache.get("a", b"k") == "1"
+        assert cache.stats()["evictions"] == 1
+
+    def test_secret_rotation_clears_cache(self, monkeypatch):
+        token_cache.clear()
+        token = create_access_token(subject=7)
+        assert decode_access_token(token) == "7"
+        rotations = token_cache.stats()["key_rotations"]
+        monkeypatch.setattr(settings, "SECRET_KEY", "rotated-secret")
+        assert decode_access_token(token) is None
+        assert token_cache.stats()["key_rotations"] == rotations + 1
+        assert token_cache.stats()["size"] == 0
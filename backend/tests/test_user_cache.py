@@ -0,0 +1,114 @@
+"""
+用户缓存测试：
+1. TTL 过期与 LRU 容量上限
+2. 重复请求命中缓存，不再查询 users 表
+3. 改密码、停用、改角色后缓存立即失效
+4. 指标接口输出命中/未命中计数
+"""
+from sqlalchemy.orm import sessionmaker
+
+from app.core import user_cache as user_cache_module
+from app.core.user_cache import UserCache, user_cache
+from app.models.user import User
+
+
+def _user(user_id: int, **kw) -> User:
+    values = dict(id=user_id, username=f"u{user_id}", hashed_password="x", role="user", is_active=True)
+    values.update(kw)
+    return User(**values)
+
+
+def _users_queries(query_counter) -> int:
+    return query_counter.count("FROM users")
+
+
+def _update_admin(db_engine, **values) -> None:
+    Session = sessionmaker(bind=db_engine)
+    with Session() as sess:
+        admin = sess.query(User).filter(User.username == "admin").one()
+        for key, value in values.items():
+            setattr(admin, key, value)
+        sess.commit()
+
+
+class TestUserCacheUnit:
+
+    def test_ttl_expiry(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(user_cache_module.time, "monotonic", lambda: now[0])
+        cache = UserCache(ttl=10)
+        cache.put(_user(1))
+        assert cache.get(1).username == "u1"
+        now[0] += 11
+        assert cache.get(1) is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_lru_bound(self):
+        cache = UserCache(max_size=2)
+        cache.put(_user(1))
+        cache.put(_user(2))
+        cache.get(1)            # 1 变为最近使用
+        cache.put(_user(3))     # 淘汰 2
+        assert cache.get(2) is None
+        assert cache.get(1) is not None and cache.get(3) is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_inactive_user_not_cached(self):
+        cache = UserCache()
+        cache.put(_user(1, is_active=False))
+        assert cache.get(1) is None
+
+    def test_hit_returns_independent_copy(self):
+        cache = UserCache()
+        cache.put(_user(1))
+        first = cache.get(1)
+        first.role = "admin"
+        assert cache.get(1).role == "user"
+
+
+class TestUserCacheIntegration:
+
+    def test_repeated_requests_hit_cache(self, client, auth_headers, query_counter):
+        client.get("/api/auth/me", headers=auth_headers)
+        query_counter.statements.clear()
+        for _ in range(5):
+            assert client.get("/api/auth/me", headers=auth_headers).status_code == 200
+            assert client.get("/api/income/balances", headers=auth_headers).status_code == 200
+        assert _users_queries(query_counter) == 0
+
+    def test_change_password_invalidates(self, client, auth_headers):
+        me = client.get("/api/auth/me", headers=auth_headers).json()
+        assert user_cache.get(me["id"]) is not None
+        resp = client.post(
+            "/api/auth/change-password",
+            json={"old_password": "admin123", "new_password": "newpass123"},
+            headers=auth_headers,
+        )
+        assert resp.status_code == 204
+        assert user_cache.get(me["id"]) is None
+        # 旧密码在缓存副本上也不能再通过校验
+        resp = client.post(
+            "/api/auth/change-password",
+            json={"old_password": "admin123", "new_password": "another123"},
+            headers=auth_headers,
+        )
+        assert resp.status_code == 400
+
+    def test_deactivation_takes_effect_immediately(self, client, auth_headers, db_engine):
+        assert client.get("/api/auth/me", headers=auth_headers).status_code == 200
+        _update_admin(db_engine, is_active=False)
+        assert client.get("/api/auth/me", headers=auth_headers).status_code == 401
+
+    def test_role_change_takes_effect_immediately(self, client, auth_headers, db_engine):
+        assert client.get("/api/metrics", headers=auth_headers).status_code == 200
+        _update_admin(db_engine, role="user")
+        assert client.get("/api/metrics", headers=auth_headers).status_code == 403
+
+    def test_metrics_exposes_counters(self, client, auth_headers):
+        client.get("/api/auth/me", headers=auth_headers)
+        client.get("/api/auth/me", headers=auth_headers)
+        stats = client.get("/api/metrics", headers=auth_headers).json()["user_cache"]
+        assert stats["hits"] >= 2
+        assert stats["misses"] >= 1
+        assert stats["size"] == 1
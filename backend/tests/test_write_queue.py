@@ -0,0 +1,216 @@
+"""
+单写者队列测试：
+1. 同时排队的写任务合并为一次提交
+2. 单个任务失败只回滚自身（SAVEPOINT）
+3. 多线程并发写入不出现 database is locked
+4. 指标接口
+5. 所有写接口都经过写队列（普通会话换成 query_only 也能正常工作）
+6. 等待超时只针对排队阶段：排队超时的任务被取消、不会执行；已开始执行的任务等到提交完成
+7. 单次调用可放宽等待超时；CSV 导入每块一个写任务，块之间其他写请求可以插队
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.write_queue import WriteExecutor, WriteQueueTimeout
+from app.db import apply_sqlite_profile, get_db
+from app.main import app
+from app.models.user import User
+
+
+def _add_user(db, username: str) -> str:
+    db.add(User(username=username, hashed_password="x", role="user", is_active=True))
+    db.flush()
+    return username
+
+
+def _slow_add_user(db, username: str) -> str:
+    time.sleep(0.2)
+    return _add_user(db, username)
+
+
+def _add_user_then_fail(db, username: str) -> None:
+    _add_user(db, username)
+    raise ValueError("boom")
+
+
+def _block_writer(write_executor) -> threading.Event:
+    """提交一个阻塞写线程的任务，返回放行用的 Event（确保任务已开始执行）。"""
+    started, gate = threading.Event(), threading.Event()
+
+    def _blocker(db):
+        started.set()
+        return gate.wait(5)
+
+    write_executor.submit(_blocker)
+    assert started.wait(5)
+    return gate
+
+
+def _usernames(db_session) -> set[str]:
+    db_session.expire_all()
+    return {u.username for u in db_session.query(User).all()}
+
+
+class TestWriteExecutor:
+
+    def test_queued_jobs_are_group_committed(self, write_executor, db_session):
+        gate = _block_writer(write_executor)
+        # 写线程被第一个任务阻塞期间排队的任务应合并为同一批次
+        futures = [write_executor.submit(_add_user, f"u{i}") for i in range(5)]
+        gate.set()
+
+        assert [f.result(5) for f in futures] == [f"u{i}" for i in range(5)]
+        stats = write_executor.stats()
+        assert stats["jobs_total"] == 6
+        assert stats["batches_total"] == 2
+        assert {f"u{i}" for i in range(5)} <= _usernames(db_session)
+
+    def test_failed_job_rolls_back_only_itself(self, write_executor, db_session):
+        gate = _block_writer(write_executor)
+        ok1 = write_executor.submit(_add_user, "keep1")
+        bad = write_executor.submit(_add_user_then_fail, "drop")
+        ok2 = write_executor.submit(_add_user, "keep2")
+        gate.set()
+
+        assert ok1.result(5) == "keep1"
+        assert ok2.result(5) == "keep2"
+        with pytest.raises(ValueError):
+            bad.result(5)
+        names = _usernames(db_session)
+        assert {"keep1", "keep2"} <= names
+        assert "drop" not in names
+        assert write_executor.stats()["jobs_failed"] == 1
+
+    @pytest.fixture
+    def fast_timeout_executor(self, db_engine):
+        from app.db import create_writer_engine
+
+        writer_engine = create_writer_engine(str(db_engine.url))
+        executor = WriteExecutor(sessionmaker(bind=writer_engine), timeout=0.05)
+        yield executor
+        executor.stop()
+        writer_engine.dispose()
+
+    def test_timeout_while_queued_cancels_job(self, fast_timeout_executor, db_session):
+        gate = _block_writer(fast_timeout_executor)
+        with pytest.raises(WriteQueueTimeout):
+            fast_timeout_executor.run(_add_user, "late")
+        # 单次调用可放宽超时
+        threading.Timer(0.1, gate.set).start()
+        assert fast_timeout_executor.run(_add_user, "patient", timeout=5) == "patient"
+        names = _usernames(db_session)
+        assert "patient" in names and "late" not in names
+
+    def test_timeout_while_running_waits_for_commit(self, fast_timeout_executor, db_session):
+        # 任务已开始执行：调用方不会拿到超时（否则重试会重复写入），而是等到提交完成
+        assert fast_timeout_executor.run(_slow_add_user, "sync") == "sync"
+        assert asyncio.run(fast_timeout_executor.run_async(_slow_add_user, "async")) == "async"
+        assert {"sync", "async"} <= _usernames(db_session)
+        assert fast_timeout_executor.stats()["jobs_failed"] == 0
+
+    def test_concurrent_writers_do_not_lock(self, write_executor, db_session):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda i: write_executor.run(_add_user, f"c{i}"), range(80)))
+        assert len(results) == 80
+        assert {f"c{i}" for i in range(80)} <= _usernames(db_session)
+        assert write_executor.stats()["queue_depth"] == 0
+
+
+class TestMetricsEndpoint:
+
+    def test_metrics_reports_write_queue(self, client, auth_headers):
+        accs = client.get("/api/income/accounts", headers=auth_headers).json()
+        client.post(
+            "/api/income/balances",
+            json={"month": "2026-01", "balances": [{"account_id": accs[0]["id"], "balance": 1.0}]},
+            headers=auth_headers,
+        )
+        resp = client.get("/api/metrics", headers=auth_headers)
+        assert resp.status_code == 200
+        queue_stats = resp.json()["write_queue"]
+        assert queue_stats["jobs_total"] >= 1
+        assert "p95_ms" in queue_stats["wait"]
+
+
+@pytest.fixture
+def read_only_db(client, db_engine):
+    """把普通会话依赖换成 query_only 连接：任何绕过写队列的写操作都会失败。"""
+    engine = create_engine(str(db_engine.url), connect_args={"check_same_thread": False})
+    apply_sqlite_profile(engine, read_only=True)
+    Session = sessionmaker(bind=engine)
+
+    def _override():
+        with Session() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = _override
+    yield
+    engine.dispose()
+
+
+class TestWriteRoutes:
+
+    def test_all_writes_go_through_queue(self, client, auth_headers, make_debt, read_only_db, write_executor):
+        before = write_executor.stats()["jobs_total"]
+        accs = client.get("/api/income/accounts", headers=auth_headers).json()
+        assert len(accs) == 6
+
+        resp = client.post("/api/income/accounts", json={"name": "新账户", "sort_order": 9}, headers=auth_headers)
+        assert resp.status_code == 201, resp.text
+        acc_id = resp.json()["id"]
+        resp = client.put(f"/api/income/accounts/{acc_id}", json={"name": "改名"}, headers=auth_headers)
+        assert resp.json()["name"] == "改名"
+        client.post(
+            "/api/income/balances",
+            json={"month": "2026-01", "balances": [{"account_id": acc_id, "balance": 1.0}]},
+            headers=auth_headers,
+        )
+        assert client.delete(f"/api/income/accounts/{acc_id}", headers=auth_headers).status_code == 204
+        assert client.delete("/api/income/balances/2026-01", headers=auth_headers).status_code == 204
+        assert client.delete("/api/income/balances/2026-01", headers=auth_headers).status_code == 404
+
+        debt = make_debt(term_months=12)
+        resp = client.put(f"/api/debt/{debt['id']}", json={"note": "备注"}, headers=auth_headers)
+        assert resp.json()["note"] == "备注"
+        assert client.delete(f"/api/debt/{debt['id']}", headers=auth_headers).status_code == 204
+        assert client.get(f"/api/debt/{debt['id']}", headers=auth_headers).status_code == 404
+
+        # 10 次写请求（含一次 404）各是写队列中的一个任务
+        assert write_executor.stats()["jobs_total"] - before == 10
+
+    def test_import_lets_other_writes_interleave(self, client, auth_headers, write_executor, monkeypatch):
+        from app.api.income import balances
+
+        accs = client.get("/api/income/accounts", headers=auth_headers).json()
+        monkeypatch.setattr(balances, "_IMPORT_CHUNK_CELLS", 2)
+        normalize = balances._normalize_month
+        between = []
+
+        def normalize_then_write(raw):
+            # 解析发生在块与块之间；导入若整体占着写线程，这里的写入只能等到超时
+            if raw == "2020-07":
+                between.append(write_executor.run(_add_user, "between", timeout=1))
+            return normalize(raw)
+
+        monkeypatch.setattr(balances, "_normalize_month", normalize_then_write)
+        body = "\ufeff月份," + accs[0]["name"] + "\n" + "".join(f"2020-{m:02d},{m}\n" for m in range(1, 13))
+        before = write_executor.stats()["jobs_total"]
+
+        resp = client.post(
+            "/api/income/import/csv",
+            files={"file": ("t.csv", body.encode("utf-8"), "text/csv")},
+            headers=auth_headers,
+        )
+        assert resp.status_code == 200, resp.text
+        assert (resp.json()["inserted"], resp.json()["chunks"]) == (12, 6)
+        assert between == ["between"]
+        # 账户准备 1 个任务 + 每块 1 个任务 + 插队的写入
+        assert write_executor.stats()["jobs_total"] - before == 1 + 6 + 1
+        months = client.get("/api/income/balances", headers=auth_headers).json()
+        assert len(months) == 12
@@ -2,6 +2,7 @@ import http from './http'
 
 export type RepayMethod = 'equal_installment' | 'equal_principal'
 export type RepayStatus = 'pending' | 'paid' | 'overdue'
+export type ScheduleMode = 'materialized' | 'lazy'
 
 export interface DebtItem {
   id: number
@@ -12,6 +13,7 @@ export interface DebtItem {
   repay_method: RepayMethod
   first_repay_date: string
   monthly_repay_day: number
+  schedule_mode: ScheduleMode
   monthly_payment: number
   current_balance: number
   paid_periods: number
@@ -28,11 +30,12 @@ export interface DebtItemCreate {
   repay_method?: RepayMethod
   first_repay_date: string
   monthly_repay_day: number
+  schedule_mode?: ScheduleMode
   note?: string
 }
 
 export interface RepaymentScheduleItem {
-  id: number
+  id: number | null
   debt_id: number
   period_no: number
   due_date: string